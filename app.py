@@ -4,6 +4,7 @@
 import sys
 import os
 import streamlit as st
+import uuid
 from datetime import datetime, time
 from pathlib import Path
 
@@ -12,9 +13,13 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from src.koyomi.chat.analyzer import IntegratedAnalyzer
 from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.client_pool import get_client
+from src.koyomi.chat.history import ChatHistory, LLMSummarizer
 from src.koyomi.chat.session import ConsultationSession
 from src.koyomi.chat.export import export_pdf
 from src.koyomi.storage.json_store import save_session
+from src.koyomi.chat.metrics import start_metrics_server
+from src.koyomi.chat.speculation import Speculation, input_signature
 
 # ページ設定
 st.set_page_config(
@@ -44,12 +49,18 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+# メトリクス（KOYOMI_METRICS_PORT 指定時のみ、プロセスで1回だけ起動）
+@st.cache_resource
+def start_metrics_endpoint(port: int):
+    return start_metrics_server(port)
+
+
+if os.environ.get("KOYOMI_METRICS_PORT"):
+    start_metrics_endpoint(int(os.environ["KOYOMI_METRICS_PORT"]))
+
 # セッション状態初期化
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {
-            "role": "assistant",
-            "content": """こんにちは。暦 KOYOMI です。
+WELCOME_MESSAGE = """こんにちは。暦 KOYOMI です。
 
 **AI人間関係コンサルタント**として、あなたの意思決定をサポートします。
 
@@ -61,9 +72,12 @@ if "messages" not in st.session_state:
 - 人間関係（相性はどうか？）
 
 **まずは、ご相談内容を自由に入力してください。**
-""",
-        }
-    ]
+"""
+
+# チャット履歴（直近ターンは原文、それ以前は要約。描画は直近だけ）
+if "history" not in st.session_state:
+    st.session_state.history = ChatHistory()
+    st.session_state.history.append("assistant", WELCOME_MESSAGE)
 
 if "consultation_stage" not in st.session_state:
     st.session_state.consultation_stage = "initial"
@@ -77,6 +91,22 @@ if "query" not in st.session_state:
 if "current_session" not in st.session_state:
     st.session_state.current_session = None
 
+if "pending_advice" not in st.session_state:
+    st.session_state.pending_advice = None
+
+if "speculation" not in st.session_state:
+    st.session_state.speculation = None
+
+if "analyzed_signature" not in st.session_state:
+    st.session_state.analyzed_signature = None
+
+# API スケジューラの公平性の単位（セッション毎。サブスク未検証のためキャッシュ・保存には使われない）
+if "user_id" not in st.session_state:
+    st.session_state.user_id = f"session-{uuid.uuid4().hex}"
+
+# AIの最初のトークンをこの秒数だけ待つ（超えたら基本アドバイスを先に表示）
+ADVICE_DEADLINE_SECONDS = 8.0
+
 # エンジン初期化（セッション毎）
 def get_analyzer():
     """ユーザー毎のAnalyzerインスタンスを取得"""
@@ -87,7 +117,7 @@ def get_analyzer():
         return IntegratedAnalyzer(api_key=None)
     
     # APIモード（ユーザー専用）
-    return IntegratedAnalyzer(api_key=api_key)
+    return IntegratedAnalyzer(api_key=api_key, quick=st.session_state.get("quick_answer", False))
 
 # タイトル
 st.title("🏔️ 暦 KOYOMI")
@@ -107,10 +137,22 @@ with st.sidebar:
         st.session_state.api_key = api_key_input
         st.success("✅ API Key設定完了（あなた専用）")
         st.info("詳細なアドバイスが生成されます")
+        st.toggle(
+            "⚡ クイック回答",
+            key="quick_answer",
+            help="結論と行動だけの短いアドバイスを、より速く返します"
+        )
     else:
         st.warning("⚠️ API Key未設定")
         st.info("基本的なアドバイスのみ表示されます")
     
+    st.toggle(
+        "🚀 入力中に先読み",
+        value=False,
+        key="speculative_analysis",
+        help="関係者の入力が落ち着いたら命式・相性の計算を先に始めます（AIへの問い合わせは「分析開始」の後）"
+    )
+
     st.markdown("---")
     
     # データ保存ポリシー
@@ -135,25 +177,53 @@ with st.sidebar:
 - 「パートナーと組むべきか判断したい」
 """)
 
+# 履歴の要約: その場ではルールベースで畳み込み、API Key があればバックグラウンドで
+# API の要約に置き換える（append() は API 呼び出しを待たない。失敗時はルールベース）
+if st.session_state.get("api_key"):
+    st.session_state.history.refiner = LLMSummarizer(
+        get_client(st.session_state.api_key, base_url=os.environ.get("ANTHROPIC_BASE_URL")),
+        user_id=st.session_state.user_id
+    )
+else:
+    st.session_state.history.refiner = None
+
 # メインエリア
 col1, col2 = st.columns([2, 1])
 
 with col1:
     st.header("💬 相談内容")
     
-    # チャット履歴表示
-    for message in st.session_state.messages:
+    # 後回しにしたAIのアドバイスが届いていれば差し替え
+    # （メッセージは id で探す: 既に要約に畳み込まれていれば要約を更新）
+    pending = st.session_state.pending_advice
+    if pending is not None and pending["future"].done():
+        upgraded = pending["future"].result()
+        if upgraded["source"] != "fallback":
+            st.session_state.history.replace(
+                pending["message_id"], pending["fallback"], upgraded["text"]
+            )
+            if st.session_state.current_session:
+                st.session_state.current_session.summary = upgraded["text"]
+        st.session_state.pending_advice = None
+
+    # チャット履歴表示（以前の会話は要約のみ）
+    history = st.session_state.history
+    if history.hidden_count():
+        with st.expander(f"📜 以前の会話（{history.hidden_count()}件）"):
+            st.markdown(history.summary or "（要約はまだありません）")
+    for message in history.visible():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
+    if st.session_state.pending_advice is not None:
+        st.caption("⏳ AIによる詳細なアドバイスを生成中です（届き次第、上の回答を差し替えます）")
+        if st.button("🔄 詳細なアドバイスを確認"):
+            st.rerun()
+
     # ユーザー入力
     if st.session_state.consultation_stage == "initial":
         if prompt := st.chat_input("相談内容を入力してください"):
-            st.session_state.messages.append({"role": "user", "content": prompt})
-            
-            # メッセージ履歴制限（メモリ圧迫防止）
-            if len(st.session_state.messages) > 100:
-                st.session_state.messages = st.session_state.messages[-100:]
+            st.session_state.history.append("user", prompt)
             
             st.session_state.query = prompt
             
@@ -171,7 +241,7 @@ with col1:
 
 必要な人数: {len(required_people)}人
 """
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.history.append("assistant", response)
             st.session_state.consultation_stage = "collecting"
             st.rerun()
 
@@ -239,29 +309,110 @@ with col2:
                 height=100
             )
         
+        people_profiles = [
+            PersonProfile(
+                name=p["name"],
+                role=p["role"],
+                birth_date=p["birth_date"]
+            )
+            for p in people_data
+        ]
+
+        context_dict = {"additional_info": additional_context} if additional_context else None
+
+        signature = input_signature(
+            st.session_state.query,
+            people_profiles,
+            context_dict,
+            api=bool(st.session_state.get("api_key")),
+            quick=st.session_state.get("quick_answer", False)
+        )
+
+        # 先読み（命式・相性の計算のみ）: 入力が変わったら前の先読みを中止し、新しい入力で始め直す
+        speculation = st.session_state.speculation
+        if speculation is not None and not speculation.matches(signature):
+            speculation.cancel()
+            speculation = st.session_state.speculation = None
+        if (
+            speculation is None
+            and st.session_state.query
+            and st.session_state.get("speculative_analysis", False)
+            and signature != st.session_state.analyzed_signature
+        ):
+            speculative_analyzer = get_analyzer()
+            query = st.session_state.query
+            st.session_state.speculation = Speculation(
+                signature,
+                lambda: speculative_analyzer.iter_local(
+                    query=query,
+                    people=people_profiles,
+                    additional_context=context_dict
+                )
+            ).start()
+
         if st.button("🔮 分析開始", type="primary", use_container_width=True):
             if st.session_state.query:
-                with st.spinner("分析中..."):
-                    people_profiles = [
-                        PersonProfile(
-                            name=p["name"],
-                            role=p["role"],
-                            birth_date=p["birth_date"]
-                        )
-                        for p in people_data
-                    ]
-                    
-                    context_dict = {"additional_info": additional_context} if additional_context else None
+                with st.status("分析中...", expanded=True) as status:
+                    # 同じ入力の先読みがあれば命式・相性の計算結果を再利用（API はここで初めて呼ぶ）
+                    speculation = st.session_state.speculation
+                    st.session_state.speculation = None
+                    st.session_state.analyzed_signature = signature
+                    local_events = None
+                    if speculation is not None and speculation.matches(signature):
+                        local_events = speculation.replay()
                     
                     # ユーザー専用のAnalyzerを取得
                     analyzer = get_analyzer()
-                    
-                    result = analyzer.analyze_consultation(
+                    events = analyzer.iter_consultation(
                         query=st.session_state.query,
                         people=people_profiles,
-                        additional_context=context_dict
+                        additional_context=context_dict,
+                        stream_advice=True,
+                        user_id=st.session_state.user_id,
+                        advice_deadline=ADVICE_DEADLINE_SECONDS,
+                        local_events=local_events
                     )
                     
+                    # アドバイスはチャット欄に逐次表示
+                    with col1:
+                        with st.chat_message("assistant"):
+                            advice_placeholder = st.empty()
+
+                    # 計算できたものから順に表示
+                    result = None
+                    analyzed = 0
+                    streamed_advice = ""
+                    for event in events:
+                        if event["stage"] == "person":
+                            analysis = event["analysis"]
+                            status.write(
+                                f"👤 **{event['name']}**: {analysis['day_kan']}"
+                                f"（{analysis['metaphor'].get('本質', '')}）"
+                            )
+                            analyzed += 1
+                            if analyzed < len(people_profiles):
+                                status.update(label=f"命式を計算中...（{analyzed}/{len(people_profiles)}）")
+                            else:
+                                status.update(label="アドバイスを生成中...")
+                        elif event["stage"] == "compatibility":
+                            compatibility = event["compatibility"]
+                            status.write(
+                                f"🤝 相性: {compatibility.get('score', 0)}点"
+                                f" - {compatibility.get('relation', '')}"
+                            )
+                            status.update(label="アドバイスを生成中...")
+                        elif event["stage"] == "advice_delta":
+                            if event["type"] == "fallback":
+                                streamed_advice = event["text"]
+                            else:
+                                streamed_advice += event["text"]
+                            advice_placeholder.markdown(streamed_advice + "▌")
+                        elif event["stage"] == "complete":
+                            result = event["result"]
+                            advice_placeholder.markdown(result["advice"])
+
+                    status.update(label="分析完了", state="complete", expanded=False)
+
                     # セッション作成（単発: 保存しない）
                     # 将来的にサブスクユーザーの場合はuser_id, expires_atを設定
                     session = ConsultationSession.create(
@@ -289,10 +440,15 @@ with col2:
 これらについても教えていただけると、より詳細なアドバイスが可能です。
 """
                     
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": advice_message
-                    })
+                    message = st.session_state.history.append("assistant", advice_message)
+
+                    # APIが期限内に応答しなかった場合は、完了後に差し替える
+                    if result["pending_advice"] is not None:
+                        st.session_state.pending_advice = {
+                            "future": result["pending_advice"],
+                            "message_id": message["id"],
+                            "fallback": result["advice"],
+                        }
                     
                     st.session_state.consultation_stage = "analyzing"
                     st.rerun()
@@ -307,11 +463,12 @@ with col2:
                     try:
                         pdf_path = export_pdf(st.session_state.current_session)
                         
+                        session_id = st.session_state.current_session.session_id
                         with open(pdf_path, "rb") as pdf_file:
                             st.download_button(
                                 label="💾 PDFを保存",
                                 data=pdf_file,
-                                file_name=f"koyomi_{st.session_state.current_session.session_id}.pdf",
+                                file_name=f"koyomi_{session_id}.pdf",
                                 mime="application/pdf",
                                 use_container_width=True
                             )
@@ -328,21 +485,25 @@ with col2:
             st.session_state.query = ""
             st.session_state.people = []
             st.session_state.current_session = None
+            st.session_state.pending_advice = None
+            if st.session_state.speculation is not None:
+                st.session_state.speculation.cancel()
+            st.session_state.speculation = None
+            st.session_state.analyzed_signature = None
             
             # API Keyは保持（ユーザーの利便性のため）
             # 完全クリアする場合: st.session_state.clear()
             
-            st.session_state.messages = [
-                {
-                    "role": "assistant",
-                    "content": """こんにちは。暦 KOYOMI です。
+            st.session_state.history.clear()
+            st.session_state.history.append(
+                "assistant",
+                """こんにちは。暦 KOYOMI です。
 
 **AI人間関係コンサルタント**として、あなたの意思決定をサポートします。
 
 **まずは、ご相談内容を自由に入力してください。**
 """,
-                }
-            ]
+            )
             st.rerun()
     
     else:
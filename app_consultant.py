@@ -9,8 +9,10 @@ from pathlib import Path
 # プロジェクトルートをパスに追加
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.koyomi.chat.interviewer import Interviewer
+from src.koyomi.chat.interviewer import Interviewer, InterviewState
 from src.koyomi.chat.advice import AdviceGenerator
+from src.koyomi.chat.analyzer import advice_inputs
+from src.koyomi.chat.history import ChatHistory
 from src.koyomi.layer1.engine import MeishikiEngine
 
 # ページ設定
@@ -53,16 +55,18 @@ st.markdown("""
 def load_engines():
     return {
         "meishiki": MeishikiEngine(),
-        "interviewer": None,  # セッションごとに生成
+        "interviewer": None,  # ターンごとにヒアリング状態から復元
         "advice": AdviceGenerator(use_claude_api=False)  # デフォルトはルールベース
     }
 
 engines = load_engines()
 
 # セッション状態初期化
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-    st.session_state.interviewer = Interviewer()
+if "history" not in st.session_state:
+    # チャット履歴（直近ターンは原文、それ以前は要約。描画は直近だけ）
+    st.session_state.history = ChatHistory()
+    # ヒアリング状態は直列化したバイト列だけを保持（ターンごとに復元）
+    st.session_state.interview_state = InterviewState().to_bytes()
     st.session_state.analysis_complete = False
     
     # 初回メッセージ
@@ -79,10 +83,7 @@ if "messages" not in st.session_state:
 
 どんなご相談でしょうか？
 """
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": welcome
-    })
+    st.session_state.history.append("assistant", welcome)
 
 # タイトル
 st.title("🏔️ 暦 KOYOMI")
@@ -127,8 +128,12 @@ with st.sidebar:
 - ✅ 相性確認
 """)
 
-# チャット履歴表示
-for message in st.session_state.messages:
+# チャット履歴表示（以前の会話は要約のみ）
+history = st.session_state.history
+if history.hidden_count():
+    with st.expander(f"📜 以前の会話（{history.hidden_count()}件）"):
+        st.markdown(history.summary or "（要約はまだありません）")
+for message in history.visible():
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
@@ -139,8 +144,8 @@ if st.session_state.analysis_complete:
         
         if st.button("🔄 新しい相談を始める"):
             # リセット
-            st.session_state.messages = []
-            st.session_state.interviewer = Interviewer()
+            st.session_state.history.clear()
+            st.session_state.interview_state = InterviewState().to_bytes()
             st.session_state.analysis_complete = False
             st.rerun()
     
@@ -149,52 +154,53 @@ if st.session_state.analysis_complete:
 # ユーザー入力
 if prompt := st.chat_input("ご相談内容を入力してください"):
     # ユーザーメッセージ追加
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.history.append("user", prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
     
     # ヒアリング処理
-    interviewer = st.session_state.interviewer
+    interviewer = Interviewer(InterviewState.from_bytes(st.session_state.interview_state))
     response = interviewer.process_answer(prompt)
+    st.session_state.interview_state = interviewer.state.to_bytes()
     
     # アシスタント応答
     with st.chat_message("assistant"):
         st.markdown(response)
     
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": response
-    })
+    st.session_state.history.append("assistant", response)
     
     # ヒアリング完了チェック
     if interviewer.state.is_complete():
         with st.chat_message("assistant"):
             with st.spinner("🔮 命式を分析中..."):
-                # TODO: 実際の命式計算と相性分析
-                # 現在はダミーデータ
-                meishiki_data = {
-                    "person1": {"日干": "丙", "五行": {"火": 3, "土": 2, "木": 1, "金": 1, "水": 1}},
-                    "person2": {"日干": "癸", "五行": {"水": 3, "金": 2, "木": 1, "火": 1, "土": 1}}
-                }
-                
-                compatibility_data = {
-                    "score": 75,
-                    "relation": "相補関係",
-                    "roles": {"person1": "リーダー", "person2": "サポート"}
-                }
-                
-                # アドバイス生成
-                advice = engines["advice"].generate_advice(
-                    consultation_type=interviewer.state.consultation_type,
-                    meishiki_data=meishiki_data,
-                    compatibility_data=compatibility_data,
-                    question=prompt
+                # ヒアリングで抽出した関係者の命式と相性（先頭2人）
+                meishiki_data, compatibility_data = advice_inputs(
+                    engines["meishiki"], interviewer.state.people
                 )
                 
-                # 結果表示
-                st.markdown("---")
-                st.markdown("## 🎯 分析結果")
-                st.markdown(advice)
+            # 結果表示（生成されたテキストから逐次表示）
+            st.markdown("---")
+            st.markdown("## 🎯 分析結果")
+            advice_placeholder = st.empty()
+            advice = ""
+            
+            for event in engines["advice"].stream_advice(
+                consultation_type=interviewer.state.consultation_type,
+                meishiki_data=meishiki_data,
+                compatibility_data=compatibility_data,
+                question=prompt
+            ):
+                if event["type"] == "fallback":
+                    advice = event["text"]
+                elif event["type"] == "delta":
+                    advice += event["text"]
+                else:
+                    continue
+                advice_placeholder.markdown(advice + "▌")
+            
+            advice_placeholder.markdown(advice)
+        
+        st.session_state.history.append("assistant", f"## 🎯 分析結果\n\n{advice}")
         
         # 完了フラグ
         st.session_state.analysis_complete = True
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+大量相談のアドバイス一括生成
+
+Zone: Logic
+責務: 相談一覧（JSONL）をバッチ投入し、アドバイスを JSONL に書き出す
+
+入力フォーマット（UTF-8 JSONL、1行1相談）:
+    {"id": "c-001", "query": "この人を採用すべき？",
+     "people": [{"name": "山田太郎", "role": "候補者", "birth_date": "1990-06-15", "birth_time": "10:30"}],
+     "context": {"urgency": "medium"}}
+
+- people の各項目は名簿CSVと同じ（role, birth_time は省略可）
+- context は省略可
+
+使用方法:
+    python scripts/batch_advice.py consultations.jsonl --output advice.jsonl
+    python scripts/batch_advice.py consultations.jsonl --output advice.jsonl --backend local
+
+Note:
+    中断しても同じコマンドで再実行すれば続きから再開する
+    （書き出し済みの相談は飛ばし、投入済みのバッチは完了を待つ）
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.koyomi.analytics.roster import profile_from_row
+from src.koyomi.chat.analyzer import IntegratedAnalyzer
+from src.koyomi.chat.batch import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_POLL_INTERVAL,
+    BatchRunner,
+    LocalBatchBackend,
+    MessageBatchBackend,
+)
+
+
+def read_consultations(path: Path, analyzer: IntegratedAnalyzer):
+    """入力 JSONL を1行ずつ読み、アドバイス生成以外の分析を済ませて返す"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                people = [profile_from_row(row) for row in record["people"]]
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from e
+            yield analyzer.prepare_consultation(
+                str(record["id"]), record["query"], people, record.get("context")
+            )
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="相談一覧のアドバイスを一括生成")
+    parser.add_argument("input", type=Path, help="相談一覧（JSONL）")
+    parser.add_argument("--output", type=Path, required=True, help="結果の出力先（JSONL、追記）")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="チェックポイント（省略時は 出力先.checkpoint.json）")
+    parser.add_argument("--backend", choices=["batches", "local"], default="batches",
+                        help="batches: Message Batches API / local: プロセス内で並列実行")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="完了確認の間隔（秒）")
+    parser.add_argument("--base-url", default=None, help="API の接続先（疑似サーバー用）")
+    args = parser.parse_args()
+
+    analyzer = IntegratedAnalyzer(base_url=args.base_url)
+    consultant = analyzer.consultant
+    if not consultant.use_api:
+        print("ANTHROPIC_API_KEY が設定されていません。")
+        sys.exit(1)
+
+    if args.backend == "batches":
+        backend = MessageBatchBackend(consultant.client)
+    else:
+        backend = LocalBatchBackend(consultant.client, max_parallel=consultant.max_parallel)
+
+    runner = BatchRunner(
+        consultant,
+        backend,
+        args.output,
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+    )
+
+    print(f"入力: {args.input} → 出力: {args.output}（{args.backend}）")
+    stats = runner.run(read_consultations(args.input, analyzer))
+    print(f"投入 {stats['submitted']}件 / 書き出し {stats['written']}件 / 再開時スキップ {stats['skipped']}件")
+
+
+if __name__ == "__main__":
+    main()
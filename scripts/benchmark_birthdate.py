@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+生年月日抽出のスループット計測
+
+Zone: Logic
+責務: サンプル回答のコーパスに extract_birthdates を繰り返し適用し、1件あたりの処理時間を計測
+
+使用方法:
+    python scripts/benchmark_birthdate.py
+    python scripts/benchmark_birthdate.py --corpus answers.txt --rounds 20
+
+Note:
+    --corpus は1行1回答の UTF-8 テキスト（省略時は組み込みのサンプル回答）
+    チャットの1ターンごとに実行するため、1件あたり数十マイクロ秒以内が目安
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.koyomi.chat.birthdate import extract_birthdates
+
+
+SAMPLE_ANSWERS = [
+    "1990年6月15日です",
+    "山田太郎さんは1990年6月15日生まれ、午後3時半です",
+    "候補者の鈴木は平成2年6月15日、既存メンバーの佐藤は昭和60年12月25日です",
+    "１９８８／３／３ １０：３０",
+    "私は平成元年1月8日生まれです",
+    "H2.6.15とS60-3-3、それからR1.5.1の3人です",
+    "田中（1975-04-01）、伊藤（1982.11.30 7時）、渡辺（2001/2/28）",
+    "㍼58年8月8日 午前6時",
+    "相手は令和2年4月1日生まれ、私は1995年10月10日です",
+    "西暦2000年1月1日の0時ちょうどに生まれました",
+    "エンジニアです",
+    "特に不安はありませんが、チームに馴染めるか少し心配です",
+    "来月までに決めたいと思っています",
+    "電話番号は03-1234-5678です",
+    "チームは5人で、リーダーは1980年生まれです",
+    "2月30日生まれと言っていましたが勘違いかもしれません",
+]
+
+
+def load_corpus(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="生年月日抽出のスループット計測")
+    parser.add_argument("--corpus", type=Path, default=None, help="1行1回答のテキスト（省略時は組み込みサンプル）")
+    parser.add_argument("--rounds", type=int, default=2000, help="コーパスを繰り返す回数")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else SAMPLE_ANSWERS
+    if not corpus:
+        print("コーパスが空です。")
+        sys.exit(1)
+
+    # ウォームアップ（初回の正規化テーブル読み込みなどを除外）
+    mentions = sum(len(extract_birthdates(answer)) for answer in corpus)
+
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for answer in corpus:
+            extract_birthdates(answer)
+    elapsed = time.perf_counter() - started
+
+    total = args.rounds * len(corpus)
+    chars = args.rounds * sum(len(answer) for answer in corpus)
+    print(f"回答 {len(corpus)}件 × {args.rounds}回 = {total}件（抽出 {mentions}件/周）")
+    print(f"経過時間: {elapsed:.2f}秒")
+    print(f"スループット: {total / elapsed:,.0f} 件/秒（{chars / elapsed / 1e6:.1f} M文字/秒）")
+    print(f"1件あたり: {elapsed / total * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+相談パイプラインの負荷試験（疑似 Anthropic サーバー使用）
+
+Zone: Logic
+責務: analyze_consultation を並列に実行し、スループットとレイテンシ分布を計測
+
+使用方法:
+    python scripts/benchmark_consultation.py --requests 200 --concurrency 20 --latency 0.5
+    python scripts/benchmark_consultation.py --rpm 50 --max-in-flight 8  # 本番のレート制限込み
+
+Note:
+    API クレジットは消費しない（ローカルの疑似サーバーに接続する）
+    スケジューラの上限は環境変数 KOYOMI_LLM_* ではなく引数で指定する（既定は無制限）
+    → 既定ではパイプライン自体のスループットを測る。待ち時間はスケジューラ統計として別に表示
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.koyomi.chat.analyzer import IntegratedAnalyzer
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.scheduler import LLMScheduler, set_scheduler
+from src.koyomi.testing.fake_anthropic import FakeAnthropicServer, fixed, lognormal
+
+
+# 「無制限」の代わりに使う上限（TokenBucket は無限大を扱えない）
+UNLIMITED = 1e9
+
+QUERIES = [
+    "この人を採用すべきでしょうか？",
+    "このメンバーで新規事業を始めて大丈夫？",
+    "共同創業者として組むべきか迷っています",
+    "今、独立するタイミングでしょうか？",
+]
+
+
+def percentile(values, p):
+    """p パーセンタイル（最近傍法）"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_people(i: int, size: int):
+    base = datetime(1980, 1, 1, 12, 0)
+    return [
+        PersonProfile(f"人物{j}", "メンバー", base + timedelta(days=(i * 37 + j * 101) % 9000))
+        for j in range(size)
+    ]
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="analyze_consultation の負荷試験")
+    parser.add_argument("--requests", type=int, default=100, help="相談の総数")
+    parser.add_argument("--concurrency", type=int, default=10, help="同時実行数")
+    parser.add_argument("--people", type=int, default=2, help="1相談あたりの人数")
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="API の最初のバイトまでの中央値（秒）"
+    )
+    parser.add_argument("--sigma", type=float, default=0.5, help="レイテンシの対数正規分布の sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="ストリームのチャンク間隔（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="529 を返す確率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rpm", type=float, default=0, help="リクエスト数/分の上限（0 は無制限）")
+    parser.add_argument("--tpm", type=float, default=0, help="トークン数/分の上限（0 は無制限）")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="同時実行数の上限（0 は無制限）")
+    args = parser.parse_args()
+
+    scheduler = LLMScheduler(
+        max_in_flight=args.max_in_flight or int(UNLIMITED),
+        requests_per_minute=args.rpm or UNLIMITED,
+        tokens_per_minute=args.tpm or UNLIMITED,
+    )
+    set_scheduler(scheduler)
+
+    server = FakeAnthropicServer(
+        latency=lognormal(args.latency, args.sigma),
+        chunk_delay=fixed(args.chunk_delay),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    with server:
+        analyzer = IntegratedAnalyzer(api_key="benchmark", base_url=server.base_url)
+
+        def run(i: int):
+            started = time.perf_counter()
+            result = analyzer.analyze_consultation(
+                QUERIES[i % len(QUERIES)], make_people(i, args.people)
+            )
+            return time.perf_counter() - started, result["advice_metadata"]["source"]
+
+        print(f"疑似サーバー: {server.base_url}")
+        print(f"相談数 {args.requests} / 同時実行 {args.concurrency} / 人数 {args.people}")
+        print("スケジューラ上限: " + " / ".join(
+            f"{name} {value:g}" if value else f"{name} 無制限"
+            for name, value in (
+                ("同時実行", args.max_in_flight), ("RPM", args.rpm), ("TPM", args.tpm)
+            )
+        ))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(run, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    sources = {}
+    for _, source in results:
+        sources[source] = sources.get(source, 0) + 1
+
+    print()
+    print(f"所要時間:     {elapsed:.2f}秒")
+    print(f"スループット: {args.requests / elapsed:.1f} 件/秒")
+    print(f"レイテンシ:   p50 {percentile(latencies, 50):.3f}秒"
+          f" / p95 {percentile(latencies, 95):.3f}秒"
+          f" / p99 {percentile(latencies, 99):.3f}秒"
+          f" / max {max(latencies):.3f}秒")
+    stats = scheduler.stats()
+    print(f"スケジューラ待ち: 平均 {stats['avg_wait_seconds']:.3f}秒"
+          f" / max {stats['max_wait_seconds']:.3f}秒"
+          f" / 待ち行列の最大 {stats['max_queue_depth']}件")
+    print(f"応答元:       {sources}")
+    print(f"APIリクエスト: {len(server.requests)}件（リトライ含む）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+命式類似度インデックスの検索速度計測
+
+Zone: Logic
+責務: ランダムな特徴ベクトルの名簿で SimilarityIndex.query の1回あたりの時間を計測
+
+使用方法:
+    python scripts/benchmark_similarity.py
+    python scripts/benchmark_similarity.py --people 20000 --k 10 --queries 500
+
+Note:
+    5,000人で 1 ms 未満が目安
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.koyomi.analytics.similarity import FEATURE_DIM, SimilarityIndex
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="SimilarityIndex.query の速度計測")
+    parser.add_argument("--people", type=int, default=5000, help="名簿の人数")
+    parser.add_argument("--k", type=int, default=10, help="返す件数")
+    parser.add_argument("--queries", type=int, default=100, help="計測する検索回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.random((args.people, FEATURE_DIM), dtype=np.float32)
+    index = SimilarityIndex([f"p{i}" for i in range(args.people)], vectors)
+    queries = vectors[rng.integers(0, args.people, size=args.queries)]
+
+    index.query(queries[0], k=args.k)  # ウォームアップ
+    started = time.perf_counter()
+    for query in queries:
+        index.query(query, k=args.k)
+    elapsed = time.perf_counter() - started
+
+    print(f"名簿 {args.people}人 / k={args.k} / 検索 {args.queries}回")
+    print(f"1回あたり: {elapsed / args.queries * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+相談ログの一括分類（分析用）
+
+Zone: Logic
+責務: 記録された相談文を1件ずつ分類し、観点ごとの件数を集計する（任意で1件ごとの結果も書き出す）
+
+入力フォーマット（UTF-8）:
+    - テキスト: 1行1相談
+    - JSONL: 1行1レコード（--field の値を相談文として使う）
+
+使用方法:
+    python scripts/classify_queries.py queries.txt
+    python scripts/classify_queries.py consultations.jsonl --field query --output classified.jsonl
+
+Note:
+    入力は逐次読み込み（数百万件でもメモリは集計表の分だけ）
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.koyomi.chat.query import CATEGORY_TABLES, classify_queries
+
+
+def read_queries(path: Path, field: str = None):
+    """入力を1行ずつ読み、相談文を返す（空行は飛ばす）"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            if field is None:
+                yield line.rstrip("\n")
+                continue
+            try:
+                yield json.loads(line)[field]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from e
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="相談ログを一括分類して集計")
+    parser.add_argument("input", type=Path, help="相談ログ（テキスト or JSONL）")
+    parser.add_argument("--field", default=None, help="JSONL の相談文フィールド（省略時はテキストとして読む）")
+    parser.add_argument("--output", type=Path, default=None, help="1件ごとの分類の出力先（JSONL）")
+    args = parser.parse_args()
+
+    counts = {dimension: Counter() for dimension in CATEGORY_TABLES}
+    total = 0
+    started = time.perf_counter()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for categories in classify_queries(read_queries(args.input, args.field)):
+            total += 1
+            for dimension, value in categories.items():
+                counts[dimension][value] += 1
+            if output:
+                output.write(json.dumps(categories, ensure_ascii=False) + "\n")
+    finally:
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"分類 {total}件（{elapsed:.1f}秒）")
+    for dimension, counter in counts.items():
+        print(f"\n[{dimension}]")
+        for value, count in counter.most_common():
+            print(f"  {value}: {count}件（{count / total:.1%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+組織分析層
+
+Zone: Logic
+責務: 名簿単位（数千〜数万人）の命式分析
+"""
@@ -0,0 +1,317 @@
+"""
+相性グラフのクラスタリング
+
+Zone: Logic
+責務: 組織全体（数万人規模）から相互に相性の良いグループを抽出
+
+設計思想:
+- 相性スコアは日干の組み合わせだけで決まる
+  → 人物を日干ごとにまとめ、日干ペア（最大55組）だけを評価する
+- 閾値以上のペアのみ残す疎グラフ（ブロック単位）で表現
+  → N×N の密行列・人物単位の辺リストは一切作らない
+- クラスタは「全ペアが閾値以上」のグループ（クリーク分割）
+  - 連結成分では不十分: 相生は五行の5サイクルなので、閾値 60〜77.5 では全員が1つの成分になり、
+    相克のペアも同じクラスタに入ってしまう
+  - 日干ブロック上のクリーク（最大 2^K 通り）を列挙し、貪欲に「一度に最も多く割り当てられる」クリークを選ぶ
+  - ブロック内の辺がある日干はブロックごと、ない日干は1人ずつ入る
+  - 1ラウンドで少なくとも1つの日干ブロックが空になる → ラウンド数 ≤ K、計算量 O(N + K·2^K)
+  - 現在のスコア（同じ五行 60・相生 77.5・相克 42.5）では、閾値が 60 を超えると
+    同じ五行の2人も組めないため、クラスタは相生の2人組が最大になる
+- 連結成分（Union-Find）はグラフの診断用に残す
+"""
+from collections import Counter, defaultdict, deque
+from itertools import combinations_with_replacement
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.koyomi.layer1.engine import MeishikiEngine
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.analyzer import calculate_compatibility_score
+from src.koyomi.chat.gogyo import KAN_GOGYO
+
+
+DEFAULT_THRESHOLD = 70.0
+
+
+def pair_score(kan1: str, kan2: str) -> float:
+    """対称な相性スコア（双方向の平均）
+
+    calculate_compatibility_score は向きによって値が異なる（相生: 80/75）ため、
+    無向グラフ用に平均を取る。
+    """
+    score_ab, _ = calculate_compatibility_score(kan1, kan2)
+    score_ba, _ = calculate_compatibility_score(kan2, kan1)
+    return (score_ab + score_ba) / 2
+
+
+class UnionFind:
+    """Union-Find（経路半減 + ランク併合）"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> bool:
+        """2要素を併合
+
+        Returns:
+            True: 併合した、False: 既に同じ集合
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+        return True
+
+    def groups(self) -> List[List[int]]:
+        """集合ごとの要素リスト（要素番号の昇順）"""
+        members = defaultdict(list)
+        for i in range(len(self.parent)):
+            members[self.find(i)].append(i)
+        return list(members.values())
+
+
+class CompatibilityGraph:
+    """閾値以上の相性のみを持つ疎グラフ（日干ブロック単位）
+
+    Attributes:
+        keys: 各人物の日干（人物順）
+        blocks: {日干: [人物番号, ...]}
+        block_edges: {(日干a, 日干b): スコア}（a <= b、閾値以上のみ）
+    """
+
+    def __init__(
+        self,
+        keys: Sequence[str],
+        threshold: float = DEFAULT_THRESHOLD,
+        score_fn: Callable[[str, str], float] = pair_score
+    ):
+        self.keys = list(keys)
+        self.threshold = threshold
+        self.score_fn = score_fn
+
+        self.blocks: Dict[str, List[int]] = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            self.blocks[key].append(i)
+
+        self.block_edges: Dict[Tuple[str, str], float] = {}
+        for a, b in combinations_with_replacement(sorted(self.blocks), 2):
+            score = score_fn(a, b)
+            if score >= threshold:
+                self.block_edges[(a, b)] = score
+
+    def edge_count(self) -> int:
+        """人物単位の辺数（実体化せずに計算）"""
+        total = 0
+        for (a, b), _ in self.block_edges.items():
+            n_a = len(self.blocks[a])
+            if a == b:
+                total += n_a * (n_a - 1) // 2
+            else:
+                total += n_a * len(self.blocks[b])
+        return total
+
+    def has_edge(self, a: str, b: str) -> bool:
+        """日干 a と b の人物同士が閾値以上か（a == b はブロック内の2人）"""
+        return (min(a, b), max(a, b)) in self.block_edges
+
+    def block_cliques(self) -> List[Tuple[str, ...]]:
+        """日干ブロックのクリーク（異なる日干同士がすべて閾値以上の組）を列挙"""
+        kans = sorted(self.blocks)
+        cliques = []
+
+        def extend(clique: Tuple[str, ...], start: int):
+            for i in range(start, len(kans)):
+                kan = kans[i]
+                if all(self.has_edge(kan, other) for other in clique):
+                    cliques.append(clique + (kan,))
+                    extend(clique + (kan,), i + 1)
+
+        extend((), 0)
+        return cliques
+
+    def clique_partition(self) -> List[List[int]]:
+        """全ペアが閾値以上のグループへの分割（貪欲なクリーク被覆）
+
+        各ラウンドで、残っている人物に対して最も多くの人を割り当てられる
+        ブロッククリークを選ぶ（同点なら組める相手の少ない日干を含むもの）。ブロック内の辺がない日干からは1グループに1人しか入れないため、
+        同じクリークを「その日干の残り人数の最小値」回まとめて使う。
+        """
+        remaining = {kan: deque(members) for kan, members in self.blocks.items()}
+        cliques = self.block_cliques()
+        groups: List[List[int]] = []
+
+        while True:
+            candidates = [c for c in cliques if all(remaining[kan] for kan in c)]
+            # 組める相手が少ない日干を先に使う（同点時。相手の多い日干を温存する）
+            partners = Counter(kan for c in candidates if len(c) > 1 for kan in c)
+            best = None
+            for clique in candidates:
+                dense = [kan for kan in clique if self.has_edge(kan, kan)]
+                sparse = [kan for kan in clique if not self.has_edge(kan, kan)]
+                repeats = 1 if dense or not sparse else min(len(remaining[kan]) for kan in sparse)
+                per_group = sum(len(remaining[kan]) for kan in dense) + len(sparse)
+                key = (per_group * repeats, per_group, -sum(partners[kan] for kan in clique))
+                if best is None or key > best[0]:
+                    best = (key, dense, sparse, repeats)
+            if best is None:
+                break
+
+            _, dense, sparse, repeats = best
+            for _ in range(repeats):
+                group = [remaining[kan].popleft() for kan in sparse]
+                for kan in dense:
+                    group.extend(remaining[kan])
+                    remaining[kan].clear()
+                groups.append(sorted(group))
+
+        return groups
+
+    def connected_components(self) -> List[List[int]]:
+        """連結成分（Union-Find、診断用）
+
+        ブロック内の辺はチェーン状に、ブロック間の辺は代表点経由で併合する。
+        いずれも完全二部/完全グラフの連結性と同値。
+        成分内のペアが閾値以上とは限らない（クラスタには clique_partition() を使う）。
+        """
+        uf = UnionFind(len(self.keys))
+
+        for (a, b), _ in self.block_edges.items():
+            members_a, members_b = self.blocks[a], self.blocks[b]
+            if a == b:
+                if len(members_a) < 2:
+                    continue
+                head = members_a[0]
+                for i in members_a[1:]:
+                    uf.union(head, i)
+            else:
+                head_a, head_b = members_a[0], members_b[0]
+                for i in members_a:
+                    uf.union(i, head_b)
+                for j in members_b:
+                    uf.union(j, head_a)
+
+        return uf.groups()
+
+
+def _cluster_summary(graph: CompatibilityGraph, members: List[int]) -> Dict:
+    """クラスタの統計量（ペアスコアは日干の内訳から解析的に計算）"""
+    kan_counts = Counter(graph.keys[i] for i in members)
+    gogyo_counts = Counter()
+    for kan, count in kan_counts.items():
+        gogyo_counts[KAN_GOGYO.get(kan, "不明")] += count
+
+    size = len(members)
+    pair_total = 0
+    score_sum = 0.0
+    strong_pairs = 0
+    kans = sorted(kan_counts)
+    for a, b in combinations_with_replacement(kans, 2):
+        if a == b:
+            pairs = kan_counts[a] * (kan_counts[a] - 1) // 2
+        else:
+            pairs = kan_counts[a] * kan_counts[b]
+        if not pairs:
+            continue
+        score = graph.score_fn(a, b)
+        pair_total += pairs
+        score_sum += score * pairs
+        if score >= graph.threshold:
+            strong_pairs += pairs
+
+    return {
+        "size": size,
+        "day_kan_counts": dict(kan_counts),
+        "gogyo_counts": dict(gogyo_counts),
+        "dominant_gogyo": gogyo_counts.most_common(1)[0][0] if gogyo_counts else None,
+        "mean_pair_score": score_sum / pair_total if pair_total else None,
+        "density": strong_pairs / pair_total if pair_total else None,
+    }
+
+
+def cluster_by_compatibility(
+    day_kans: Sequence[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    names: Optional[Sequence[str]] = None,
+    score_fn: Callable[[str, str], float] = pair_score
+) -> Dict:
+    """日干のリストから相性クラスタ（全ペアが閾値以上のグループ）を抽出
+
+    Args:
+        day_kans: 各人物の日干
+        threshold: クラスタ内の全ペアが満たす相性スコアの下限
+        names: 人物名（出力用、任意）
+        score_fn: 日干ペアの対称スコア関数
+
+    Returns:
+        {
+            "assignments": [クラスタID, ...]（人物順）,
+            "clusters": [{"cluster_id", "members", "names", "size", ...}, ...]
+                        （サイズ降順、クラスタID = 並び順）,
+            "summary": {"people", "clusters", "singletons", "largest",
+                        "edges", "threshold"}
+        }
+    """
+    graph = CompatibilityGraph(day_kans, threshold=threshold, score_fn=score_fn)
+    components = sorted(graph.clique_partition(), key=lambda m: (-len(m), m[0]))
+
+    assignments = [0] * len(graph.keys)
+    clusters = []
+    for cluster_id, members in enumerate(components):
+        for i in members:
+            assignments[i] = cluster_id
+        cluster = {"cluster_id": cluster_id, "members": members}
+        if names is not None:
+            cluster["names"] = [names[i] for i in members]
+        cluster.update(_cluster_summary(graph, members))
+        clusters.append(cluster)
+
+    return {
+        "assignments": assignments,
+        "clusters": clusters,
+        "summary": {
+            "people": len(graph.keys),
+            "clusters": len(clusters),
+            "singletons": sum(1 for c in clusters if c["size"] == 1),
+            "largest": clusters[0]["size"] if clusters else 0,
+            "edges": graph.edge_count(),
+            "threshold": threshold,
+        },
+    }
+
+
+def cluster_people(
+    people: Sequence[PersonProfile],
+    threshold: float = DEFAULT_THRESHOLD,
+    engine: Optional[MeishikiEngine] = None
+) -> Dict:
+    """人物リスト（名簿）から相性クラスタを抽出
+
+    Args:
+        people: PersonProfile のリスト（load_roster の戻り値など）
+        threshold: クラスタ内の全ペアが満たす相性スコアの下限
+        engine: 命式計算エンジン（省略時は新規生成）
+
+    Returns:
+        cluster_by_compatibility() と同じ形式
+    """
+    engine = engine or MeishikiEngine()
+    day_kans = [
+        engine.calc_pillars(p.birth_date, has_time=False)["day"]["kan"]
+        for p in people
+    ]
+    return cluster_by_compatibility(
+        day_kans,
+        threshold=threshold,
+        names=[p.name for p in people],
+    )
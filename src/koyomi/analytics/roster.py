@@ -0,0 +1,107 @@
+"""
+名簿（ロスター）読み込み
+
+Zone: Logic
+責務: CSV名簿から PersonProfile のリストを生成
+
+名簿フォーマット（UTF-8 CSV、ヘッダー必須）:
+    name,role,birth_date,birth_time
+    山田太郎,エンジニア,1990-06-15,10:30
+    佐藤花子,営業,1985/12/25,
+
+- role, birth_time は省略可
+- birth_time が空の場合は正午（12:00）で計算し、時柱は使わない
+"""
+import csv
+from datetime import datetime, time
+from pathlib import Path
+from typing import Dict, List, Union
+
+from src.koyomi.chat.hearing import PersonProfile
+
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%Y%m%d"]
+TIME_FORMATS = ["%H:%M", "%H:%M:%S"]
+
+
+def _parse_date(value: str) -> datetime:
+    """日付文字列をパース
+
+    Raises:
+        ValueError: 未対応のフォーマット
+    """
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid birth_date format: {value}")
+
+
+def _parse_time(value: str) -> time:
+    """時刻文字列をパース
+
+    Raises:
+        ValueError: 未対応のフォーマット
+    """
+    value = value.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid birth_time format: {value}")
+
+
+def profile_from_row(row: Dict[str, str]) -> PersonProfile:
+    """名簿1行分（name, role, birth_date, birth_time）から PersonProfile を生成
+
+    Raises:
+        ValueError: 日付・時刻が不正な場合
+    """
+    birth_date = _parse_date(row["birth_date"])
+    raw_time = (row.get("birth_time") or "").strip()
+    birth_time = None
+    if raw_time:
+        birth_time = datetime.combine(birth_date, _parse_time(raw_time))
+        birth_date = birth_time
+    else:
+        birth_date = datetime.combine(birth_date, time(12, 0))
+
+    name = row["name"].strip()
+    return PersonProfile(
+        name=name,
+        role=(row.get("role") or "").strip() or name,
+        birth_date=birth_date,
+        birth_time=birth_time,
+    )
+
+
+def load_roster(path: Union[str, Path]) -> List[PersonProfile]:
+    """CSV名簿を読み込む
+
+    Args:
+        path: 名簿CSVのパス
+
+    Returns:
+        PersonProfile のリスト（ファイル記載順）
+
+    Raises:
+        ValueError: 必須列の欠落、または日付・時刻が不正な行がある場合
+    """
+    people = []
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"name", "birth_date"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Roster is missing columns: {sorted(missing)}")
+
+        for line_no, row in enumerate(reader, start=2):
+            try:
+                people.append(profile_from_row(row))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from e
+
+    return people
@@ -0,0 +1,297 @@
+"""
+命式類似度インデックス
+
+Zone: Logic
+責務: 名簿全体の命式を特徴ベクトル化し、k近傍検索を提供
+
+設計思想:
+- 名簿から一度だけ構築し、.npz としてディスクに保存（起動毎の再計算なし）
+- 検索は NumPy の行列積による厳密検索（近似なし）
+- 5,000人規模で1クエリ 1ms 未満
+
+特徴ベクトル（各ブロックを重み付けして連結、行単位でL2正規化）:
+- 四柱の干支 one-hot（年・月・日・時 × 十干10 + 十二支12）
+- 五行カウント（木火土金水、柱数で正規化）
+- 用神（十干10、優先順位で減衰）
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.koyomi.layer1.engine import MeishikiEngine, JIKKAN, JUNISHI
+from src.koyomi.chat.gogyo import GOGYO_ORDER, KAN_GOGYO, SHI_GOGYO
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.analytics.roster import load_roster
+
+
+PILLAR_NAMES = ["year", "month", "day", "hour"]
+
+# ブロック毎の重み（日柱は本人を表すため重く、時柱は不明が多いため軽く）
+PILLAR_WEIGHTS = {"year": 0.6, "month": 1.0, "day": 1.5, "hour": 0.5}
+GOGYO_WEIGHT = 1.0
+YOJIN_WEIGHT = 1.0
+YOJIN_DECAY = 0.5  # 第2用神以降の減衰率
+
+PILLAR_DIM = len(JIKKAN) + len(JUNISHI)
+FEATURE_DIM = PILLAR_DIM * len(PILLAR_NAMES) + len(GOGYO_ORDER) + len(JIKKAN)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def chart_features(chart: Dict, has_time: bool = True) -> np.ndarray:
+    """命式（judge_yojin の結果）を特徴ベクトルに変換
+
+    Args:
+        chart: MeishikiEngine.judge_yojin() の戻り値
+        has_time: 時柱を特徴に含めるか
+
+    Returns:
+        shape=(FEATURE_DIM,) の float32 ベクトル（未正規化）
+    """
+    vec = np.zeros(FEATURE_DIM, dtype=np.float32)
+    pillars = chart["pillars"]
+    gogyo_counts = dict.fromkeys(GOGYO_ORDER, 0)
+    used_pillars = 0
+
+    for i, pillar_name in enumerate(PILLAR_NAMES):
+        pillar = pillars.get(pillar_name)
+        if not pillar or (pillar_name == "hour" and not has_time):
+            continue
+
+        offset = i * PILLAR_DIM
+        weight = PILLAR_WEIGHTS[pillar_name]
+        vec[offset + JIKKAN.index(pillar["kan"])] = weight
+        vec[offset + len(JIKKAN) + JUNISHI.index(pillar["shi"])] = weight
+
+        gogyo_counts[KAN_GOGYO[pillar["kan"]]] += 1
+        gogyo_counts[SHI_GOGYO[pillar["shi"]]] += 1
+        used_pillars += 1
+
+    offset = PILLAR_DIM * len(PILLAR_NAMES)
+    if used_pillars:
+        for j, element in enumerate(GOGYO_ORDER):
+            vec[offset + j] = GOGYO_WEIGHT * gogyo_counts[element] / (2 * used_pillars)
+
+    offset += len(GOGYO_ORDER)
+    for rank, kan in enumerate(chart.get("yojin", [])):
+        if kan in JIKKAN:
+            idx = offset + JIKKAN.index(kan)
+            vec[idx] = max(vec[idx], YOJIN_WEIGHT * YOJIN_DECAY ** rank)
+
+    return vec
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """行単位でL2正規化（ゼロ行はそのまま）"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SimilarityIndex:
+    """命式類似度インデックス（厳密k近傍検索）"""
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        vectors: np.ndarray,
+        roles: Optional[Sequence[str]] = None,
+        engine: Optional[MeishikiEngine] = None
+    ):
+        """
+        Args:
+            names: 人物名（行順）
+            vectors: shape=(N, FEATURE_DIM) の特徴行列（正規化前でも可）
+            roles: 役割（行順、任意）
+            engine: クエリ時の命式計算に使うエンジン（省略時は遅延生成）
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != FEATURE_DIM:
+            raise ValueError(
+                f"vectors must have shape (N, {FEATURE_DIM}), got {vectors.shape}"
+            )
+        if len(names) != vectors.shape[0]:
+            raise ValueError("names and vectors must have the same length")
+
+        self.names = list(names)
+        self.roles = list(roles) if roles is not None else [""] * len(self.names)
+        self.matrix = np.ascontiguousarray(_normalize_rows(vectors))
+        self._engine = engine
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def engine(self) -> MeishikiEngine:
+        if self._engine is None:
+            self._engine = MeishikiEngine()
+        return self._engine
+
+    @classmethod
+    def build(
+        cls,
+        people: Sequence[PersonProfile],
+        engine: Optional[MeishikiEngine] = None
+    ) -> "SimilarityIndex":
+        """人物リストからインデックスを構築
+
+        Args:
+            people: PersonProfile のリスト
+            engine: 命式計算エンジン（省略時は新規生成）
+        """
+        engine = engine or MeishikiEngine()
+        vectors = np.zeros((len(people), FEATURE_DIM), dtype=np.float32)
+
+        for i, person in enumerate(people):
+            chart = engine.judge_yojin(person.birth_date)
+            vectors[i] = chart_features(chart, has_time=person.birth_time is not None)
+
+        return cls(
+            names=[p.name for p in people],
+            vectors=vectors,
+            roles=[p.role for p in people],
+            engine=engine,
+        )
+
+    @classmethod
+    def from_roster(
+        cls,
+        roster_path: Union[str, Path],
+        engine: Optional[MeishikiEngine] = None
+    ) -> "SimilarityIndex":
+        """CSV名簿からインデックスを構築"""
+        return cls.build(load_roster(roster_path), engine=engine)
+
+    def save(self, path: Union[str, Path]) -> str:
+        """インデックスを .npz として保存（アトミック書き込み）
+
+        Returns:
+            保存したファイルパス
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(INDEX_FORMAT_VERSION),
+                matrix=self.matrix,
+                names=np.array(self.names, dtype=str),
+                roles=np.array(self.roles, dtype=str),
+            )
+
+        tmp_path.replace(path)
+        return str(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, Path],
+        engine: Optional[MeishikiEngine] = None
+    ) -> "SimilarityIndex":
+        """保存済みインデックスを読み込む
+
+        Raises:
+            ValueError: フォーマットのバージョン不一致
+        """
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["version"])
+            if version != INDEX_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported index version: {version} (expected {INDEX_FORMAT_VERSION})"
+                )
+            return cls(
+                names=data["names"].tolist(),
+                vectors=data["matrix"],
+                roles=data["roles"].tolist(),
+                engine=engine,
+            )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        roster_path: Union[str, Path],
+        index_path: Union[str, Path],
+        engine: Optional[MeishikiEngine] = None
+    ) -> "SimilarityIndex":
+        """保存済みインデックスを読み込み、名簿より古ければ再構築して保存
+
+        Args:
+            roster_path: CSV名簿のパス
+            index_path: インデックス（.npz）のパス
+        """
+        roster_path = Path(roster_path)
+        index_path = Path(index_path)
+
+        if index_path.exists() and index_path.stat().st_mtime >= roster_path.stat().st_mtime:
+            try:
+                return cls.load(index_path, engine=engine)
+            except ValueError:
+                pass  # バージョン不一致 → 再構築
+
+        index = cls.from_roster(roster_path, engine=engine)
+        index.save(index_path)
+        return index
+
+    def vectorize(self, birth_date: datetime, has_time: bool = True) -> np.ndarray:
+        """生年月日からクエリベクトルを生成"""
+        chart = self.engine.judge_yojin(birth_date)
+        return chart_features(chart, has_time=has_time)
+
+    def query(
+        self,
+        vector: np.ndarray,
+        k: int = 5,
+        exclude: Optional[int] = None
+    ) -> List[Dict]:
+        """k近傍検索（コサイン類似度）
+
+        Args:
+            vector: shape=(FEATURE_DIM,) のクエリベクトル
+            k: 返す件数
+            exclude: 結果から除外する行番号（本人除外用）
+
+        Returns:
+            [{"index": int, "name": str, "role": str, "score": float}, ...]
+            （類似度の降順）
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+
+        q = _normalize_rows(np.asarray(vector, dtype=np.float32))
+        scores = self.matrix @ q
+
+        if exclude is not None:
+            scores[exclude] = -np.inf
+            k = min(k, len(self) - 1)
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+
+        if k < len(self):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(self))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            {
+                "index": int(i),
+                "name": self.names[i],
+                "role": self.roles[i],
+                "score": float(scores[i]),
+            }
+            for i in top
+        ]
+
+    def query_person(self, person: PersonProfile, k: int = 5) -> List[Dict]:
+        """人物プロフィールに類似する名簿メンバーを検索"""
+        vector = self.vectorize(person.birth_date, has_time=person.birth_time is not None)
+        return self.query(vector, k=k)
+
+    def most_similar_to(self, index: int, k: int = 5) -> List[Dict]:
+        """名簿内の人物（行番号）に類似するメンバーを検索（本人除外）"""
+        return self.query(self.matrix[index], k=k, exclude=index)
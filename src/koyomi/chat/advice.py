@@ -2,13 +2,132 @@
 アドバイス生成エンジン
 四柱推命の分析結果をClaude APIで自然言語化
 """
+import logging
 import os
-from typing import Dict, List
+import time
+from typing import Dict, Iterator, List, Optional
+
+from src.koyomi.chat.client_pool import get_client
+from src.koyomi.chat.gogyo import (
+    CONTROLS,
+    GENERATES,
+    GENERATES_FROM,
+    GOGYO_ORDER,
+    KAN_GOGYO,
+    SHI_GOGYO,
+)
+from src.koyomi.chat.prompt_cache import cached_text_block, system_text, text_block, usage_to_dict
+from src.koyomi.chat.resilience import failure_reason, resilient_create, resilient_stream
+from src.koyomi.chat.metrics import instrument_stream, record_advice
+from src.koyomi.chat.output_budget import get_output_budget, is_truncated
+from src.koyomi.chat.templates import compile_templates
+from src.koyomi.layer1.metaphor import GOGYO_MEANINGS
+from src.koyomi.storage.advice_cache import AdviceCache, get_advice_cache
+
+
+logger = logging.getLogger("koyomi.llm")
+
+# 五行ごとの仕事上の持ち味・向く役割・季節
+GOGYO_TRAITS = {
+    "木": {"strength": "企画力と成長志向", "role": "新規企画・事業開拓", "season": "春（3〜5月）"},
+    "火": {"strength": "発信力と推進力", "role": "対外発信・チームの牽引", "season": "夏（6〜8月）"},
+    "土": {"strength": "安定感と調整力", "role": "運営管理・関係者の調整", "season": "季節の変わり目（1・4・7・10月）"},
+    "金": {"strength": "決断力と品質へのこだわり", "role": "品質管理・意思決定", "season": "秋（9〜11月）"},
+    "水": {"strength": "情報収集力と柔軟な発想", "role": "調査・戦略立案", "season": "冬（12〜2月）"},
+}
+
+
+def _gogyo_reference() -> str:
+    """命式データの読み方（システムプロンプトの静的な参照資料）
+
+    上の表と Layer1 の十干の意味から組み立てる（リクエストに依存しない）。
+    共通プロンプトと合わせてキャッシュの最小長（1024 トークン）を超えるようにする。
+    """
+    kan_lines = "\n".join(
+        f"- {kan}（{element}）: {meaning}" for kan, (element, meaning) in GOGYO_MEANINGS.items()
+    )
+    shi_lines = "\n".join(
+        f"- {element}: " + "・".join(shi for shi, e in SHI_GOGYO.items() if e == element)
+        for element in GOGYO_ORDER
+    )
+    trait_lines = "\n".join(
+        f"- {element}: 持ち味={traits['strength']} / 向く役割={traits['role']}"
+        f" / 季節={traits['season']}"
+        for element, traits in GOGYO_TRAITS.items()
+    )
+    generates = "→".join(GOGYO_ORDER + GOGYO_ORDER[:1])
+    controls = " / ".join(f"{source}が{target}を抑える" for source, target in CONTROLS.items())
+    return f"""
+【参照資料: 命式データの読み方】
+■ 日干（十干）: その人の本質。五行と性質
+{kan_lines}
+
+■ 十二支の五行（月支は生まれた季節を表す）
+{shi_lines}
+
+■ 五行ごとの仕事上の持ち味・向く役割・季節
+{trait_lines}
+
+■ 相生（生み出す関係）: {generates}
+- 生む側は相手を支え、生まれる側は支えを受けて伸びる
+- 生む側が一方的に消耗しないよう、役割と負担の配分を確認する
+
+■ 相克（抑える関係）: {controls}
+- 抑える側は相手の行き過ぎを止めるが、摩擦や萎縮も生みやすい
+- 緊張関係は決裁ルール・役割の線引きで「健全な牽制」に変えられる
+
+■ 相性スコアの目安（日干の五行の関係）
+- 80点: 相生（本人が相手を生む）/ 75点: 相生（相手が本人を生む）
+- 60点: 同じ五行（似た者同士。判断が偏りやすい）
+- 55点: 特に強い関係なし（中立）
+- 45点・40点: 相克（刺激または緊張。運用ルールで補う）
+
+■ 用神: 命式のバランスを整える五行（左から優先）
+- 用神の五行の持ち味を持つ人・役割・季節を取り入れると判断が安定する
+
+■ 相談タイプ
+- 採用 / パートナー選定 / チーム編成 / タイミング判断 / 相性確認
+- 数値は目安であり、経歴・実績・本人の意思など命式以外の情報と併せて判断する
+"""
+
+
+GOGYO_REFERENCE = _gogyo_reference()
 
 
 class AdviceGenerator:
     """的確なアドバイスを生成"""
     
+    MODEL = "claude-sonnet-4-20250514"
+    MAX_TOKENS = 2000
+
+    # 全リクエスト共通の静的プロンプト（変更するとプロンプトキャッシュが無効になる）
+    SYSTEM_PROMPT = """
+あなたは四柱推命の専門家であり、経営コンサルタントです。
+
+ユーザーメッセージの【相談タイプ】【命式データ】【相性・関係性データ】【相談内容】をもとに、
+経営者が意思決定できるレベルの具体的で実用的なアドバイスをしてください。
+
+【アドバイスの条件】
+1. 最初に明確な結論（Yes/No/条件付き）
+2. 専門用語は最小限に抑える
+3. 具体的な行動を3つ示す
+4. タイミングも明示する
+5. リスクも正直に伝える
+6. 「なぜそう判断したか」を論理的に説明
+7. 経営者が意思決定できる情報密度
+
+【禁止事項】
+- 曖昧な表現（「かもしれません」など）
+- 占い師風の神秘的な言い回し
+- 無責任な楽観論
+""" + GOGYO_REFERENCE
+
+    # クイック回答（共通部分の後ろに置く → 共通部分のキャッシュは維持）
+    QUICK_ANSWER_PROMPT = """
+【クイック回答】
+結論と具体的な行動3つだけを、400字以内で簡潔に答えてください。
+"""
+
     # アドバイスのテンプレート（相談タイプ別）
     ADVICE_TEMPLATES = {
         "採用": """
@@ -74,26 +193,59 @@ class AdviceGenerator:
 
 【準備すべきこと】
 {preparation}
+""",
+        "相性確認": """
+【相性】
+{decision}
+
+【関係性】
+{relation}
+
+【うまくいくポイント】
+{good_points}
+
+【気をつけること】
+{cautions}
 """,
     }
     
-    def __init__(self, use_claude_api: bool = False):
+    # 起動時に一度だけ固定部分と差し込み部分に分解しておく（描画は連結のみ）
+    COMPILED_TEMPLATES = compile_templates(ADVICE_TEMPLATES)
+
+    # 相談タイプ別の差し込み値の生成メソッド（未知のタイプは相性確認として扱う）
+    RULE_FIELDS = {
+        "採用": "_hiring_fields",
+        "パートナー選定": "_partner_fields",
+        "チーム編成": "_team_fields",
+        "タイミング判断": "_timing_fields",
+        "相性確認": "_relationship_fields",
+    }
+
+    def __init__(
+        self,
+        use_claude_api: bool = False,
+        base_url: Optional[str] = None,
+        quick: bool = False
+    ):
         """
         Args:
             use_claude_api: Claude APIを使用するか（Falseの場合はルールベース）
+            base_url: API のベースURL（環境変数 ANTHROPIC_BASE_URL で設定可）
+            quick: クイック回答（結論と行動だけの短い回答）
         """
         self.use_claude_api = use_claude_api
+        self.base_url = base_url or os.environ.get("ANTHROPIC_BASE_URL")
+        self.quick = quick
         
         if use_claude_api:
             # 本番環境用（Claude API）
             try:
-                from anthropic import Anthropic
                 api_key = os.environ.get("ANTHROPIC_API_KEY")
                 if not api_key:
                     print("警告: ANTHROPIC_API_KEYが設定されていません。ルールベースで動作します。")
                     self.use_claude_api = False
                 else:
-                    self.client = Anthropic(api_key=api_key)
+                    self.client = get_client(api_key, base_url=self.base_url)
             except ImportError:
                 print("警告: anthropicパッケージがインストールされていません。ルールベースで動作します。")
                 self.use_claude_api = False
@@ -103,7 +255,8 @@ class AdviceGenerator:
         consultation_type: str,
         meishiki_data: Dict,
         compatibility_data: Dict,
-        question: str
+        question: str,
+        user_id: Optional[str] = None
     ) -> str:
         """
         アドバイスを生成
@@ -113,82 +266,300 @@ class AdviceGenerator:
             meishiki_data: 命式データ
             compatibility_data: 相性データ
             question: 具体的な質問
+            user_id: サブスクユーザーID（指定時のみ応答をキャッシュ）
         
         Returns:
             自然言語のアドバイス
         """
+        return self.generate_advice_with_metadata(
+            consultation_type,
+            meishiki_data,
+            compatibility_data,
+            question,
+            user_id=user_id
+        )["text"]
+
+    def generate_advice_with_metadata(
+        self,
+        consultation_type: str,
+        meishiki_data: Dict,
+        compatibility_data: Dict,
+        question: str,
+        user_id: Optional[str] = None
+    ) -> Dict:
+        """
+        アドバイスを生成し、応答のメタデータも返す
+
+        Returns:
+            {
+                "text": str,
+                "source": "api" | "cache" | "fallback",
+                "usage": {"input_tokens", "output_tokens",
+                          "cache_creation_input_tokens", "cache_read_input_tokens"},
+                "fallback_reason": str  （source が "fallback" の場合のみ）
+            }
+        """
+        started = time.perf_counter()
         if self.use_claude_api:
-            return self._generate_with_claude_api(
+            result = self._generate_with_claude_api(
                 consultation_type,
                 meishiki_data,
                 compatibility_data,
-                question
+                question,
+                user_id=user_id
             )
         else:
-            return self._generate_rule_based(
+            result = self._rule_based_result(
                 consultation_type,
                 meishiki_data,
                 compatibility_data
             )
+
+        record_advice(
+            "advice_generator", consultation_type, "sync", result, time.perf_counter() - started
+        )
+        return result
     
     def _generate_with_claude_api(
         self,
         consultation_type: str,
         meishiki_data: Dict,
         compatibility_data: Dict,
-        question: str
-    ) -> str:
+        question: str,
+        user_id: Optional[str] = None
+    ) -> Dict:
         """
         Claude APIを使用してアドバイス生成
         """
-        system_prompt = f"""
-あなたは四柱推命の専門家であり、経営コンサルタントです。
+        system_prompt = self._build_system_prompt()
+        user_prompt = self._build_user_prompt(
+            consultation_type,
+            meishiki_data,
+            compatibility_data,
+            question
+        )
 
-以下の情報をもとに、経営者が意思決定できるレベルの具体的で実用的なアドバイスをしてください。
+        # キャッシュ確認（サブスクユーザーのみ）
+        cache = get_advice_cache(user_id)
+        if cache is not None:
+            cache_key = AdviceCache.make_key(self.MODEL, system_text(system_prompt), user_prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return {"text": cached, "source": "cache", "usage": usage_to_dict(None)}
 
-【命式データ】
-{meishiki_data}
+        try:
+            message = resilient_create(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self._max_tokens(consultation_type),
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ]
+            )
+            text = message.content[0].text
 
-【相性・関係性データ】
-{compatibility_data}
+        except Exception as e:
+            logger.warning("Claude API エラー: %s", e)
+            return self._rule_based_result(
+                consultation_type,
+                meishiki_data,
+                compatibility_data,
+                reason=failure_reason(e)
+            )
 
-【相談タイプ】
-{consultation_type}
+        # ルールベースのフォールバック・打ち切られた回答はキャッシュしない
+        self._observe_output(consultation_type, message)
+        if cache is not None and not is_truncated(message):
+            cache.put(cache_key, text)
 
-【アドバイスの条件】
-1. 最初に明確な結論（Yes/No/条件付き）
-2. 専門用語は最小限に抑える
-3. 具体的な行動を3つ示す
-4. タイミングも明示する
-5. リスクも正直に伝える
-6. 「なぜそう判断したか」を論理的に説明
-7. 経営者が意思決定できる情報密度
+        return {"text": text, "source": "api", "usage": usage_to_dict(message.usage)}
 
-【禁止事項】
-- 曖昧な表現（「かもしれません」など）
-- 占い師風の神秘的な言い回し
-- 無責任な楽観論
-"""
-        
+    def stream_advice(
+        self,
+        consultation_type: str,
+        meishiki_data: Dict,
+        compatibility_data: Dict,
+        question: str,
+        user_id: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        アドバイスを逐次生成（ストリーミング）
+
+        Yields:
+            {"type": "delta", "text": str}  生成されたテキストの差分
+            {"type": "fallback", "text": str}  ルールベースの全文
+                （API未使用時、または途中で失敗した場合。表示中のテキストを置き換える）
+            {"type": "done", "source": str, "usage": Dict}  最後に1回
+                （フォールバック時は "fallback_reason" も含む）
+        """
+        yield from instrument_stream(
+            self._stream_events(
+                consultation_type,
+                meishiki_data,
+                compatibility_data,
+                question,
+                user_id=user_id
+            ),
+            "advice_generator",
+            consultation_type
+        )
+
+    def _stream_events(
+        self,
+        consultation_type: str,
+        meishiki_data: Dict,
+        compatibility_data: Dict,
+        question: str,
+        user_id: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """stream_advice() の本体（計測なし）"""
+        if not self.use_claude_api:
+            result = self._rule_based_result(
+                consultation_type,
+                meishiki_data,
+                compatibility_data
+            )
+            yield {"type": "fallback", "text": result["text"]}
+            yield self._done_event(result)
+            return
+
+        system_prompt = self._build_system_prompt()
+        user_prompt = self._build_user_prompt(
+            consultation_type,
+            meishiki_data,
+            compatibility_data,
+            question
+        )
+
+        # キャッシュ確認（サブスクユーザーのみ）
+        cache = get_advice_cache(user_id)
+        if cache is not None:
+            cache_key = AdviceCache.make_key(self.MODEL, system_text(system_prompt), user_prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield {"type": "delta", "text": cached}
+                yield {"type": "done", "source": "cache", "usage": usage_to_dict(None)}
+                return
+
+        text = ""
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
+            with resilient_stream(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self._max_tokens(consultation_type),
                 system=system_prompt,
                 messages=[
-                    {"role": "user", "content": question}
+                    {"role": "user", "content": user_prompt}
                 ]
-            )
-            
-            return message.content[0].text
-        
+            ) as stream:
+                for delta in stream.text_stream:
+                    text += delta
+                    yield {"type": "delta", "text": delta}
+                message = stream.get_final_message()
+                usage = usage_to_dict(message.usage)
+
         except Exception as e:
-            print(f"Claude API エラー: {e}")
-            return self._generate_rule_based(
+            logger.warning("Claude API エラー: %s", e)
+            result = self._rule_based_result(
                 consultation_type,
                 meishiki_data,
-                compatibility_data
+                compatibility_data,
+                reason="stream_error" if text else failure_reason(e)
             )
+            yield {"type": "fallback", "text": result["text"]}
+            yield self._done_event(result)
+            return
+
+        self._observe_output(consultation_type, message)
+        if cache is not None and not is_truncated(message):
+            cache.put(cache_key, text)
+
+        yield {"type": "done", "source": "api", "usage": usage}
+
+    def _build_system_prompt(self) -> List[Dict]:
+        """
+        システムプロンプト構築（プロンプトキャッシュ対応）
+
+        リクエスト毎のデータを含まない静的プロンプトのみ。
+        全リクエストでバイト単位で同一のため cache_control を付ける。
+        """
+        blocks = [cached_text_block(self.SYSTEM_PROMPT)]
+        if self.quick:
+            blocks.append(text_block(self.QUICK_ANSWER_PROMPT))
+        return blocks
+
+    def _max_tokens(self, consultation_type: str) -> int:
+        """相談タイプ別の出力上限（観測した出力長から学習、上限は MAX_TOKENS）"""
+        return get_output_budget().max_tokens(
+            consultation_type, quick=self.quick, ceiling=self.MAX_TOKENS
+        )
+
+    def _observe_output(self, consultation_type: str, message):
+        """API の回答の出力トークン数を予算の学習に記録"""
+        get_output_budget().observe(
+            consultation_type,
+            getattr(message.usage, "output_tokens", 0),
+            quick=self.quick,
+            truncated=is_truncated(message)
+        )
+
+    def _build_user_prompt(
+        self,
+        consultation_type: str,
+        meishiki_data: Dict,
+        compatibility_data: Dict,
+        question: str
+    ) -> str:
+        """
+        ユーザープロンプト構築（リクエスト毎のデータはすべてこちら）
+        """
+        return f"""【相談タイプ】
+{consultation_type}
+
+【命式データ】
+{meishiki_data}
+
+【相性・関係性データ】
+{compatibility_data}
+
+【相談内容】
+{question}"""
+
+    def _rule_based_result(
+        self,
+        consultation_type: str,
+        meishiki_data: Dict,
+        compatibility_data: Dict,
+        reason: str = "no_api"
+    ) -> Dict:
+        """ルールベースの結果を generate_advice_with_metadata() の形式で返す
+
+        Args:
+            reason: フォールバック理由（"no_api" / failure_reason() の分類）
+        """
+        return {
+            "text": self._generate_rule_based(
+                consultation_type,
+                meishiki_data,
+                compatibility_data
+            ),
+            "source": "fallback",
+            "usage": usage_to_dict(None),
+            "fallback_reason": reason,
+        }
+
+    @staticmethod
+    def _done_event(result: Dict) -> Dict:
+        """ルールベースの結果から done イベントを作る"""
+        return {
+            "type": "done",
+            "source": result["source"],
+            "usage": result["usage"],
+            "fallback_reason": result["fallback_reason"],
+        }
     
     def _generate_rule_based(
         self,
@@ -197,65 +568,276 @@ class AdviceGenerator:
         compatibility_data: Dict
     ) -> str:
         """
-        ルールベースでアドバイス生成（API不使用時）
+        ルールベースでアドバイス生成（API不使用時・API障害時）
+
+        命式データ: {"人物": {"日干": "丙", "五行": {"火": 3, ...}}, ...}
+        相性データ: {"score": 75, "relation": "相補関係", "roles": {"人物": "役割"}}
         """
-        # 採用判断の例
-        if consultation_type == "採用":
-            score = compatibility_data.get("score", 50)
-            
-            if score >= 70:
-                decision = "✅ 採用を推奨します"
-                reason = f"相性スコア {score}% - 既存チームとの調和が期待できます"
-            elif score >= 50:
-                decision = "⚠️ 条件付きで推奨"
-                reason = f"相性スコア {score}% - 適切なフォローがあれば問題ありません"
-            else:
-                decision = "❌ 慎重な検討が必要"
-                reason = f"相性スコア {score}% - チーム内の役割を明確にする必要があります"
-            
-            # 具体的なアドバイス
-            advice = self._get_specific_hiring_advice(meishiki_data, compatibility_data)
-            
-            return self.ADVICE_TEMPLATES["採用"].format(
-                decision=decision,
-                reason=reason,
-                specific_advice=advice["specific"],
-                risks=advice["risks"],
-                timing=advice["timing"]
-            )
+        if consultation_type not in self.RULE_FIELDS:
+            consultation_type = "相性確認"
+
+        fields = getattr(self, self.RULE_FIELDS[consultation_type])(
+            self._people_profiles(meishiki_data), compatibility_data
+        )
+        return self.COMPILED_TEMPLATES[consultation_type].render(fields)
+
+    @staticmethod
+    def _people_profiles(meishiki_data: Dict) -> List[Dict]:
+        """命式データを {"name", "kan", "element", "gogyo"} のリストに整形"""
+        people = []
+        for name, data in meishiki_data.items():
+            if not isinstance(data, dict):
+                continue
+            kan = data.get("日干", "")
+            people.append({
+                "name": name,
+                "kan": kan,
+                "element": KAN_GOGYO.get(kan),
+                "gogyo": data.get("五行", {}),
+            })
+        return people
+
+    @staticmethod
+    def _verdict(score: int, good: str, fair: str, poor: str) -> str:
+        if score >= 70:
+            return f"✅ {good}"
+        if score >= 50:
+            return f"⚠️ {fair}"
+        return f"❌ {poor}"
+
+    @staticmethod
+    def _describe(person: Dict) -> str:
+        element = person["element"]
+        if element is None:
+            return f"{person['name']}"
+        return f"{person['name']}（{person['kan']}・{element}）: {GOGYO_TRAITS[element]['strength']}"
+
+    @staticmethod
+    def _team_balance(people: List[Dict]):
+        """五行の合計から (多い五行, 欠けている五行) を返す"""
+        totals = dict.fromkeys(GOGYO_ORDER, 0)
+        for person in people:
+            for element, count in person["gogyo"].items():
+                if element in totals:
+                    totals[element] += count
+            if not person["gogyo"] and person["element"]:
+                totals[person["element"]] += 1
+        strongest = max(GOGYO_ORDER, key=lambda e: totals[e]) if any(totals.values()) else None
+        missing = [e for e in GOGYO_ORDER if totals[e] == 0] if strongest else []
+        return strongest, missing
+
+    @staticmethod
+    def _bullets(lines: List[str]) -> str:
+        return "\n".join(f"・{line}" for line in lines)
+
+    def _hiring_fields(self, people: List[Dict], compatibility_data: Dict) -> Dict[str, str]:
+        score = compatibility_data.get("score", 50)
+
+        if score >= 70:
+            reason = f"相性スコア {score}% - 既存チームとの調和が期待できます"
+        elif score >= 50:
+            reason = f"相性スコア {score}% - 適切なフォローがあれば問題ありません"
+        else:
+            reason = f"相性スコア {score}% - チーム内の役割を明確にする必要があります"
+        if people:
+            reason += "\n" + "\n".join(self._describe(p) for p in people)
         
-        # その他のタイプも同様に実装
-        return f"【{consultation_type}】の分析結果\n\n相性スコア: {compatibility_data.get('score', 50)}%"
+        advice = self._get_specific_hiring_advice(people, compatibility_data)
+        return {
+            "decision": self._verdict(score, "採用を推奨します", "条件付きで推奨", "慎重な検討が必要"),
+            "reason": reason,
+            "specific_advice": advice["specific"],
+            "risks": advice["risks"],
+            "timing": advice["timing"],
+        }
     
     def _get_specific_hiring_advice(
         self,
-        meishiki_data: Dict,
+        people: List[Dict],
         compatibility_data: Dict
     ) -> Dict:
         """
-        採用に関する具体的なアドバイス
+        採用に関する具体的なアドバイス（候補者は1人目）
         """
+        candidate = people[0] if people else {"name": "候補者", "element": None}
+        element = candidate["element"]
+        members = people[1:]
+
+        # 候補者の五行を抑える（相克）メンバーは避け、生む（支える）五行のメンバーを優先してバディにする
+        clashing = [
+            m for m in members
+            if m["element"] and element and CONTROLS[m["element"]] == element
+        ]
+        others = [m for m in members if m not in clashing]
+        buddy = next(
+            (m for m in others if m["element"] and GENERATES[m["element"]] == element), None
+        )
+        buddy = buddy or (others[0] if others else None)
+
+        role = GOGYO_TRAITS[element]["role"] if element else "本人の得意分野が活きる役割"
+        specific = [
+            "1. 最初の3ヶ月は週1回の1on1を設定\n   → 既存メンバーとの関係構築をサポート",
+            f"2. {role}を中心に、役割を初日から明確に定義\n   → 曖昧さが摩擦の原因になります",
+        ]
+        if buddy is not None:
+            specific.append(f"3. {buddy['name']}さんをバディに指名\n   → 五行のバランスから最適な組み合わせです")
+        else:
+            specific.append("3. 相談役となるバディを指名\n   → 立ち上がりの不安を早期に拾えます")
+
+        risks = ["最初の1ヶ月で判断しない\n  → 慣れるまで時間がかかるタイプです"]
+        if clashing:
+            names = "、".join(m["name"] for m in clashing)
+            risks.append(f"{names}さんとは意見が衝突しやすい組み合わせ\n  → 間に入る人を決め、判断基準を共有する")
+        else:
+            risks.append("コミュニケーションスタイルの違い\n  → 定期的なフィードバック機会を設ける")
+
+        season = GOGYO_TRAITS[GENERATES_FROM[element]]["season"] if element else "来月上旬"
         return {
-            "specific": """
-1. 最初の3ヶ月は週1回の1on1を設定
-   → 既存メンバーとの関係構築をサポート
+            "specific": "\n" + "\n\n".join(specific) + "\n",
+            "risks": "\n" + self._bullets(risks) + "\n",
+            "timing": "\n" + self._bullets([
+                f"入社時期: {season}が吉",
+                "本格始動: 入社後2週間は研修期間に",
+                "評価タイミング: 3ヶ月後、6ヶ月後",
+            ]) + "\n",
+        }
 
-2. 明確な役割定義を初日から
-   → 曖昧さが摩擦の原因になります
+    def _partner_fields(self, people: List[Dict], compatibility_data: Dict) -> Dict[str, str]:
+        score = compatibility_data.get("score", 50)
+        relation = compatibility_data.get("relation", "")
+        roles = compatibility_data.get("roles", {})
 
-3. Aさんをバディに指名
-   → 五行のバランスから最適な組み合わせです
-""",
-            "risks": """
-・最初の1ヶ月で判断しない
-  → 慣れるまで時間がかかるタイプです
+        compatibility = f"相性スコア {score}%"
+        if relation:
+            compatibility += f" - {relation}"
+        compatibility += "\n" + "\n".join(self._describe(p) for p in people)
 
-・コミュニケーションスタイルの違い
-  → 定期的なフィードバック機会を設ける
-""",
-            "timing": """
-・入社時期: 来月上旬が吉
-・本格始動: 入社後2週間は研修期間に
-・評価タイミング: 3ヶ月後、6ヶ月後
-"""
+        role_lines = []
+        for person in people:
+            role = roles.get(person["name"])
+            if role is None and person["element"]:
+                role = GOGYO_TRAITS[person["element"]]["role"]
+            role_lines.append(f"{person['name']}: {role or '得意分野を話し合って決める'}")
+
+        elements = [p["element"] for p in people if p["element"]]
+        warnings = []
+        if len(set(elements)) < len(elements):
+            warnings.append("同じ五行同士で強みが重なりやすい → 役割の重複を避ける")
+        if any(CONTROLS[a] == b for a in elements for b in elements):
+            warnings.append("相克の組み合わせがあり、主導権争いになりやすい → 最終決定権を事前に決める")
+        if score < 50:
+            warnings.append("価値観の違いが出やすい → 小さな共同案件で試してから本格的に組む")
+        if not warnings:
+            warnings.append("関係が良好なぶん馴れ合いになりやすい → 定期的に目標と数字を確認する")
+
+        return {
+            "decision": self._verdict(score, "パートナーとして推奨します", "条件付きで推奨", "慎重な検討が必要"),
+            "compatibility": compatibility,
+            "roles": self._bullets(role_lines),
+            "warnings": self._bullets(warnings),
+            "success_tips": self._bullets([
+                "役割と責任範囲を文書にしておく",
+                "利益配分と撤退条件を最初に合意する",
+                "月1回、関係そのものを振り返る場を設ける",
+            ]),
+        }
+
+    def _team_fields(self, people: List[Dict], compatibility_data: Dict) -> Dict[str, str]:
+        score = compatibility_data.get("score", 50)
+        strongest, missing = self._team_balance(people)
+
+        evaluation = f"{len(people)}人のチーム - 相性スコア {score}%"
+        if strongest:
+            evaluation += f"、{strongest}の性質（{GOGYO_TRAITS[strongest]['strength']}）が中心のチームです"
+
+        strengths = [self._describe(p) for p in people] or ["メンバーの命式データがありません"]
+
+        weaknesses = [f"{e}（{GOGYO_TRAITS[e]['strength']}）を持つメンバーがいない" for e in missing]
+        if strongest and len(people) > 1 and all(p["element"] == strongest for p in people):
+            weaknesses.append(f"全員が{strongest}で、考え方が偏りやすい")
+        if not weaknesses:
+            weaknesses.append("五行のバランスは取れています。役割の重複に注意してください")
+
+        role_assignment = []
+        for person in people:
+            role = GOGYO_TRAITS[person["element"]]["role"] if person["element"] else "本人の希望を優先"
+            role_assignment.append(f"{person['name']}: {role}")
+
+        if missing:
+            improvements = [f"{e}の役割（{GOGYO_TRAITS[e]['role']}）を補う人材の追加・外部委託" for e in missing]
+        else:
+            improvements = ["役割ごとの責任者と意思決定のルールを明確にする"]
+
+        return {
+            "evaluation": evaluation,
+            "strengths": self._bullets(strengths),
+            "weaknesses": self._bullets(weaknesses),
+            "role_assignment": self._bullets(role_assignment),
+            "improvements": self._bullets(improvements),
+        }
+
+    def _timing_fields(self, people: List[Dict], compatibility_data: Dict) -> Dict[str, str]:
+        person = people[0] if people else {"name": "あなた", "element": None}
+        element = person["element"]
+
+        if element is None:
+            return {
+                "decision": "⚠️ 命式データが不足しているため、一般的な判断基準をお伝えします",
+                "fortune_flow": "生年月日をもとに詳細な運気の流れを確認できます",
+                "recommended_timing": "準備が整ってから1ヶ月以内",
+                "avoid_timing": "情報が揃っていない段階での即断",
+                "preparation": self._bullets(["判断基準を3つに絞る", "撤退ラインを先に決める"]),
+            }
+
+        supporter = GENERATES_FROM[element]
+        controller = next(e for e, target in CONTROLS.items() if target == element)
+        return {
+            "decision": f"✅ {GOGYO_TRAITS[supporter]['season']}の実行を推奨します",
+            "fortune_flow": (
+                f"{person['name']}さんは{element}の性質（{GOGYO_TRAITS[element]['strength']}）。\n"
+                f"{supporter}の時期は追い風、{controller}の時期は抑えが効く流れです"
+            ),
+            "recommended_timing": (
+                f"{GOGYO_TRAITS[supporter]['season']}、または{GOGYO_TRAITS[element]['season']}"
+            ),
+            "avoid_timing": f"{GOGYO_TRAITS[controller]['season']}の大きな決断",
+            "preparation": self._bullets([
+                f"{GOGYO_TRAITS[element]['strength']}を活かせる計画に落とし込む",
+                "判断基準と撤退ラインを先に決める",
+                "推奨時期の1ヶ月前までに関係者の合意を取る",
+            ]),
+        }
+
+    def _relationship_fields(self, people: List[Dict], compatibility_data: Dict) -> Dict[str, str]:
+        score = compatibility_data.get("score", 50)
+        relation = compatibility_data.get("relation", "")
+
+        relation_lines = [self._describe(p) for p in people]
+        if relation:
+            relation_lines.insert(0, relation)
+
+        elements = [p["element"] for p in people if p["element"]]
+        good_points = []
+        cautions = []
+        if len(elements) >= 2:
+            a, b = elements[0], elements[1]
+            if GENERATES[a] == b or GENERATES[b] == a:
+                good_points.append("一方がもう一方を自然に支える関係（相生）です。頼る・任せるを素直に")
+            elif a == b:
+                good_points.append("感覚が近く、説明が少なくても通じ合えます")
+            if CONTROLS[a] == b or CONTROLS[b] == a:
+                cautions.append("遠慮なく言い合えるぶん、言い方がきつくなりがち（相克）。結論の前に感謝を伝える")
+        good_points.append("お互いの得意分野を言葉にして共有する")
+        cautions.append("相手の沈黙を同意と受け取らず、節目で確認する")
+
+        return {
+            "decision": self._verdict(
+                score,
+                f"良好な相性です（{score}%）",
+                f"工夫次第で良い関係に（{score}%）",
+                f"すれ違いに注意が必要です（{score}%）",
+            ),
+            "relation": "\n".join(relation_lines) or "命式データがありません",
+            "good_points": self._bullets(good_points),
+            "cautions": self._bullets(cautions),
         }
@@ -1,8 +1,10 @@
 """
 統合分析エンジン - 命式計算 + 相性分析 + アドバイス生成
 """
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import inspect
 import sys
 from pathlib import Path
 
@@ -13,21 +15,126 @@ from src.koyomi.layer1.engine import MeishikiEngine
 from src.koyomi.layer1.metaphor import get_metaphor, get_gogyo_meaning
 from src.koyomi.chat.hearing import ConsultationHearing, PersonProfile
 from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.gogyo import CONTROLS, GENERATES, GOGYO_ORDER, KAN_GOGYO, SHI_GOGYO
+
+
+def calculate_compatibility_score(kan1: str, kan2: str) -> tuple:
+    """相性スコア計算（簡易版）
+
+    Args:
+        kan1: 1人目の日干
+        kan2: 2人目の日干
+
+    Returns:
+        (スコア, 関係性の説明) のタプル
+    """
+
+    element1 = KAN_GOGYO.get(kan1, "不明")
+    element2 = KAN_GOGYO.get(kan2, "不明")
+
+    score = 50  # 基準点
+    relation = ""
+
+    # 同じ五行
+    if element1 == element2:
+        score = 60
+        relation = f"同じ{element1}の性質を持つ（似た者同士）"
+
+    # 相生関係
+    elif GENERATES.get(element1) == element2:
+        score = 80
+        relation = f"{element1}が{element2}を生み出す（相生・良好な関係）"
+
+    elif GENERATES.get(element2) == element1:
+        score = 75
+        relation = f"{element2}が{element1}を生み出す（相生・サポート関係）"
+
+    # 相克関係
+    elif CONTROLS.get(element1) == element2:
+        score = 40
+        relation = f"{element1}が{element2}を抑制（相克・緊張関係）"
+
+    elif CONTROLS.get(element2) == element1:
+        score = 45
+        relation = f"{element2}が{element1}を抑制（相克・刺激関係）"
+
+    else:
+        score = 55
+        relation = "特に強い関係性はない（中立）"
+
+    return score, relation
+
+
+def advice_inputs(engine: MeishikiEngine, people: List[PersonProfile]) -> Tuple[Dict, Dict]:
+    """AdviceGenerator に渡す命式データ・相性データを計算
+
+    Args:
+        engine: 命式エンジン
+        people: 関係者リスト（相性は先頭2人で計算）
+
+    Returns:
+        (命式データ {"人物": {"日干", "五行"}}, 相性データ {"score", "relation", "roles"})
+        1人の場合、相性データは {}
+    """
+    meishiki_data = {}
+    day_kans = []
+
+    for key, person in zip(IntegratedAnalyzer._person_keys(people), people):
+        pillars = engine.judge_yojin(person.birth_date)["pillars"]
+        names = ["year", "month", "day"] + (["hour"] if person.birth_time else [])
+        gogyo = dict.fromkeys(GOGYO_ORDER, 0)
+        for name in names:
+            gogyo[KAN_GOGYO[pillars[name]["kan"]]] += 1
+            gogyo[SHI_GOGYO[pillars[name]["shi"]]] += 1
+        meishiki_data[key] = {"日干": pillars["day"]["kan"], "五行": gogyo}
+        day_kans.append(pillars["day"]["kan"])
+
+    if len(people) < 2:
+        return meishiki_data, {}
+
+    score, relation = calculate_compatibility_score(day_kans[0], day_kans[1])
+    compatibility_data = {
+        "score": score,
+        "relation": relation,
+        "roles": {key: person.role for key, person in zip(meishiki_data, people)},
+    }
+    return meishiki_data, compatibility_data
+
+
+def chart_fingerprint(person: PersonProfile) -> str:
+    """命式の同一性判定キー
+
+    命式は生年月日時だけで決まるため、名前・役割は含めない。
+    """
+    return person.birth_date.isoformat()
 
 
 class IntegratedAnalyzer:
     """統合分析エンジン"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        quick: bool = False
+    ):
+        """
+        Args:
+            api_key: Anthropic API key（環境変数 ANTHROPIC_API_KEY で設定可）
+            base_url: API のベースURL（環境変数 ANTHROPIC_BASE_URL で設定可）
+            quick: クイック回答（結論と行動だけの短いアドバイス）
+        """
         self.meishiki_engine = MeishikiEngine()
-        self.consultant = KoyomiConsultant(api_key=api_key)
+        self.consultant = KoyomiConsultant(api_key=api_key, base_url=base_url, quick=quick)
         self.hearing = ConsultationHearing()
     
     def analyze_consultation(
         self,
         query: str,
         people: List[PersonProfile],
-        additional_context: Optional[Dict] = None
+        additional_context: Optional[Dict] = None,
+        user_id: Optional[str] = None,
+        advice_deadline: Optional[float] = None
     ) -> Dict:
         """
         相談内容を総合分析
@@ -36,54 +143,321 @@ class IntegratedAnalyzer:
             query: 相談内容
             people: 関係者リスト
             additional_context: 追加コンテキスト
+            user_id: サブスクユーザーID（単発利用は None）
+            advice_deadline: アドバイスの最初のトークンを待つ秒数
+                （超えたらルールベースのアドバイスを返し、API の結果は pending_advice で受け取る）
         
         Returns:
             {
                 "consultation_type": str,
                 "people_analysis": Dict,
                 "advice": str,
+                "advice_metadata": {"source": str, "usage": Dict},
+                "pending_advice": Future | None,
                 "follow_up_questions": List[str]
             }
         """
+        # 1-4. ローカル計算（分類・命式・相性・コンテキスト）
+        local = self._analyze_local(query, people, additional_context)
+
+        # 5. アドバイス生成
+        advice = self.consultant.generate_advice_with_metadata(
+            query=query,
+            consultation_type=local["consultation_type"],
+            people_analysis=local["people_analysis"],
+            context=local["context"],
+            user_id=user_id,
+            deadline=advice_deadline
+        )
+
+        # 6. フォローアップ質問生成
+        follow_up = self.hearing.generate_follow_up_questions(query, local["consultation_type"])
+
+        return {
+            "consultation_type": local["consultation_type"],
+            "people_analysis": local["people_analysis"],
+            "advice": advice["text"],
+            "advice_metadata": {"source": advice["source"], "usage": advice["usage"]},
+            "pending_advice": advice.get("pending"),
+            "follow_up_questions": follow_up,
+            "context": local["context"]
+        }
+
+    async def analyze_consultation_async(
+        self,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None,
+        on_local_result: Optional[Callable[[Dict], Any]] = None,
+        user_id: Optional[str] = None,
+        advice_deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        相談内容を総合分析（非同期版）
+
+        Claude API 呼び出し（ブロッキング）をスレッドに逃がし、その待ち時間中に
+        フォローアップ質問の生成と on_local_result の通知を行う。
+        アドバイスのプロンプトは命式・相性の計算結果を含むため、ローカル計算
+        （数ms）だけは API 呼び出しより先に完了させる。
+
+        Args:
+            query: 相談内容
+            people: 関係者リスト
+            additional_context: 追加コンテキスト
+            on_local_result: ローカル計算完了時に呼ばれるコールバック
+                （"advice" が None の途中結果を受け取る。コルーチン関数も可）
+            user_id: サブスクユーザーID（単発利用は None）
+            advice_deadline: analyze_consultation() と同じ
+
+        Returns:
+            analyze_consultation() と同じ形式
+        """
+        local = await asyncio.to_thread(
+            self._analyze_local, query, people, additional_context
+        )
+        consultation_type = local["consultation_type"]
+
+        advice_task = asyncio.create_task(asyncio.to_thread(
+            self.consultant.generate_advice_with_metadata,
+            query=query,
+            consultation_type=consultation_type,
+            people_analysis=local["people_analysis"],
+            context=local["context"],
+            user_id=user_id,
+            deadline=advice_deadline
+        ))
+
+        try:
+            follow_up = self.hearing.generate_follow_up_questions(query, consultation_type)
+
+            if on_local_result is not None:
+                notified = on_local_result({
+                    "consultation_type": consultation_type,
+                    "people_analysis": local["people_analysis"],
+                    "advice": None,
+                    "follow_up_questions": follow_up,
+                    "context": local["context"]
+                })
+                if inspect.isawaitable(notified):
+                    await notified
+        except BaseException:
+            advice_task.cancel()
+            raise
+
+        advice = await advice_task
+
+        return {
+            "consultation_type": consultation_type,
+            "people_analysis": local["people_analysis"],
+            "advice": advice["text"],
+            "advice_metadata": {"source": advice["source"], "usage": advice["usage"]},
+            "pending_advice": advice.get("pending"),
+            "follow_up_questions": follow_up,
+            "context": local["context"]
+        }
+
+    def iter_consultation(
+        self,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None,
+        stream_advice: bool = False,
+        user_id: Optional[str] = None,
+        advice_deadline: Optional[float] = None,
+        local_events: Optional[Iterable[Dict]] = None
+    ) -> Iterator[Dict]:
+        """
+        相談内容を総合分析し、計算できたものから順に返す（逐次表示用）
+
+        Args:
+            query: 相談内容
+            people: 関係者リスト
+            additional_context: 追加コンテキスト
+            stream_advice: アドバイスをトークン単位で返すか
+            user_id: サブスクユーザーID（単発利用は None）
+            advice_deadline: analyze_consultation() と同じ
+            local_events: 先に計算したローカル分析（iter_local() のイベント列）
+                指定時は命式・相性を計算し直さず、そのイベントを返してからアドバイスを生成する
+
+        Yields:
+            {"stage": "person", "name": str, "analysis": Dict}  （人数分）
+            {"stage": "compatibility", "compatibility": Dict}  （2人以上の場合）
+            {"stage": "advice_delta", "type": "delta" | "fallback", "text": str}
+                （stream_advice=True の場合のみ。"fallback" は表示中のテキストを置き換える）
+            {"stage": "advice", "advice": str}
+            {"stage": "complete", "result": Dict}  （analyze_consultation() と同じ形式）
+        """
+        if local_events is None:
+            local = yield from self._iter_local(query, people, additional_context)
+        else:
+            local = yield from self._replay_local(local_events)
+
+        if stream_advice:
+            advice = ""
+            metadata = {}
+            pending = None
+            for event in self.consultant.stream_advice(
+                query=query,
+                consultation_type=local["consultation_type"],
+                people_analysis=local["people_analysis"],
+                context=local["context"],
+                user_id=user_id,
+                deadline=advice_deadline
+            ):
+                if event["type"] == "done":
+                    metadata = {"source": event["source"], "usage": event["usage"]}
+                    pending = event.get("pending")
+                    continue
+                advice = event["text"] if event["type"] == "fallback" else advice + event["text"]
+                yield {"stage": "advice_delta", "type": event["type"], "text": event["text"]}
+        else:
+            result = self.consultant.generate_advice_with_metadata(
+                query=query,
+                consultation_type=local["consultation_type"],
+                people_analysis=local["people_analysis"],
+                context=local["context"],
+                user_id=user_id,
+                deadline=advice_deadline
+            )
+            advice = result["text"]
+            metadata = {"source": result["source"], "usage": result["usage"]}
+            pending = result.get("pending")
+        yield {"stage": "advice", "advice": advice}
+
+        follow_up = self.hearing.generate_follow_up_questions(query, local["consultation_type"])
+
+        yield {
+            "stage": "complete",
+            "result": {
+                "consultation_type": local["consultation_type"],
+                "people_analysis": local["people_analysis"],
+                "advice": advice,
+                "advice_metadata": metadata,
+                "pending_advice": pending,
+                "follow_up_questions": follow_up,
+                "context": local["context"]
+            }
+        }
+
+    def iter_local(
+        self,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """API を使わないローカル分析だけを順に返す（入力中の先読み用）
+
+        Yields:
+            iter_consultation() の "person" / "compatibility" イベント
+            {"stage": "local", "local": Dict}  （最後。iter_consultation(local_events=...) に渡す）
+        """
+        local = yield from self._iter_local(query, people, additional_context)
+        yield {"stage": "local", "local": local}
+
+    def _replay_local(self, events: Iterable[Dict]) -> Generator[Dict, None, Dict]:
+        """iter_local() のイベント列を返し直し、最後の集計結果を返す"""
+        for event in events:
+            if event["stage"] == "local":
+                return event["local"]
+            yield event
+        raise ValueError("local_events に集計結果（stage=local）がありません")
+
+    def prepare_consultation(
+        self,
+        consultation_id: str,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None
+    ) -> Dict:
+        """アドバイス生成以外の分析を済ませた相談（BatchRunner の入力形式）
+
+        Returns:
+            {"id", "query", "consultation_type", "people_analysis", "context"}
+        """
+        local = self._analyze_local(query, people, additional_context)
+        return {"id": consultation_id, "query": query, **local}
+
+    def _analyze_local(
+        self,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None
+    ) -> Dict:
+        """API を使わないローカル計算
+
+        Returns:
+            {"consultation_type": str, "people_analysis": Dict, "context": Dict}
+        """
+        events = self._iter_local(query, people, additional_context)
+        while True:
+            try:
+                next(events)
+            except StopIteration as stop:
+                return stop.value
+
+    def _iter_local(
+        self,
+        query: str,
+        people: List[PersonProfile],
+        additional_context: Optional[Dict] = None
+    ) -> Generator[Dict, None, Dict]:
+        """ローカル計算（人物・相性ごとにイベントを返し、最後に集計結果を返す）"""
         # 1. 相談タイプ分類
         consultation_type = self.hearing.classify_consultation(query)
         
-        # 2. 各人物の命式分析
+        # 2. 各人物の命式分析（同一命式は1回だけ計算）
         people_analysis = {}
+        charts = {}  # {fingerprint: (最初の人物キー, 分析結果)}
         
-        for person in people:
-            analysis = self._analyze_person(person)
-            people_analysis[person.name] = analysis
+        for key, person in zip(self._person_keys(people), people):
+            fingerprint = chart_fingerprint(person)
+            if fingerprint in charts:
+                first_key, cached = charts[fingerprint]
+                analysis = dict(cached, same_as=first_key)
+            else:
+                analysis = self._analyze_person(person)
+                charts[fingerprint] = (key, analysis)
+            people_analysis[key] = analysis
+            yield {"stage": "person", "name": key, "analysis": analysis}
         
         # 3. 相性分析（2人以上の場合）
         if len(people) >= 2:
-            compatibility = self._analyze_compatibility(people)
+            analyses = list(people_analysis.values())
+            compatibility = self._analyze_compatibility(people, analyses[:2])
             people_analysis['compatibility'] = compatibility
+            yield {"stage": "compatibility", "compatibility": compatibility}
         
         # 4. コンテキスト抽出
         context = self.hearing.extract_implicit_info(query)
         if additional_context:
             context['additional_context'] = additional_context
         
-        # 5. アドバイス生成
-        advice = self.consultant.generate_advice(
-            query=query,
-            consultation_type=consultation_type,
-            people_analysis=people_analysis,
-            context=context
-        )
-        
-        # 6. フォローアップ質問生成
-        follow_up = self.hearing.generate_follow_up_questions(query, consultation_type)
-        
         return {
             "consultation_type": consultation_type,
             "people_analysis": people_analysis,
-            "advice": advice,
-            "follow_up_questions": follow_up,
             "context": context
         }
     
+    @staticmethod
+    def _person_keys(people: List[PersonProfile]) -> List[str]:
+        """人物ごとに一意なキーを生成（同名は「名前 (2)」のように連番）
+
+        "compatibility" は相性分析の予約キーのため人物キーには使わない。
+        """
+        taken = {"compatibility"}
+        keys = []
+
+        for person in people:
+            key = person.name
+            n = 2
+            while key in taken:
+                key = f"{person.name} ({n})"
+                n += 1
+            taken.add(key)
+            keys.append(key)
+
+        return keys
+
     def _analyze_person(self, person: PersonProfile) -> Dict:
         """個人の命式分析"""
         
@@ -97,6 +471,7 @@ class IntegratedAnalyzer:
         gogyo_type, gogyo_meaning = get_gogyo_meaning(day_kan)
         
         return {
+            "fingerprint": chart_fingerprint(person),
             "pillars": result["pillars"],
             "day_kan": day_kan,
             "season": result["season"],
@@ -107,18 +482,30 @@ class IntegratedAnalyzer:
             "gogyo_meaning": gogyo_meaning,
         }
     
-    def _analyze_compatibility(self, people: List[PersonProfile]) -> Dict:
-        """相性分析（簡易版）"""
+    def _analyze_compatibility(
+        self,
+        people: List[PersonProfile],
+        analyses: Optional[List[Dict]] = None
+    ) -> Dict:
+        """相性分析（簡易版）
+
+        Args:
+            people: 関係者リスト
+            analyses: 計算済みの命式分析（先頭2人分、省略時は再計算）
+        """
         
         if len(people) < 2:
             return {}
         
         # 2人の場合の相性分析
-        person1_result = self.meishiki_engine.judge_yojin(people[0].birth_date)
-        person2_result = self.meishiki_engine.judge_yojin(people[1].birth_date)
+        if analyses is None:
+            analyses = [
+                self.meishiki_engine.judge_yojin(person.birth_date)
+                for person in people[:2]
+            ]
         
-        day_kan1 = person1_result["pillars"]["day"]["kan"]
-        day_kan2 = person2_result["pillars"]["day"]["kan"]
+        day_kan1 = analyses[0]["pillars"]["day"]["kan"]
+        day_kan2 = analyses[1]["pillars"]["day"]["kan"]
         
         # 五行の相生相克を簡易判定
         score, relation = self._calculate_compatibility_score(day_kan1, day_kan2)
@@ -132,59 +519,4 @@ class IntegratedAnalyzer:
     
     def _calculate_compatibility_score(self, kan1: str, kan2: str) -> tuple:
         """相性スコア計算（簡易版）"""
-        
-        # 五行マッピング
-        gogyo_map = {
-            "甲": "木", "乙": "木",
-            "丙": "火", "丁": "火",
-            "戊": "土", "己": "土",
-            "庚": "金", "辛": "金",
-            "壬": "水", "癸": "水",
-        }
-        
-        element1 = gogyo_map.get(kan1, "不明")
-        element2 = gogyo_map.get(kan2, "不明")
-        
-        # 相生関係
-        sheng = {
-            "木": "火", "火": "土", "土": "金",
-            "金": "水", "水": "木"
-        }
-        
-        # 相克関係
-        ke = {
-            "木": "土", "土": "水", "水": "火",
-            "火": "金", "金": "木"
-        }
-        
-        score = 50  # 基準点
-        relation = ""
-        
-        # 同じ五行
-        if element1 == element2:
-            score = 60
-            relation = f"同じ{element1}の性質を持つ（似た者同士）"
-        
-        # 相生関係
-        elif sheng.get(element1) == element2:
-            score = 80
-            relation = f"{element1}が{element2}を生み出す（相生・良好な関係）"
-        
-        elif sheng.get(element2) == element1:
-            score = 75
-            relation = f"{element2}が{element1}を生み出す（相生・サポート関係）"
-        
-        # 相克関係
-        elif ke.get(element1) == element2:
-            score = 40
-            relation = f"{element1}が{element2}を抑制（相克・緊張関係）"
-        
-        elif ke.get(element2) == element1:
-            score = 45
-            relation = f"{element2}が{element1}を抑制（相克・刺激関係）"
-        
-        else:
-            score = 55
-            relation = "特に強い関係性はない（中立）"
-        
-        return score, relation
+        return calculate_compatibility_score(kan1, kan2)
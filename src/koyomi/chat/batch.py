@@ -0,0 +1,288 @@
+"""
+大量相談のバッチ生成
+
+Zone: Logic
+責務: 数千件規模の相談をバッチジョブにまとめて投入し、完了をポーリングして
+      結果を JSONL に逐次書き出す（中断後はチェックポイントから再開）
+
+設計思想:
+- 入力はアドバイス生成以外の分析を済ませた相談
+  （IntegratedAnalyzer.prepare_consultation() の形式）
+- リクエスト本体は KoyomiConsultant.build_request() と同じ（プロンプトキャッシュも効く）
+- バックエンドは共通インターフェース（submit / knows / is_done / results）
+  - MessageBatchBackend: Message Batches API（非同期・レート制限の対象外）
+  - LocalBatchBackend: resilient_create を並列実行（Batches API を使えない環境・疑似サーバー用）
+- 書き出し済みかどうかは出力 JSONL 自体で判定し、チェックポイントには投入済みバッチだけを記録
+  → 再開時は書き出し済みを飛ばし、投入済みバッチは再投入せずにポーリングを続ける
+  → バックエンドが知らないバッチ（ローカル実行の中断など）は再投入する
+- 失敗した相談（errored / expired / canceled）はルールベースのアドバイスで補完
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from src.koyomi.chat.map_reduce import DEFAULT_MAX_PARALLEL, map_bounded
+from src.koyomi.chat.prompt_cache import usage_to_dict
+from src.koyomi.chat.resilience import call_with_retry, failure_reason, resilient_create
+
+
+logger = logging.getLogger("koyomi.llm")
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_POLL_INTERVAL = 30.0
+
+
+def _succeeded(message) -> Dict:
+    return {"text": message.content[0].text, "source": "api", "usage": usage_to_dict(message.usage)}
+
+
+def _failed(reason: str) -> Dict:
+    return {"source": "fallback", "fallback_reason": reason}
+
+
+class MessageBatchBackend:
+    """Message Batches API（client.messages.batches）"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[Dict]) -> str:
+        """[{"custom_id", "params"}] を投入してバッチIDを返す"""
+        batch = call_with_retry(lambda: self.client.messages.batches.create(requests=requests))
+        return batch.id
+
+    def knows(self, batch_id: str) -> bool:
+        return True
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Dict]]:
+        """(custom_id, {"text", "source", "usage"} または {"source": "fallback", "fallback_reason"})"""
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, _succeeded(entry.result.message)
+            else:
+                yield entry.custom_id, _failed(f"batch_{entry.result.type}")
+
+
+class LocalBatchBackend:
+    """Batches API の代替（プロセス内で並列に messages.create を呼ぶ）
+
+    バッチは投入順に1つずつ実行する。プロセスをまたいだ再開はできない
+    （再開時は knows() が False になり、BatchRunner が再投入する）。
+    """
+
+    def __init__(self, client, max_parallel: int = DEFAULT_MAX_PARALLEL):
+        self.client = client
+        self.max_parallel = max_parallel
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="koyomi-batch")
+        self._jobs: Dict[str, Future] = {}
+
+    def submit(self, requests: List[Dict]) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        self._jobs[batch_id] = self._executor.submit(
+            map_bounded, self._run_one, requests, self.max_parallel
+        )
+        return batch_id
+
+    def knows(self, batch_id: str) -> bool:
+        return batch_id in self._jobs
+
+    def is_done(self, batch_id: str) -> bool:
+        return self._jobs[batch_id].done()
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Dict]]:
+        yield from self._jobs.pop(batch_id).result()
+
+    def _run_one(self, request: Dict) -> Tuple[str, Dict]:
+        try:
+            message = resilient_create(self.client, **request["params"])
+        except Exception as e:
+            logger.warning("バッチ内のAPI呼び出しエラー: %s", e)
+            return request["custom_id"], _failed(failure_reason(e))
+        return request["custom_id"], _succeeded(message)
+
+
+class BatchRunner:
+    """相談の列をバッチ投入し、結果を JSONL に書き出す
+
+    出力1行: {"id", "consultation_type", "advice", "source", "usage", "fallback_reason"(任意)}
+
+    使用例:
+        runner = BatchRunner(consultant, MessageBatchBackend(consultant.client), "advice.jsonl")
+        runner.run(analyzer.prepare_consultation(...) for ... in ...)
+    """
+
+    def __init__(
+        self,
+        consultant,
+        backend,
+        output_path: Union[str, Path],
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            consultant: KoyomiConsultant（リクエスト構築・失敗時の補完に使う）
+            backend: MessageBatchBackend / LocalBatchBackend
+            output_path: 結果の JSONL（追記）
+            checkpoint_path: チェックポイント（省略時は output_path + ".checkpoint.json"）
+            batch_size: 1バッチあたりの相談数
+            poll_interval: 完了確認の間隔（秒）
+            sleep: 待機関数（テスト用）
+        """
+        self.consultant = consultant
+        self.backend = backend
+        self.output_path = Path(output_path)
+        self.checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint.json")
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+
+    def run(self, consultations: Iterable[Dict]) -> Dict:
+        """全件を投入し、全バッチの結果を書き出すまで待つ
+
+        Args:
+            consultations: {"id", "query", "consultation_type", "people_analysis", "context"} の列
+                （再開時も同じ列を渡す）
+
+        Returns:
+            {"submitted": 投入した相談数, "written": 書き出した件数, "skipped": 書き出し済み・投入済みの件数}
+        """
+        written = self._written_ids()
+        # {バッチID: {custom_id: 相談ID}}
+        pending: Dict[str, Dict[str, str]] = {
+            batch_id: mapping
+            for batch_id, mapping in self._load_checkpoint().items()
+            if self.backend.knows(batch_id)
+        }
+        in_flight = {cid for mapping in pending.values() for cid in mapping.values()}
+        stats = {"submitted": 0, "written": 0, "skipped": 0}
+
+        by_id: Dict[str, Dict] = {}
+        chunk: List[Dict] = []
+        for item in consultations:
+            by_id[item["id"]] = item
+            if item["id"] in written or item["id"] in in_flight:
+                stats["skipped"] += 1
+                continue
+            chunk.append(item)
+            if len(chunk) >= self.batch_size:
+                stats["submitted"] += self._submit(chunk, pending)
+                chunk = []
+        if chunk:
+            stats["submitted"] += self._submit(chunk, pending)
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output_path, "a", encoding="utf-8") as out:
+            if self._has_partial_line():
+                out.write("\n")
+            while pending:
+                finished = [batch_id for batch_id in pending if self.backend.is_done(batch_id)]
+                if not finished:
+                    self.sleep(self.poll_interval)
+                    continue
+                for batch_id in finished:
+                    stats["written"] += self._collect(
+                        batch_id, pending[batch_id], by_id, written, out
+                    )
+                    del pending[batch_id]
+                    self._save_checkpoint(pending)
+
+        return stats
+
+    def _submit(self, chunk: List[Dict], pending: Dict[str, Dict[str, str]]) -> int:
+        requests = []
+        mapping = {}
+        for index, item in enumerate(chunk):
+            custom_id = f"req-{index}"
+            mapping[custom_id] = item["id"]
+            requests.append({
+                "custom_id": custom_id,
+                "params": self.consultant.build_request(
+                    item["query"], item["consultation_type"],
+                    item["people_analysis"], item.get("context", {})
+                ),
+            })
+        pending[self.backend.submit(requests)] = mapping
+        self._save_checkpoint(pending)
+        return len(chunk)
+
+    def _collect(
+        self,
+        batch_id: str,
+        mapping: Dict[str, str],
+        by_id: Dict[str, Dict],
+        written: Set[str],
+        out
+    ) -> int:
+        """1バッチ分の結果を書き出す（結果が返らなかった相談もルールベースで補完）"""
+        results = dict(self.backend.results(batch_id))
+        count = 0
+        for custom_id, consultation_id in mapping.items():
+            item = by_id.get(consultation_id)
+            if item is None or consultation_id in written:
+                continue
+            result = results.get(custom_id) or _failed("batch_missing")
+            if result["source"] == "fallback":
+                result = self.consultant.fallback_advice(
+                    item["query"], item["consultation_type"], item["people_analysis"],
+                    item.get("context", {}), reason=result["fallback_reason"]
+                )
+            record = {
+                "id": consultation_id,
+                "consultation_type": item["consultation_type"],
+                "advice": result["text"],
+                "source": result["source"],
+                "usage": result["usage"],
+            }
+            if "fallback_reason" in result:
+                record["fallback_reason"] = result["fallback_reason"]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            written.add(consultation_id)
+            count += 1
+        return count
+
+    def _written_ids(self) -> Set[str]:
+        """出力済みの相談ID（途中で切れた最終行は無視）"""
+        if not self.output_path.exists():
+            return set()
+        ids = set()
+        with open(self.output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ids.add(json.loads(line)["id"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        return ids
+
+    def _has_partial_line(self) -> bool:
+        """出力の最終行が改行で終わっていないか（書き込み中の中断）"""
+        if not self.output_path.exists() or self.output_path.stat().st_size == 0:
+            return False
+        with open(self.output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, str]]:
+        if not self.checkpoint_path.exists():
+            return {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("batches", {})
+
+    def _save_checkpoint(self, pending: Dict[str, Dict[str, str]]):
+        """アトミックに書き込み（tmp → rename）"""
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"batches": pending}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
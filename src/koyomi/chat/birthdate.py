@@ -0,0 +1,216 @@
+"""
+生年月日の抽出（自由記述の回答から）
+
+Zone: Logic
+責務: チャットの回答文から生年月日（と出生時刻・人物名）をすべて取り出し、PersonProfile にする
+
+対応する表記:
+    1990年6月15日 / 1990/6/15 / 1990-06-15 / 1990.6.15
+    平成2年6月15日 / 平成元年1月8日 / H2.6.15 / S60/3/3（明治・大正・昭和・平成・令和）
+    全角数字・全角記号（NFKC で半角に揃える）、「㍻」などの合字
+    時刻: 10:30 / 10時30分 / 10時半 / 午後3時（日付の直後のみ）
+
+設計思想:
+- パターンは import 時に1回だけコンパイルした正規表現1つ。回答文の走査は finditer の1回だけ
+  → 毎ターン実行しても回答1件あたり数マイクロ秒（scripts/benchmark_birthdate.py）
+- 1つの回答に複数人の日付があってもよい。人物名は「直前の日付の後ろからこの日付まで」の末尾から取る
+  （「山田さんは1990/6/15、佐藤さんは…」→ 山田 / 佐藤）
+- 実在しない日付（2月30日、平成40年、昭和64年3月1日など）は無視する。時刻だけが不正なら日付は採用する
+  → 和暦は元号の開始日〜終了日の範囲だけを有効とする（昭和64年は1月7日まで）
+- 未来の日付（締め切り・予定日など）は生年月日ではないため無視する
+- 時刻がない場合は roster と同じく正午で計算し、birth_time は None（時柱は使わない）
+"""
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from src.koyomi.chat.hearing import PersonProfile
+
+
+# 元号: (開始日, 終了日)。現在の元号の終了日は None
+ERAS = {
+    "明治": (date(1868, 1, 25), date(1912, 7, 29)),
+    "大正": (date(1912, 7, 30), date(1926, 12, 24)),
+    "昭和": (date(1926, 12, 25), date(1989, 1, 7)),
+    "平成": (date(1989, 1, 8), date(2019, 4, 30)),
+    "令和": (date(2019, 5, 1), None),
+}
+ERA_INITIALS = {"m": "明治", "t": "大正", "s": "昭和", "h": "平成", "r": "令和"}
+
+_ERA = "|".join(ERAS)
+_TIME = r"""
+    (?:[\s、,の]*(?:生まれ[\s、,の]*)?
+       (?P<ampm>午前|午後|am|pm)?\s*
+       (?P<hour>\d{1,2})\s*(?::\s*(?P<minute>\d{2})|時(?:\s*(?P<kminute>\d{1,2})\s*分|(?P<half>半))?)
+    )?
+"""
+BIRTHDATE_PATTERN = re.compile(
+    r"""
+    (?<![\d])
+    (?:
+        # 1990年6月15日 / 平成2年6月15日 / 平成元年…
+        (?:(?P<era>""" + _ERA + r""")\s*(?P<era_year>元|\d{1,2})|(?:西暦\s*)?(?P<year>\d{4}))
+        \s*年\s*(?P<month>\d{1,2})\s*月\s*(?P<day>\d{1,2})(?!\d)\s*日?
+      |
+        # 1990/6/15 / H2.6.15 / 平成2.6.15
+        (?:(?P<era2>""" + _ERA + r"""|(?<![a-z])[mtshr])\s*(?P<era_year2>元|\d{1,2})
+          |(?P<year2>\d{4}))
+        (?P<sep>[/\-.])(?P<month2>\d{1,2})(?P=sep)(?P<day2>\d{1,2})(?!\d)
+    )
+    """ + _TIME,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+# 人物名（日付の直前の文の末尾）
+_LABEL = re.compile(
+    r"""
+    (?P<label>[^\s、,。.;:()「」『』【】/・と]+?)
+    (?:さん|くん|君|ちゃん|氏|様)?
+    (?:の(?:生年月日|誕生日|生まれ))?
+    (?:は|が|も|で)?
+    (?:生まれ)?
+    [\s、,:=(\[]*$
+    """,
+    re.VERBOSE,
+)
+# 人物名として扱わない語（一人称は名前なし＝質問の役割名になる）
+_NOT_NAMES = {
+    "生年月日", "誕生日", "生まれ", "西暦", "和暦", "日付", "年", "月", "日",
+    "私", "わたし", "僕", "ぼく", "俺", "自分", "あたし",
+    "相手", "本人", "あなた", "それから", "あと", "また", "次",
+}
+MAX_NAME_LENGTH = 12
+# 「候補者の鈴木」「既存は佐藤」の助詞（前後がひらがなの場合は名前の一部として残す: 「はるか」）
+_PARTICLE = re.compile(r"(?<![\u3041-\u309f])[のはが](?![\u3041-\u309f])")
+
+
+class BirthdateMention:
+    """回答文中の生年月日1件"""
+
+    __slots__ = ("name", "birth_date", "birth_time", "span")
+
+    def __init__(
+        self,
+        name: Optional[str],
+        birth_date: datetime,
+        birth_time: Optional[datetime],
+        span: Tuple[int, int]
+    ):
+        """
+        Args:
+            name: 直前に書かれた人物名（なければ None）
+            birth_date: 生年月日（時刻がなければ正午）
+            birth_time: 出生時刻（なければ None）
+            span: 正規化後の回答文での位置
+        """
+        self.name = name
+        self.birth_date = birth_date
+        self.birth_time = birth_time
+        self.span = span
+
+    def to_profile(self, role: str, default_name: Optional[str] = None) -> PersonProfile:
+        """PersonProfile に変換（名前がなければ default_name、それもなければ役割名）"""
+        return PersonProfile(
+            name=self.name or default_name or role,
+            role=role,
+            birth_date=self.birth_date,
+            birth_time=self.birth_time,
+        )
+
+    def __repr__(self):
+        return (
+            f"BirthdateMention({self.name!r}, {self.birth_date.isoformat()}, "
+            f"has_time={self.birth_time is not None})"
+        )
+
+
+def _era(name: Optional[str]) -> Optional[str]:
+    """元号名（頭文字 M/T/S/H/R も元号名にする）。西暦なら None"""
+    if name is None:
+        return None
+    return ERA_INITIALS.get(name.lower(), name)
+
+
+def _year(era: Optional[str], era_year: Optional[str], year: Optional[str]) -> int:
+    if era is None:
+        return int(year)
+    n = 1 if era_year == "元" else int(era_year)
+    return ERAS[era][0].year + n - 1
+
+
+def _in_era(era: str, day: date) -> bool:
+    start, end = ERAS[era]
+    return start <= day and (end is None or day <= end)
+
+
+def _time(match) -> Optional[Tuple[int, int]]:
+    """(時, 分)。時刻なし・不正な時刻は None"""
+    if match.group("hour") is None:
+        return None
+    hour = int(match.group("hour"))
+    minute = match.group("minute") or match.group("kminute")
+    minute = 30 if match.group("half") else int(minute or 0)
+    ampm = (match.group("ampm") or "").lower()
+    if ampm in ("午後", "pm") and hour < 12:
+        hour += 12
+    elif ampm in ("午前", "am") and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _name(text: str) -> Optional[str]:
+    match = _LABEL.search(text)
+    if not match:
+        return None
+    name = _PARTICLE.split(match.group("label"))[-1]
+    if not name or name in _NOT_NAMES or name.isdigit() or len(name) > MAX_NAME_LENGTH:
+        return None
+    if name.isascii() and name.islower():  # "and" などの英単語
+        return None
+    return name
+
+
+def extract_birthdates(text: str, today: Optional[date] = None) -> List[BirthdateMention]:
+    """回答文に含まれる生年月日をすべて抽出（出現順）
+
+    Args:
+        text: 回答文
+        today: これより後の日付は生年月日として扱わない（省略時は今日）
+    """
+    text = unicodedata.normalize("NFKC", text)
+    today = today or date.today()
+    mentions = []
+    previous_end = 0
+
+    for match in BIRTHDATE_PATTERN.finditer(text):
+        if match.group("month") is not None:
+            era = _era(match.group("era"))
+            year = _year(era, match.group("era_year"), match.group("year"))
+            month, day = match.group("month"), match.group("day")
+        else:
+            era = _era(match.group("era2"))
+            year = _year(era, match.group("era_year2"), match.group("year2"))
+            month, day = match.group("month2"), match.group("day2")
+
+        clock = _time(match)
+        try:
+            birth_date = datetime(year, int(month), int(day), *(clock or (12, 0)))
+        except ValueError:
+            continue
+        if era is not None and not _in_era(era, birth_date.date()):
+            continue
+        if birth_date.date() > today:
+            continue
+
+        mentions.append(BirthdateMention(
+            name=_name(text[previous_end:match.start()]),
+            birth_date=birth_date,
+            birth_time=birth_date if clock else None,
+            span=match.span(),
+        ))
+        previous_end = match.end()
+
+    return mentions
@@ -0,0 +1,139 @@
+"""
+Anthropic クライアントの共有レジストリ
+
+Zone: Logic
+責務: APIキーごとに Anthropic クライアントを1つだけ生成し、プロセス全体で再利用
+
+設計思想:
+- IntegratedAnalyzer / AdviceGenerator はリクエスト毎に生成されるが、
+  HTTP接続プール（TLS・keep-alive）はクライアントと一緒に使い回す
+- キーはAPIキーのハッシュ（APIキーそのものは辞書のキーに残さない）
+- 上限件数を超えたら最終利用が古い順に、一定時間使われないものは都度破棄
+- 破棄はレジストリからの参照解除のみ（利用中のインスタンスを壊さない）。
+  接続は最後の参照が消えた時点でクライアント側が閉じる
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+DEFAULT_MAX_CLIENTS = 32
+DEFAULT_IDLE_SECONDS = 600  # 10分
+
+
+def _default_factory(api_key: str, base_url: Optional[str] = None) -> Any:
+    """Anthropic クライアント生成
+
+    Raises:
+        ImportError: anthropic パッケージ未インストール
+    """
+    from anthropic import Anthropic
+    # リトライは resilience.py で行う（二重リトライ防止）
+    return Anthropic(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+def _registry_key(api_key: str, base_url: Optional[str]) -> str:
+    payload = f"{base_url or ''}\n{api_key}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    """APIキー単位のクライアントレジストリ（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        factory: Callable[..., Any] = _default_factory,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS
+    ):
+        """
+        Args:
+            factory: factory(api_key=..., base_url=...) でクライアントを返す関数
+            max_clients: 保持するクライアント数の上限
+            idle_seconds: この秒数使われなかったクライアントは破棄
+        """
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[str, list]" = OrderedDict()  # {key: [client, last_used]}
+        self._stats = {"created": 0, "reused": 0, "evicted": 0}
+
+    def get(self, api_key: str, base_url: Optional[str] = None) -> Any:
+        """クライアント取得（なければ生成）
+
+        Args:
+            api_key: Anthropic API key
+            base_url: API のベースURL（省略時は既定）
+
+        Raises:
+            ValueError: api_key が空
+        """
+        if not api_key:
+            raise ValueError("api_key is required")
+
+        key = _registry_key(api_key, base_url)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                self._stats["reused"] += 1
+                return entry[0]
+
+            client = self.factory(api_key=api_key, base_url=base_url)
+            self._clients[key] = [client, now]
+            self._stats["created"] += 1
+
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self._stats["evicted"] += 1
+
+            return client
+
+    def _evict_idle(self, now: float):
+        """アイドル時間を超えたクライアントを破棄（ロック内で呼ぶ）"""
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            del self._clients[key]
+            self._stats["evicted"] += 1
+
+    def clear(self):
+        """全クライアントを破棄"""
+        with self._lock:
+            self._stats["evicted"] += len(self._clients)
+            self._clients.clear()
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            {"size", "created", "reused", "evicted"}
+        """
+        with self._lock:
+            return {"size": len(self._clients), **self._stats}
+
+
+_registry = ClientRegistry()
+
+
+def get_registry() -> ClientRegistry:
+    """プロセス共有のレジストリを取得"""
+    return _registry
+
+
+def get_client(api_key: str, base_url: Optional[str] = None) -> Any:
+    """プロセス共有の Anthropic クライアントを取得
+
+    Raises:
+        ImportError: anthropic パッケージ未インストール
+        ValueError: api_key が空
+    """
+    return _registry.get(api_key, base_url=base_url)
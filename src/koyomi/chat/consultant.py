@@ -1,26 +1,172 @@
 """
 AIコンサルタント - Claude APIを使った自然言語アドバイス生成
 """
+import logging
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.koyomi.chat.advice import GOGYO_REFERENCE
+from src.koyomi.chat.client_pool import get_client
+from src.koyomi.chat.prompt_cache import (
+    cached_text_block,
+    system_text,
+    text_block,
+    usage_to_dict,
+)
+from src.koyomi.chat.prompt_compact import compact_people_section, estimate_tokens
+from src.koyomi.chat.map_reduce import (
+    DEFAULT_MAX_PARALLEL,
+    get_summary_cache,
+    map_bounded,
+    sum_usage,
+)
+from src.koyomi.chat.resilience import failure_reason, resilient_create, resilient_stream
+from src.koyomi.chat.metrics import instrument_stream, record_advice
+from src.koyomi.chat.output_budget import get_output_budget, is_truncated
+from src.koyomi.storage.advice_cache import AdviceCache, get_advice_cache
+
+
+logger = logging.getLogger("koyomi.llm")
+
+# 期限切れ後も API 呼び出しを続けるためのワーカー（プロセス共有）
+_background_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="koyomi-advice")
+
+
+def collect_advice_events(events: Iterator[Dict]) -> Dict:
+    """stream_advice() のイベント列を generate_advice_with_metadata() の形式にまとめる
+
+    Returns:
+        {"text", "source", "usage"}
+        （done イベントに "fallback_reason" / "pending" があれば含める）
+    """
+    result = {"text": "", "source": "fallback", "usage": usage_to_dict(None)}
+    for event in events:
+        if event["type"] == "delta":
+            result["text"] += event["text"]
+        elif event["type"] == "fallback":
+            result["text"] = event["text"]
+        elif event["type"] == "done":
+            result["source"] = event["source"]
+            result["usage"] = event["usage"]
+            for key in ("fallback_reason", "pending"):
+                if key in event:
+                    result[key] = event[key]
+    return result
+
+
+def _done_event(result: Dict) -> Dict:
+    """generate_advice_with_metadata() 形式の結果から done イベントを作る"""
+    event = {"type": "done", "source": result["source"], "usage": result["usage"]}
+    if "fallback_reason" in result:
+        event["fallback_reason"] = result["fallback_reason"]
+    return event
 
 
 class KoyomiConsultant:
     """暦 KOYOMI AIコンサルタント"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    MODEL = "claude-sonnet-4-20250514"
+    MAX_TOKENS = 2000
+
+    # 相談タイプ別の観点（全タイプ分を共通プロンプトに含め、リクエストでは重視する見出しだけ指定）
+    TYPE_SPECIFIC_PROMPTS = {
+        "hiring": "\n【採用判断のポイント】\n- 既存チームとの相性\n- 役割の適性\n- 育成の方向性",
+        "team": "\n【チーム編成のポイント】\n- 各メンバーの強み活用\n- 役割分担の明確化\n- コミュニケーション設計",
+        "timing": "\n【タイミング判断のポイント】\n- 運気の流れ\n- 準備状況の確認\n- 外部環境の考慮",
+        "partnership": "\n【パートナーシップのポイント】\n- 補完関係の有無\n- 役割分担の設計\n- リスク分散の方法",
+    }
+
+    # 全リクエスト共通の静的プロンプト（変更するとプロンプトキャッシュが無効になる）
+    # 参照資料と全タイプの観点まで含めて、キャッシュの最小長（1024 トークン）を超える
+    SYSTEM_PROMPT = """あなたは四柱推命の専門家であり、経営コンサルタントです。
+
+【あなたの役割】
+- 経営者・起業家の意思決定をサポート
+- 人間関係の最適化アドバイス
+- 具体的で実行可能な提案
+
+【アドバイスの条件】
+1. 専門用語は最小限に（必要なら簡単に説明）
+2. 具体的な行動を3つ以上示す
+3. タイミングも明示（いつやるべきか）
+4. リスクも正直に伝える
+5. 理由を明確に説明
+6. 経営者が意思決定できるレベルの情報
+
+【出力形式】
+## 総合判断
+結論を1-2文で端的に
+
+## 理由
+なぜそう判断したか（命式の特徴から）
+
+## 具体的なアドバイス
+1. すぐやるべきこと
+2. 中期的な対策
+3. 注意すべきポイント
+
+## タイミング
+いつ実行すべきか、避けるべき時期
+
+## リスクと対策
+想定されるリスクと回避方法
+
+ユーザーメッセージの【相談内容】【命式分析結果】【相性分析】【状況】をもとに、
+具体的で実行可能なアドバイスをしてください。
+""" + GOGYO_REFERENCE + "\n【相談タイプ別の観点】" + "".join(TYPE_SPECIFIC_PROMPTS.values()) + "\n"
+
+    # クイック回答（相談タイプ別の観点の後ろに置く → 共通部分のキャッシュは維持）
+    QUICK_ANSWER_PROMPT = """
+【クイック回答】
+「総合判断」（1-2文）と「具体的なアドバイス」（3つ、各1文）だけを、400字以内で簡潔に答えてください。
+"""
+
+    # Map-Reduce の人物要約用（相談内容に依存しない → 命式ごとに再利用できる）
+    # 短くキャッシュの最小長に届かないため cache_control は付けない
+    SUMMARY_MAX_TOKENS = 300
+    SUMMARY_SYSTEM_PROMPT = """あなたは四柱推命の専門家です。
+ユーザーメッセージの命式分析結果から、この人物の仕事上の特性を
+経営者向けに3行以内で要約してください（強み・注意点・活かし方）。
+専門用語と前置きは不要です。
+"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        compact: bool = False,
+        prompt_token_budget: Optional[int] = None,
+        map_reduce_min_people: Optional[int] = None,
+        max_parallel: int = DEFAULT_MAX_PARALLEL,
+        quick: bool = False
+    ):
         """
         Args:
             api_key: Anthropic API key（環境変数 ANTHROPIC_API_KEY で設定可）
+            base_url: API のベースURL（環境変数 ANTHROPIC_BASE_URL で設定可。
+                疑似サーバーを使う場合など）
+            compact: 命式分析結果を表形式のコンパクト表現で送る（大人数向け）
+            prompt_token_budget: compact時のユーザープロンプトのトークン上限（概算）
+            map_reduce_min_people: この人数以上なら Map-Reduce で生成（None で無効）
+            max_parallel: Map-Reduce の人物要約の同時実行数
+            quick: クイック回答（結論と行動だけの短い回答。出力が短いぶん速く返る）
         """
         self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+        self.base_url = base_url or os.environ.get("ANTHROPIC_BASE_URL")
+        self.compact = compact
+        self.prompt_token_budget = prompt_token_budget
+        self.map_reduce_min_people = map_reduce_min_people
+        self.max_parallel = max_parallel
+        self.quick = quick
         self.use_api = bool(self.api_key)
         
         if self.use_api:
             try:
-                from anthropic import Anthropic
-                self.client = Anthropic(api_key=self.api_key)
+                self.client = get_client(self.api_key, base_url=self.base_url)
             except ImportError:
                 print("Warning: anthropic パッケージがインストールされていません")
                 print("pip install anthropic でインストールしてください")
@@ -31,7 +177,9 @@ class KoyomiConsultant:
         query: str,
         consultation_type: str,
         people_analysis: Dict,
-        context: Dict
+        context: Dict,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None
     ) -> str:
         """
         具体的なアドバイスを生成
@@ -41,91 +189,512 @@ class KoyomiConsultant:
             consultation_type: 相談タイプ
             people_analysis: 命式分析結果
             context: 追加のコンテキスト情報
+            user_id: サブスクユーザーID（指定時のみ応答をキャッシュ）
+            deadline: 最初のトークンを待つ秒数（超えたらフォールバックを即座に返す）
         
         Returns:
             自然言語の具体的アドバイス
         """
+        return self.generate_advice_with_metadata(
+            query, consultation_type, people_analysis, context,
+            user_id=user_id, deadline=deadline
+        )["text"]
+
+    def generate_advice_with_metadata(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        アドバイスを生成し、応答のメタデータも返す
+
+        Args:
+            generate_advice() と同じ
+
+        Returns:
+            {
+                "text": str,
+                "source": "api" | "cache" | "fallback",
+                "usage": {"input_tokens", "output_tokens",
+                          "cache_creation_input_tokens", "cache_read_input_tokens"},
+                "fallback_reason": str  （source が "fallback" の場合のみ）,
+                "pending": Future  （deadline 超過時のみ。API の結果を同じ形式で返す）
+            }
+        """
+        # deadline 付きはストリーミング経由（計測も stream_advice 側で行う）
+        if self.use_api and deadline is not None and not self._use_map_reduce(people_analysis):
+            return collect_advice_events(self.stream_advice(
+                query, consultation_type, people_analysis, context,
+                user_id=user_id, deadline=deadline
+            ))
+
+        started = time.perf_counter()
         if self.use_api:
-            return self._generate_with_api(query, consultation_type, people_analysis, context)
+            if self._use_map_reduce(people_analysis):
+                result = self.generate_advice_map_reduce(
+                    query, consultation_type, people_analysis, context, user_id=user_id
+                )
+            else:
+                result = self._generate_with_api(
+                    query, consultation_type, people_analysis, context, user_id=user_id
+                )
         else:
-            return self._generate_fallback(query, consultation_type, people_analysis, context)
+            result = self._fallback_result(query, consultation_type, people_analysis, context)
+
+        record_advice(
+            "consultant", consultation_type, "sync", result, time.perf_counter() - started
+        )
+        return result
     
-    def _generate_with_api(
+    def _use_map_reduce(self, people_analysis: Dict) -> bool:
+        """Map-Reduce で生成すべき人数か"""
+        if self.map_reduce_min_people is None:
+            return False
+        people = sum(1 for name in people_analysis if name != 'compatibility')
+        return people >= self.map_reduce_min_people
+
+    def generate_advice_map_reduce(
         self,
         query: str,
         consultation_type: str,
         people_analysis: Dict,
+        context: Dict,
+        user_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Map-Reduce でアドバイスを生成（大人数向け）
+
+        1. map: 人物ごとの短い要約を並列に生成（命式フィンガープリント単位でキャッシュ）
+        2. reduce: 要約を1つのプロンプトにまとめて最終アドバイスを生成
+
+        Args:
+            generate_advice() と同じ
+
+        Returns:
+            generate_advice_with_metadata() と同じ形式
+            （usage は map と reduce の合計）
+        """
+        if not self.use_api:
+            return self._fallback_result(query, consultation_type, people_analysis, context)
+
+        # 同一命式（same_as）は要約しない
+        targets = [
+            (name, analysis)
+            for name, analysis in people_analysis.items()
+            if name != 'compatibility' and 'same_as' not in analysis
+        ]
+        summaries = map_bounded(
+            lambda item: self._summarize_person(item[1], user_id=user_id),
+            targets,
+            max_parallel=self.max_parallel
+        )
+        summary_by_name = {name: summary for (name, _), (summary, _) in zip(targets, summaries)}
+        map_usage = sum_usage(usage for _, usage in summaries)
+
+        system_prompt = self._build_system_prompt(consultation_type)
+        user_prompt = self._build_reduce_prompt(query, people_analysis, summary_by_name, context)
+
+        cache = get_advice_cache(user_id)
+        if cache is not None:
+            cache_key = AdviceCache.make_key(self.MODEL, system_text(system_prompt), user_prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return {"text": cached, "source": "cache", "usage": map_usage}
+
+        try:
+            message = resilient_create(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self._max_tokens(consultation_type),
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ]
+            )
+            text = message.content[0].text
+
+        except Exception as e:
+            logger.warning("API呼び出しエラー: %s", e)
+            result = self._fallback_result(
+                query, consultation_type, people_analysis, context, reason=failure_reason(e)
+            )
+            result["usage"] = map_usage
+            return result
+
+        self._observe_output(consultation_type, message)
+        if cache is not None and not is_truncated(message):
+            cache.put(cache_key, text)
+
+        return {
+            "text": text,
+            "source": "api",
+            "usage": sum_usage([map_usage, usage_to_dict(message.usage)]),
+        }
+
+    def _summarize_person(self, analysis: Dict, user_id: Optional[str] = None) -> tuple:
+        """人物1人分の要約（map）
+
+        Returns:
+            (要約テキスト, usage)
+            API失敗時はメタファーから組み立てた要約（キャッシュしない）
+            要約のキャッシュはサブスクユーザーのみ（get_summary_cache）
+        """
+        fingerprint = analysis.get('fingerprint')
+        summary_cache = get_summary_cache(user_id) if fingerprint else None
+        if summary_cache is not None:
+            cached = summary_cache.get(self.MODEL, fingerprint)
+            if cached is not None:
+                return cached, usage_to_dict(None)
+
+        metaphor = analysis.get('metaphor', {})
+        prompt = f"- 日干: {analysis.get('day_kan', '不明')}\n"
+        prompt += f"- 特徴: {metaphor.get('本質', '不明')}\n"
+        prompt += f"- 強み: {metaphor.get('強み', '不明')}\n"
+        prompt += f"- 課題: {metaphor.get('課題', '不明')}\n"
+        if 'yojin' in analysis:
+            prompt += f"- 用神: {' → '.join(analysis['yojin'])}\n"
+
+        try:
+            message = resilient_create(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self.SUMMARY_MAX_TOKENS,
+                system=[text_block(self.SUMMARY_SYSTEM_PROMPT)],
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            summary = message.content[0].text.strip()
+
+        except Exception as e:
+            logger.warning("API呼び出しエラー: %s", e)
+            summary = (
+                f"{metaphor.get('本質', '不明')}。"
+                f"強み: {metaphor.get('強み', '不明')}。課題: {metaphor.get('課題', '不明')}"
+            )
+            return summary, usage_to_dict(None)
+
+        if summary_cache is not None:
+            summary_cache.put(self.MODEL, fingerprint, summary)
+
+        return summary, usage_to_dict(message.usage)
+
+    def _build_reduce_prompt(
+        self,
+        query: str,
+        people_analysis: Dict,
+        summaries: Dict[str, str],
         context: Dict
     ) -> str:
+        """Map-Reduce の統合用ユーザープロンプト（命式の詳細の代わりに人物要約を使う）"""
+
+        prompt = f"""【相談内容】
+{query}
+
+【人物要約】
+"""
+        for person_name, analysis in people_analysis.items():
+            if person_name == 'compatibility':
+                continue
+            prompt += f"\n■ {person_name}（日干: {analysis.get('day_kan', '不明')}）\n"
+            if 'same_as' in analysis:
+                prompt += f"{analysis['same_as']}と同一命式\n"
+            else:
+                prompt += f"{summaries[person_name]}\n"
+
+        return prompt + self._build_situation_sections(people_analysis, context)
+
+    def _generate_with_api(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        user_id: Optional[str] = None
+    ) -> Dict:
         """Claude APIを使用してアドバイス生成"""
         
-        # システムプロンプト構築
+        # システムプロンプト構築（静的・キャッシュ対象）
         system_prompt = self._build_system_prompt(consultation_type)
         
-        # ユーザープロンプト構築
+        # ユーザープロンプト構築（リクエスト毎のデータはすべてこちら）
         user_prompt = self._build_user_prompt(query, people_analysis, context)
         
+        # キャッシュ確認（サブスクユーザーのみ）
+        cache = get_advice_cache(user_id)
+        if cache is not None:
+            cache_key = AdviceCache.make_key(self.MODEL, system_text(system_prompt), user_prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return {"text": cached, "source": "cache", "usage": usage_to_dict(None)}
+
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
+            message = resilient_create(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self._max_tokens(consultation_type),
                 system=system_prompt,
                 messages=[
                     {"role": "user", "content": user_prompt}
                 ]
             )
-            
-            return message.content[0].text
-        
+            text = message.content[0].text
+
         except Exception as e:
-            print(f"API呼び出しエラー: {e}")
-            return self._generate_fallback(query, consultation_type, people_analysis, context)
-    
-    def _build_system_prompt(self, consultation_type: str) -> str:
-        """システムプロンプト構築"""
-        
-        base_prompt = """あなたは四柱推命の専門家であり、経営コンサルタントです。
+            logger.warning("API呼び出しエラー: %s", e)
+            return self._fallback_result(
+                query, consultation_type, people_analysis, context, reason=failure_reason(e)
+            )
 
-【あなたの役割】
-- 経営者・起業家の意思決定をサポート
-- 人間関係の最適化アドバイス
-- 具体的で実行可能な提案
+        # フォールバック・打ち切られた回答はキャッシュしない
+        self._observe_output(consultation_type, message)
+        if cache is not None and not is_truncated(message):
+            cache.put(cache_key, text)
 
-【アドバイスの条件】
-1. 専門用語は最小限に（必要なら簡単に説明）
-2. 具体的な行動を3つ以上示す
-3. タイミングも明示（いつやるべきか）
-4. リスクも正直に伝える
-5. 理由を明確に説明
-6. 経営者が意思決定できるレベルの情報
+        return {"text": text, "source": "api", "usage": usage_to_dict(message.usage)}
 
-【出力形式】
-## 総合判断
-結論を1-2文で端的に
+    def stream_advice(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> Iterator[Dict]:
+        """
+        アドバイスを逐次生成（ストリーミング）
 
-## 理由
-なぜそう判断したか（命式の特徴から）
+        Args:
+            generate_advice() と同じ
 
-## 具体的なアドバイス
-1. すぐやるべきこと
-2. 中期的な対策
-3. 注意すべきポイント
+        Yields:
+            {"type": "delta", "text": str}  生成されたテキストの差分
+            {"type": "fallback", "text": str}  フォールバックの全文
+                （API未使用時、途中で失敗した場合、deadline 内に最初のトークンが
+                 来なかった場合。表示中のテキストを置き換える）
+            {"type": "done", "source": str, "usage": Dict}  最後に1回
+                （generate_advice_with_metadata() のメタデータと同じ形式。
+                 deadline 超過時は API の結果を返す Future を "pending" に持つ）
+        """
+        events = self._stream_events(query, consultation_type, people_analysis, context, user_id)
 
-## タイミング
-いつ実行すべきか、避けるべき時期
+        if self.use_api and deadline is not None:
+            events = self._stream_with_deadline(
+                events,
+                deadline,
+                lambda: self._fallback_result(
+                    query, consultation_type, people_analysis, context, reason="deadline"
+                )
+            )
 
-## リスクと対策
-想定されるリスクと回避方法
-"""
+        # API 呼び出し1回につき1回だけ記録する。期限内ならこの stream_advice() の記録、
+        # 期限切れなら表示したフォールバックの記録とは別に、完了時に "background" で記録
+        started = time.perf_counter()
+        for event in instrument_stream(events, "consultant", consultation_type):
+            if event.get("pending") is not None:
+                event["pending"].add_done_callback(
+                    lambda future: record_advice(
+                        "consultant", consultation_type, "background",
+                        future.result(), time.perf_counter() - started
+                    )
+                )
+            yield event
+
+    def _stream_events(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        user_id: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """stream_advice() の本体（deadline・計測なし）"""
+        if not self.use_api:
+            result = self._fallback_result(query, consultation_type, people_analysis, context)
+            yield {"type": "fallback", "text": result["text"]}
+            yield _done_event(result)
+            return
+
+        system_prompt = self._build_system_prompt(consultation_type)
+        user_prompt = self._build_user_prompt(query, people_analysis, context)
+
+        # キャッシュ確認（サブスクユーザーのみ）
+        cache = get_advice_cache(user_id)
+        if cache is not None:
+            cache_key = AdviceCache.make_key(self.MODEL, system_text(system_prompt), user_prompt)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield {"type": "delta", "text": cached}
+                yield {"type": "done", "source": "cache", "usage": usage_to_dict(None)}
+                return
+
+        text = ""
+        try:
+            with resilient_stream(
+                self.client,
+                user_id=user_id,
+                model=self.MODEL,
+                max_tokens=self._max_tokens(consultation_type),
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ]
+            ) as stream:
+                for delta in stream.text_stream:
+                    text += delta
+                    yield {"type": "delta", "text": delta}
+                message = stream.get_final_message()
+                usage = usage_to_dict(message.usage)
+
+        except Exception as e:
+            logger.warning("API呼び出しエラー: %s", e)
+            # 途中まで表示済みなら stream_error（接続前の失敗は原因で分類）
+            reason = "stream_error" if text else failure_reason(e)
+            result = self._fallback_result(
+                query, consultation_type, people_analysis, context, reason=reason
+            )
+            yield {"type": "fallback", "text": result["text"]}
+            yield _done_event(result)
+            return
+
+        self._observe_output(consultation_type, message)
+        if cache is not None and not is_truncated(message):
+            cache.put(cache_key, text)
+
+        yield {"type": "done", "source": "api", "usage": usage}
+
+    def _stream_with_deadline(
+        self,
+        events: Iterator[Dict],
+        deadline: float,
+        fallback: Callable[[], Dict]
+    ) -> Iterator[Dict]:
+        """最初のイベントを deadline 秒だけ待つストリーム
+
+        API のストリームはバックグラウンドで消費する。期限内に最初のイベントが
+        来ればそのまま中継し、来なければフォールバックを返して打ち切る。
+        打ち切った後も API 呼び出しは続き（完了時に応答キャッシュにも書かれる）、
+        結果は done イベントの "pending"（Future）で受け取れる。
+
+        期限はワーカーがこの呼び出しを取り出した時点から数える
+        （打ち切った遅いストリームがワーカーを使い切っていても、API が健全なら
+         ワーカーの空き待ちだけでフォールバックしない。スケジューラの待ちは期限に含む）
+        """
+        relay = queue.Queue()
+        picked_up = threading.Event()
+
+        def consume() -> Dict:
+            picked_up.set()
+
+            def forward():
+                for event in events:
+                    relay.put(event)
+                    yield event
+            try:
+                return collect_advice_events(forward())
+            finally:
+                relay.put(None)
         
-        type_specific = {
-            "hiring": "\n【採用判断のポイント】\n- 既存チームとの相性\n- 役割の適性\n- 育成の方向性",
-            "team": "\n【チーム編成のポイント】\n- 各メンバーの強み活用\n- 役割分担の明確化\n- コミュニケーション設計",
-            "timing": "\n【タイミング判断のポイント】\n- 運気の流れ\n- 準備状況の確認\n- 外部環境の考慮",
-            "partnership": "\n【パートナーシップのポイント】\n- 補完関係の有無\n- 役割分担の設計\n- リスク分散の方法",
+        future = _background_executor.submit(consume)
+        picked_up.wait()
+
+        try:
+            event = relay.get(timeout=deadline)
+        except queue.Empty:
+            result = fallback()
+            yield {"type": "fallback", "text": result["text"]}
+            yield dict(_done_event(result), pending=future)
+            return
+
+        while event is not None:
+            yield event
+            event = relay.get()
+
+    def build_request(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict
+    ) -> Dict:
+        """messages.create() に渡すパラメータ（バッチ投入用）
+
+        Returns:
+            {"model", "max_tokens", "system", "messages"}
+        """
+        return {
+            "model": self.MODEL,
+            "max_tokens": self._max_tokens(consultation_type),
+            "system": self._build_system_prompt(consultation_type),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._build_user_prompt(query, people_analysis, context)
+                }
+            ],
         }
+
+    def fallback_advice(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        reason: str
+    ) -> Dict:
+        """ルールベースのアドバイス（API を呼ばない。バッチで失敗した相談の補完用）
         
-        return base_prompt + type_specific.get(consultation_type, "")
+        Returns:
+            generate_advice_with_metadata() と同じ形式（source は "fallback"）
+        """
+        return self._fallback_result(
+            query, consultation_type, people_analysis, context, reason=reason
+        )
+
+    def _build_system_prompt(self, consultation_type: str) -> List[Dict]:
+        """システムプロンプト構築（プロンプトキャッシュ対応）
+
+        共通部分（SYSTEM_PROMPT: 参照資料と全タイプの観点を含む）は全リクエストで
+        バイト単位で同一のため、cache_control を付けてプロバイダ側でキャッシュさせる。
+        その後ろには、今回重視する観点の見出しだけを置く。
+
+        Returns:
+            system パラメータ用のテキストブロックのリスト
+        """
+        blocks = [cached_text_block(self.SYSTEM_PROMPT)]
+
+        type_specific = self.TYPE_SPECIFIC_PROMPTS.get(consultation_type)
+        if type_specific:
+            heading = type_specific.strip().splitlines()[0]
+            blocks.append(text_block(f"\n今回の相談では{heading}を重視してください。"))
+
+        if self.quick:
+            blocks.append(text_block(self.QUICK_ANSWER_PROMPT))
+
+        return blocks
+
+    def _max_tokens(self, consultation_type: str) -> int:
+        """相談タイプ別の出力上限（観測した出力長から学習、上限は MAX_TOKENS）"""
+        return get_output_budget().max_tokens(
+            consultation_type, quick=self.quick, ceiling=self.MAX_TOKENS
+        )
+
+    def _observe_output(self, consultation_type: str, message):
+        """API の回答の出力トークン数を予算の学習に記録"""
+        get_output_budget().observe(
+            consultation_type,
+            getattr(message.usage, "output_tokens", 0),
+            quick=self.quick,
+            truncated=is_truncated(message)
+        )
     
     def _build_user_prompt(
         self,
@@ -135,6 +704,9 @@ class KoyomiConsultant:
     ) -> str:
         """ユーザープロンプト構築"""
         
+        if self.compact:
+            return self._build_compact_user_prompt(query, people_analysis, context)
+
         prompt = f"""【相談内容】
 {query}
 
@@ -143,7 +715,16 @@ class KoyomiConsultant:
         
         # 各人物の分析結果を追加
         for person_name, analysis in people_analysis.items():
+            if person_name == 'compatibility':
+                continue
+
             prompt += f"\n■ {person_name}\n"
+
+            # 同一命式の人物は参照のみ（重複した分析を送らない）
+            if 'same_as' in analysis:
+                prompt += f"- 命式: {analysis['same_as']}と同一\n"
+                continue
+
             prompt += f"- 日干: {analysis.get('day_kan', '不明')}\n"
             prompt += f"- 特徴: {analysis.get('metaphor', {}).get('本質', '不明')}\n"
             prompt += f"- 強み: {analysis.get('metaphor', {}).get('強み', '不明')}\n"
@@ -152,16 +733,23 @@ class KoyomiConsultant:
             if 'yojin' in analysis:
                 prompt += f"- 用神: {' → '.join(analysis['yojin'])}\n"
         
+        return prompt + self._build_situation_sections(people_analysis, context)
+
+    def _build_situation_sections(self, people_analysis: Dict, context: Dict) -> str:
+        """ユーザープロンプトの【相性分析】【状況】セクション"""
+
+        prompt = ""
+
         # 相性情報があれば追加
         if 'compatibility' in people_analysis:
-            prompt += f"\n【相性分析】\n"
+            prompt += "\n【相性分析】\n"
             compat = people_analysis['compatibility']
             prompt += f"- 総合相性: {compat.get('score', 0)}点\n"
             prompt += f"- 関係性: {compat.get('relation', '不明')}\n"
         
         # コンテキスト情報追加
         if context:
-            prompt += f"\n【状況】\n"
+            prompt += "\n【状況】\n"
             if 'urgency' in context:
                 urgency_map = {"high": "緊急", "medium": "通常", "low": "余裕あり"}
                 prompt += f"- 緊急度: {urgency_map.get(context['urgency'], '不明')}\n"
@@ -170,10 +758,61 @@ class KoyomiConsultant:
                 for key, value in context['additional_context'].items():
                     prompt += f"- {key}: {value}\n"
         
-        prompt += "\n上記の情報をもとに、具体的で実行可能なアドバイスをお願いします。"
-        
         return prompt
     
+    def _build_compact_user_prompt(
+        self,
+        query: str,
+        people_analysis: Dict,
+        context: Dict
+    ) -> str:
+        """ユーザープロンプト構築（コンパクト表現）
+
+        命式分析結果以外を先に組み立て、残りのトークン予算を命式セクションに割り当てる。
+        """
+        head = f"【相談内容】\n{query}\n\n"
+
+        tail = ""
+        if 'compatibility' in people_analysis:
+            compat = people_analysis['compatibility']
+            tail += f"\n【相性分析】{compat.get('score', 0)}点/{compat.get('relation', '不明')}\n"
+
+        if context:
+            items = []
+            if 'urgency' in context:
+                urgency_map = {"high": "緊急", "medium": "通常", "low": "余裕あり"}
+                items.append(f"緊急度={urgency_map.get(context['urgency'], '不明')}")
+            for key, value in context.get('additional_context', {}).items():
+                items.append(f"{key}={value}")
+            if items:
+                tail += f"\n【状況】{'; '.join(items)}\n"
+
+        budget = None
+        if self.prompt_token_budget is not None:
+            budget = max(self.prompt_token_budget - estimate_tokens(head + tail), 0)
+
+        return head + compact_people_section(people_analysis, token_budget=budget) + tail
+
+    def _fallback_result(
+        self,
+        query: str,
+        consultation_type: str,
+        people_analysis: Dict,
+        context: Dict,
+        reason: str = "no_api"
+    ) -> Dict:
+        """フォールバックを generate_advice_with_metadata() の形式で返す
+
+        Args:
+            reason: フォールバック理由（"no_api" / "deadline" / failure_reason() の分類）
+        """
+        return {
+            "text": self._generate_fallback(query, consultation_type, people_analysis, context),
+            "source": "fallback",
+            "usage": usage_to_dict(None),
+            "fallback_reason": reason,
+        }
+
     def _generate_fallback(
         self,
         query: str,
@@ -199,7 +838,12 @@ class KoyomiConsultant:
         
         # 各人物の特徴を列挙
         for person_name, analysis in people_analysis.items():
-            if person_name != 'compatibility':
+            if person_name == 'compatibility':
+                continue
+
+            if 'same_as' in analysis:
+                advice += f"**{person_name}**: {analysis['same_as']}と同じ命式\n\n"
+            else:
                 metaphor = analysis.get('metaphor', {})
                 advice += f"**{person_name}**: {metaphor.get('本質', '不明')}\n"
                 advice += f"- 強み: {metaphor.get('強み', '不明')}\n"
@@ -0,0 +1,32 @@
+"""
+五行の対応表
+
+Zone: Logic
+責務: 十干・十二支の五行と、五行どうしの相生・相克の対応表
+
+設計思想:
+- ルールベースのアドバイス・分析・名簿の類似度/クラスタリングで共有する唯一の定義
+- 依存なし（NumPy・API クライアントを読み込まない）
+"""
+
+# 五行の並び順（相生の順。類似度の特徴ベクトルの列順にも使う）
+GOGYO_ORDER = ["木", "火", "土", "金", "水"]
+
+KAN_GOGYO = {
+    "甲": "木", "乙": "木",
+    "丙": "火", "丁": "火",
+    "戊": "土", "己": "土",
+    "庚": "金", "辛": "金",
+    "壬": "水", "癸": "水",
+}
+
+SHI_GOGYO = {
+    "子": "水", "丑": "土", "寅": "木", "卯": "木",
+    "辰": "土", "巳": "火", "午": "火", "未": "土",
+    "申": "金", "酉": "金", "戌": "土", "亥": "水",
+}
+
+# 相生（生み出す）・相克（抑える）
+GENERATES = {"木": "火", "火": "土", "土": "金", "金": "水", "水": "木"}
+CONTROLS = {"木": "土", "土": "水", "水": "火", "火": "金", "金": "木"}
+GENERATES_FROM = {target: source for source, target in GENERATES.items()}
@@ -5,6 +5,8 @@ from typing import Dict, List, Optional
 from datetime import datetime
 import re
 
+from src.koyomi.chat.query import analyze_query
+
 
 class ConsultationHearing:
     """相談内容のヒアリング管理"""
@@ -19,22 +21,12 @@ class ConsultationHearing:
         """相談内容を分類
         
         Returns:
-            "hiring" | "team" | "timing" | "partnership" | "relationship"
+            "hiring" | "team" | "timing" | "partnership" | "relationship" | "general"
         """
-        keywords = {
-            "hiring": ["採用", "雇う", "人材", "面接", "候補"],
-            "team": ["チーム", "プロジェクト", "メンバー", "編成", "配置"],
-            "timing": ["タイミング", "いつ", "時期", "決断", "判断"],
-            "partnership": ["組む", "パートナー", "協力", "共同", "提携"],
-            "relationship": ["相性", "関係", "付き合い", "距離", "人間関係"],
-        }
-        
-        for consult_type, words in keywords.items():
-            if any(word in query for word in words):
-                self.consultation_type = consult_type
-                return consult_type
-        
-        return "general"
+        consult_type = analyze_query(query).hearing_type
+        if consult_type != "general":
+            self.consultation_type = consult_type
+        return consult_type
     
     def get_required_people(self, consultation_type: str) -> List[str]:
         """相談タイプごとに必要な人物情報を取得
@@ -93,33 +85,10 @@ class ConsultationHearing:
         """相談内容から暗黙の情報を抽出
         
         Returns:
-            {"urgency": "high", "context": "..."}
+            {"urgency": "high", "emotion": "anxious", "risk_tolerance": "medium"}
         """
-        context = {}
-        
-        # 緊急度判定
-        if any(word in query for word in ["すぐ", "急", "至急", "早く"]):
-            context["urgency"] = "high"
-        elif any(word in query for word in ["いずれ", "将来", "そのうち"]):
-            context["urgency"] = "low"
-        else:
-            context["urgency"] = "medium"
-        
-        # 感情の状態
-        if any(word in query for word in ["不安", "心配", "迷っ", "悩"]):
-            context["emotion"] = "anxious"
-        elif any(word in query for word in ["期待", "楽しみ", "前向き"]):
-            context["emotion"] = "positive"
-        else:
-            context["emotion"] = "neutral"
-        
-        # リスク許容度
-        if any(word in query for word in ["慎重", "リスク", "失敗"]):
-            context["risk_tolerance"] = "low"
-        else:
-            context["risk_tolerance"] = "medium"
-        
-        return context
+        # 緊急度・感情の状態・リスク許容度（キーワード表は query.py）
+        return analyze_query(query).implicit_info
 
 
 class PersonProfile:
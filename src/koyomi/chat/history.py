@@ -0,0 +1,331 @@
+"""
+チャット履歴の圧縮（直近は原文・それ以前は要約）
+
+Zone: Logic
+責務: セッションごとのチャット履歴を、直近 K ターンの原文と、それ以前のローリング要約に分けて保持する
+
+設計思想:
+- 1ターン = ユーザー発言1件 + 続くアシスタント発言（最初のあいさつだけのターンもある）
+- ターンが keep_turns を超えたら、古いターンから要約に畳み込む
+- さらに原文 + 要約のバイト数（UTF-8）が max_bytes を超えたら、超えなくなるまで畳み込む
+  （最新の1ターンは必ず原文で残す）
+- 要約は関数で差し替えられる: 既定はルールベース（API を呼ばない・決定的）、LLMSummarizer は API で要約
+  → 要約自体も max_summary_bytes に収める（古い行から捨てる）
+  → API の要約は refiner に渡す。畳み込みはその場でルールベースで行い、API での要約は
+    バックグラウンドで作って後から置き換える（append() が API 呼び出しを待たない）
+- 画面には visible() の範囲だけ描画する（再実行のたびに全件を描画しない）
+- メッセージには連番の id を振る。後から本文を差し替えるときは replace(id, ...) を使う
+  → 要約に畳み込み済みでも、差し替え後の本文を要約に反映できる
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.prompt_cache import text_block
+from src.koyomi.chat.resilience import resilient_create
+
+
+logger = logging.getLogger("koyomi.llm")
+
+DEFAULT_KEEP_TURNS = 10
+DEFAULT_VISIBLE_TURNS = 5
+DEFAULT_MAX_BYTES = 64 * 1024
+EXCERPT_CHARS = 40
+OMITTED_MARK = "…（以前の会話は省略）"
+
+# (これまでの要約, 畳み込むメッセージ) -> 新しい要約
+Summarizer = Callable[[str, List[Dict]], str]
+
+# refiner（API での要約）を走らせるワーカー（プロセス共有）
+_refine_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="koyomi-history")
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _excerpt(content: str, limit: int = EXCERPT_CHARS) -> str:
+    """メッセージの最初の本文行（見出し・区切り線・Markdown 記号を除く）"""
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            continue
+        line = line.lstrip(">-*・ ").replace("**", "").strip()
+        if not line:
+            continue
+        return line if len(line) <= limit else line[:limit] + "…"
+    return ""
+
+
+def rule_summary(summary: str, messages: List[Dict]) -> str:
+    """ルールベースの要約（1ターン1行: 「ユーザー発言 → 回答」の冒頭）"""
+    user = [_excerpt(m["content"]) for m in messages if m["role"] == "user"]
+    assistant = [_excerpt(m["content"]) for m in messages if m["role"] != "user"]
+    parts = [
+        text for text in (" / ".join(filter(None, user)), " / ".join(filter(None, assistant)))
+        if text
+    ]
+    if not parts:
+        return summary
+    line = "・" + " → ".join(parts)
+    return f"{summary}\n{line}" if summary else line
+
+
+def trim_summary(summary: str, max_bytes: int) -> str:
+    """要約を max_bytes に収める（古い行から捨て、先頭に省略の印を付ける）"""
+    if _size(summary) <= max_bytes:
+        return summary
+    lines = summary.splitlines()
+    kept = []
+    size = _size(OMITTED_MARK)
+    for line in reversed(lines):
+        size += _size(line) + 1
+        if size > max_bytes:
+            break
+        kept.append(line)
+    return "\n".join([OMITTED_MARK] + kept[::-1])
+
+
+class LLMSummarizer:
+    """API でローリング要約を更新（失敗時はルールベース）"""
+
+    MODEL = KoyomiConsultant.MODEL
+    MAX_TOKENS = 400
+
+    # 短くキャッシュの最小長に届かないため cache_control は付けない
+    SYSTEM_PROMPT = """あなたは相談チャットの記録係です。
+これまでの要約と新しいやり取りを受け取り、更新した要約だけを出力してください。
+
+【ルール】
+- 箇条書き（各行「・」で始める）、全体で10行以内
+- 相談内容・関係者・結論・未解決の点を優先して残す
+- 生年月日などの個人情報は書かない"""
+
+    def __init__(
+        self,
+        client,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        user_id: Optional[str] = None
+    ):
+        """
+        Args:
+            client: Anthropic クライアント（get_client()）
+            model: 要約に使うモデル（省略時は MODEL）
+            max_tokens: 要約の最大トークン数（省略時は MAX_TOKENS）
+            user_id: スケジューラの公平性の単位
+        """
+        self.client = client
+        self.model = model or self.MODEL
+        self.max_tokens = max_tokens or self.MAX_TOKENS
+        self.user_id = user_id
+
+    def __call__(self, summary: str, messages: List[Dict]) -> str:
+        transcript = "\n".join(
+            f"{'ユーザー' if m['role'] == 'user' else 'アシスタント'}: {m['content']}" for m in messages
+        )
+        prompt = f"【これまでの要約】\n{summary or '（なし）'}\n\n【新しいやり取り】\n{transcript}"
+        try:
+            message = resilient_create(
+                self.client,
+                user_id=self.user_id,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                system=[text_block(self.SYSTEM_PROMPT)],
+                messages=[{"role": "user", "content": prompt}],
+            )
+            return message.content[0].text.strip()
+        except Exception as e:
+            logger.warning("履歴要約のAPI呼び出しエラー: %s", e)
+            return rule_summary(summary, messages)
+
+
+class ChatHistory:
+    """直近ターンの原文 + ローリング要約
+
+    使用例:
+        history = ChatHistory(refiner=LLMSummarizer(client))
+        history.append("user", "この人を採用すべき？")
+        message = history.append("assistant", advice)
+        ...
+        history.replace(message["id"], advice, upgraded)  # 要約に畳み込み済みでもよい
+        for message in history.visible():
+            ...
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+        visible_turns: int = DEFAULT_VISIBLE_TURNS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_summary_bytes: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+        refiner: Optional[Summarizer] = None
+    ):
+        """
+        Args:
+            keep_turns: 原文で残すターン数
+            visible_turns: 画面に描画するターン数
+            max_bytes: 原文 + 要約の上限（UTF-8 バイト数）
+            max_summary_bytes: 要約の上限（省略時は max_bytes の 1/4）
+            summarizer: その場で畳み込む要約関数（省略時は rule_summary）
+            refiner: バックグラウンドで要約を作り直す関数（LLMSummarizer など。省略時はなし）
+        """
+        self.keep_turns = max(1, keep_turns)
+        self.visible_turns = max(1, visible_turns)
+        self.max_bytes = max_bytes
+        self.max_summary_bytes = (
+            max_summary_bytes if max_summary_bytes is not None else max_bytes // 4
+        )
+        self.summarizer = summarizer or rule_summary
+        self.refiner = refiner
+        self.summary = ""
+        self.folded_messages = 0
+        self._turns: List[List[Dict]] = []
+        self._next_id = 0
+        self._first_id = 0  # clear() より前の id は差し替え対象外
+
+        # refiner 用: _refined は _unrefined より前を refiner で要約したもの
+        self._lock = threading.RLock()
+        self._refined = ""
+        self._unrefined: List[List[Dict]] = []
+        self._refining: Optional[Future] = None
+        self._revision = 0  # clear()・畳み込み済みの本文の差し替えで増える
+
+    def append(self, role: str, content: str) -> Dict:
+        """メッセージを追加して圧縮
+
+        Returns:
+            追加したメッセージ {"id", "role", "content"}
+            （本文の差し替えは replace(message["id"], ...)）
+        """
+        with self._lock:
+            message = {"id": self._next_id, "role": role, "content": content}
+            self._next_id += 1
+            if role == "user" or not self._turns:
+                self._turns.append([message])
+            else:
+                self._turns[-1].append(message)
+            self.compact()
+            return message
+
+    def compact(self):
+        """ターン数・バイト数の上限を超えた分を要約に畳み込む"""
+        with self._lock:
+            while len(self._turns) > 1 and (
+                len(self._turns) > self.keep_turns or self.size_bytes() > self.max_bytes
+            ):
+                turn = self._turns.pop(0)
+                self._fold(turn)
+                self.folded_messages += len(turn)
+
+    def replace(self, message_id: int, old: str, new: str) -> bool:
+        """メッセージ本文の old を new に差し替える
+
+        原文が残っていれば本文を書き換えて compact()。
+        要約に畳み込み済みで refiner がまだ要約していなければ、畳み込み前の本文を書き換えて
+        要約を作り直す。それ以外（refiner なし・要約済み）は差し替え後の内容（new）を
+        アシスタントの発言として要約に畳み込む。このとき差し替え前の内容の行は要約に残る
+        （refiner があれば次の要約で整理される）。
+
+        Returns:
+            差し替えたか（clear() 前の id などで見つからない場合は False）
+        """
+        with self._lock:
+            message = next((m for m in self.messages if m["id"] == message_id), None)
+            if message is not None:
+                message["content"] = message["content"].replace(old, new)
+                self.compact()
+                return True
+            if not self._first_id <= message_id < self._next_id:
+                return False
+
+            folded = next(
+                (m for turn in self._unrefined for m in turn if m["id"] == message_id), None
+            )
+            if folded is not None:
+                folded["content"] = folded["content"].replace(old, new)
+                self._revision += 1
+                self.summary = self._fold_rules(self._refined, self._unrefined)
+                return True
+
+            self._fold([{"id": message_id, "role": "assistant", "content": new}])
+            return True
+
+    def _fold_rules(self, summary: str, turns: List[List[Dict]]) -> str:
+        for turn in turns:
+            summary = trim_summary(self.summarizer(summary, turn), self.max_summary_bytes)
+        return summary
+
+    def _fold(self, turn: List[Dict]):
+        """1ターン分を要約に畳み込む（refiner があれば後で作り直す）"""
+        if self.refiner is not None:
+            if not self._unrefined:
+                self._refined = self.summary
+            self._unrefined.append(turn)
+            if self._refining is None:
+                self._refining = _refine_executor.submit(self._refine)
+        self.summary = self._fold_rules(self.summary, [turn])
+
+    def _refine(self):
+        """refiner で要約を作り直す（バックグラウンド。作り直している間の畳み込みも続けて反映）"""
+        while True:
+            with self._lock:
+                if not self._unrefined or self.refiner is None:
+                    self._refining = None
+                    return
+                refiner, base, turns = self.refiner, self._refined, list(self._unrefined)
+                revision = self._revision
+
+            try:
+                refined = refiner(base, [message for turn in turns for message in turn])
+            except Exception as e:
+                logger.warning("履歴要約の作り直しに失敗: %s", e)
+                with self._lock:
+                    self._refining = None
+                return
+
+            with self._lock:
+                if revision != self._revision:  # 作り直している間に clear()・差し替えがあった
+                    continue
+                del self._unrefined[:len(turns)]
+                self._refined = trim_summary(refined, self.max_summary_bytes)
+                self.summary = self._fold_rules(self._refined, self._unrefined)
+
+    def wait_for_summary(self, timeout: Optional[float] = None):
+        """バックグラウンドの要約の作り直しが終わるまで待つ"""
+        while True:
+            with self._lock:
+                refining = self._refining
+            if refining is None:
+                return
+            refining.result(timeout=timeout)
+
+    @property
+    def messages(self) -> List[Dict]:
+        """原文で残っているメッセージ（古い順）"""
+        return [message for turn in self._turns for message in turn]
+
+    def visible(self) -> List[Dict]:
+        """画面に描画するメッセージ（直近 visible_turns ターン）"""
+        return [message for turn in self._turns[-self.visible_turns:] for message in turn]
+
+    def hidden_count(self) -> int:
+        """描画しないメッセージ数（要約済み + 原文だが表示範囲外）"""
+        return self.folded_messages + len(self.messages) - len(self.visible())
+
+    def size_bytes(self) -> int:
+        """原文 + 要約のバイト数（UTF-8）"""
+        return _size(self.summary) + sum(_size(m["content"]) for m in self.messages)
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.folded_messages = 0
+            self._turns = []
+            self._first_id = self._next_id
+            self._refined = ""
+            self._unrefined = []
+            self._revision += 1
@@ -2,9 +2,15 @@
 対話式ヒアリングエンジン
 ユーザーの相談内容を段階的に深掘り
 """
+import json
+from datetime import datetime
 from typing import Dict, List, Optional
 from enum import Enum
 
+from src.koyomi.chat.birthdate import extract_birthdates
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.query import INTERVIEW_TYPE_KEYWORDS, analyze_query
+
 
 class QuestionType(Enum):
     """質問タイプ"""
@@ -15,17 +21,82 @@ class QuestionType(Enum):
     CONCERNS = "concerns"  # 懸念点
 
 
+# InterviewState.to_bytes() の形式（変更したら上げる）
+STATE_FORMAT_VERSION = 1
+
+
 class InterviewState:
-    """ヒアリング状態管理"""
+    """ヒアリング状態管理
+
+    セッション（st.session_state）や外部ストアには to_bytes() の結果だけを保存し、
+    ターンごとに from_bytes() で復元する（ワーカープロセス間でもそのまま渡せる）。
+    """
+
+    __slots__ = (
+        "consultation_type", "people", "specific_question",
+        "timing_info", "concerns", "current_step",
+    )
     
     def __init__(self):
         self.consultation_type = None  # 採用/パートナー/チーム/タイミング
-        self.people = []  # 関係者リスト
+        self.people = []  # 関係者リスト（PersonProfile）
         self.specific_question = None  # 具体的な質問
         self.timing_info = None  # タイミング情報
         self.concerns = []  # 懸念点
         self.current_step = 0
     
+    def to_bytes(self) -> bytes:
+        """コンパクトな JSON 配列（UTF-8）に直列化
+
+        人物は [名前, 役割, 生年月日時（分まで）, 出生時刻の有無] のみ保存する
+        （命式などは生年月日から再計算できるため保存しない）。
+        """
+        payload = [
+            STATE_FORMAT_VERSION,
+            self.consultation_type,
+            self.current_step,
+            self.specific_question,
+            self.timing_info,
+            self.concerns,
+            [
+                [
+                    p.name, p.role, p.birth_date.isoformat(timespec="minutes"),
+                    int(p.birth_time is not None),
+                ]
+                for p in self.people
+            ],
+        ]
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "InterviewState":
+        """to_bytes() の結果から復元
+
+        Raises:
+            ValueError: 形式が不正、またはバージョンが異なる
+        """
+        try:
+            version, *fields = json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid interview state: {e}") from e
+        if version != STATE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported interview state version: {version} (expected {STATE_FORMAT_VERSION})"
+            )
+
+        state = cls()
+        try:
+            (state.consultation_type, state.current_step, state.specific_question,
+             state.timing_info, state.concerns, people) = fields
+            for name, role, born, has_time in people:
+                birth_date = datetime.fromisoformat(born)
+                state.people.append(PersonProfile(
+                    name, role, birth_date, birth_time=birth_date if has_time else None
+                ))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid interview state: {e}") from e
+        return state
+
     def is_complete(self) -> bool:
         """ヒアリング完了判定"""
         return (
@@ -41,52 +112,71 @@ class Interviewer:
     # 相談タイプごとのテンプレート
     CONSULTATION_TYPES = {
         "採用": {
-            "keywords": ["採用", "雇う", "新メンバー", "新入社員"],
+            "keywords": INTERVIEW_TYPE_KEYWORDS["採用"],
             "questions": [
                 "採用を検討している方の生年月日を教えてください",
                 "既存チームメンバーの生年月日も教えてください",
                 "どんなポジションですか？（例: エンジニア、営業）",
                 "採用について特に不安な点はありますか？"
-            ]
+            ],
+            # 各質問の回答に書かれた人物の役割（生年月日を聞かない質問は None）
+            "roles": ["候補者", "メンバー", None, None]
         },
         "パートナー選定": {
-            "keywords": ["パートナー", "共同創業", "提携", "協力"],
+            "keywords": INTERVIEW_TYPE_KEYWORDS["パートナー選定"],
             "questions": [
                 "パートナー候補の方の生年月日を教えてください",
                 "あなたの生年月日を教えてください",
                 "どんな役割を期待していますか？",
                 "既に懸念している点はありますか？"
-            ]
+            ],
+            # 各質問の回答に書かれた人物の役割（生年月日を聞かない質問は None）
+            "roles": ["パートナー候補", "本人", None, None]
         },
         "チーム編成": {
-            "keywords": ["チーム", "プロジェクト", "新規事業"],
+            "keywords": INTERVIEW_TYPE_KEYWORDS["チーム編成"],
             "questions": [
                 "チームメンバー全員の生年月日を教えてください",
                 "プロジェクトの内容を簡単に教えてください",
                 "成功のカギは何だと考えていますか？"
-            ]
+            ],
+            # 各質問の回答に書かれた人物の役割（生年月日を聞かない質問は None）
+            "roles": ["メンバー", None, None]
         },
         "タイミング判断": {
-            "keywords": ["タイミング", "いつ", "時期", "決断"],
+            "keywords": INTERVIEW_TYPE_KEYWORDS["タイミング判断"],
             "questions": [
                 "あなたの生年月日を教えてください",
                 "何を決断しようとしていますか？",
                 "いつまでに決める必要がありますか？"
-            ]
+            ],
+            # 各質問の回答に書かれた人物の役割（生年月日を聞かない質問は None）
+            "roles": ["本人", None, None]
         },
         "相性確認": {
-            "keywords": ["相性", "合う", "うまくいく"],
+            "keywords": INTERVIEW_TYPE_KEYWORDS["相性確認"],
             "questions": [
                 "相手の方の生年月日を教えてください",
                 "あなたの生年月日を教えてください",
                 "どんな関係性ですか？（仕事/恋愛/友人）",
                 "特に気になる点はありますか？"
-            ]
+            ],
+            # 各質問の回答に書かれた人物の役割（生年月日を聞かない質問は None）
+            "roles": ["相手", "本人", None, None]
         }
     }
     
-    def __init__(self):
-        self.state = InterviewState()
+    # 質問が尽きた後、生年月日を聞き直した回答に書かれた人物の役割
+    DEFAULT_ROLE = "関係者"
+
+    __slots__ = ("state",)
+
+    def __init__(self, state: Optional[InterviewState] = None):
+        """
+        Args:
+            state: 途中から再開する場合のヒアリング状態（InterviewState.from_bytes()）
+        """
+        self.state = state if state is not None else InterviewState()
     
     def classify_consultation(self, initial_message: str) -> str:
         """
@@ -98,15 +188,8 @@ class Interviewer:
         Returns:
             相談タイプ（採用/パートナー選定/etc）
         """
-        message_lower = initial_message.lower()
-        
-        for consult_type, config in self.CONSULTATION_TYPES.items():
-            for keyword in config["keywords"]:
-                if keyword in message_lower:
-                    return consult_type
-        
-        # デフォルト
-        return "相性確認"
+        # 一致なしは「相性確認」
+        return analyze_query(initial_message).interview_type
     
     def get_next_question(self) -> Optional[str]:
         """
@@ -158,6 +241,10 @@ class Interviewer:
         Returns:
             次の質問、または完了メッセージ
         """
+        # 生年月日の抽出（生年月日を聞いた質問への回答のみ）
+        added = self._collect_people(answer)
+        note = self._people_note(added)
+
         # 相談タイプが未設定の場合
         if self.state.consultation_type is None:
             # 番号で選択された場合
@@ -169,20 +256,67 @@ class Interviewer:
                 self.state.consultation_type = self.classify_consultation(answer)
             
             next_q = self.get_next_question()
-            return f"承知しました。「{self.state.consultation_type}」についてですね。\n\n{next_q}"
-        
-        # 生年月日の抽出（簡易版）
-        if "年" in answer or "/" in answer or "-" in answer:
-            # TODO: より厳密な日付パース
-            pass
+            return f"{note}承知しました。「{self.state.consultation_type}」についてですね。\n\n{next_q}"
         
         # 次の質問取得
         next_q = self.get_next_question()
         
         if next_q is None:
-            return "ありがとうございます。情報が揃いました。分析を開始します..."
+            if not self.state.is_complete():
+                # 質問は終わったが生年月日が1件も読み取れていない
+                return f"{note}分析には生年月日が必要です。関係する方のお名前と生年月日を教えてください（例: 山田太郎 1990年6月15日）"
+            return f"{note}ありがとうございます。情報が揃いました。分析を開始します..."
+
+        return f"{note}{next_q}"
+
+    def _current_role(self) -> Optional[str]:
+        """直前に聞いた質問の回答に書かれる人物の役割
         
-        return next_q
+        Returns:
+            役割名。生年月日を聞いていない質問（最初の相談文・期限や内容の質問）は None
+            （「2026年12月31日までに」「2025年4月1日開始」のような日付を人物にしない）
+        """
+        if self.state.consultation_type is None or self.state.current_step == 0:
+            return None
+        if self.state.specific_question is not None:
+            # 質問が尽きた後は、生年月日だけを聞き直している
+            return self.DEFAULT_ROLE
+        roles = self.CONSULTATION_TYPES[self.state.consultation_type]["roles"]
+        index = self.state.current_step - 1
+        return roles[index] if index < len(roles) else None
+
+    def _collect_people(self, answer: str) -> List[PersonProfile]:
+        """回答中の生年月日を関係者に追加（同じ名前・生年月日は追加しない）
+
+        Returns:
+            追加した人物
+        """
+        role = self._current_role()
+        if role is None:
+            return []
+        known = {(p.name, p.birth_date) for p in self.state.people}
+        added = []
+        for mention in extract_birthdates(answer):
+            person = mention.to_profile(role)
+            if (person.name, person.birth_date) in known:
+                continue
+            known.add((person.name, person.birth_date))
+            self.state.people.append(person)
+            added.append(person)
+        return added
+
+    @staticmethod
+    def _people_note(people: List[PersonProfile]) -> str:
+        """追加した人物の確認メッセージ"""
+        if not people:
+            return ""
+        lines = []
+        for p in people:
+            born = f"{p.birth_date.year}年{p.birth_date.month}月{p.birth_date.day}日"
+            if p.birth_time:
+                born += f" {p.birth_time:%H:%M}"
+            lines.append(f"- {p.name}（{p.role}）: {born}")
+        return "以下の方を登録しました。\n" + "\n".join(lines) + "\n\n"
     
     def get_summary(self) -> Dict:
         """
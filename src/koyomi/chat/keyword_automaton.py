@@ -0,0 +1,116 @@
+"""
+複数キーワードの同時照合（Aho–Corasick）
+
+Zone: Logic
+責務: 多数のキーワードを1つのオートマトンにまとめ、テキストを1回走査するだけで
+      一致したキーワード（と、その付帯情報）をすべて返す
+
+設計思想:
+- 構築は1回（import 時）。照合は文字数に比例し、キーワード数には依存しない
+- 失敗遷移は構築時に解決済みの遷移表（DFA）にしておく
+  → 照合は1文字あたり辞書引き1回（Python でも部分文字列検索の繰り返しより安定して速い）
+- アルファベットにない文字は根に戻るだけ（表に持たない）
+- キーワードには任意の付帯情報（カテゴリなど）を付けられる
+"""
+from collections import deque
+from typing import (
+    Dict, FrozenSet, Generic, Hashable, Iterable, Iterator, List, Mapping, Tuple, TypeVar,
+)
+
+
+T = TypeVar("T", bound=Hashable)
+
+
+class KeywordAutomaton(Generic[T]):
+    """Aho–Corasick オートマトン（構築後は不変・スレッドセーフ）
+
+    使用例:
+        automaton = KeywordAutomaton({"採用": ["hiring"], "面接": ["hiring"], "急": ["urgent"]})
+        automaton.find("急いで採用したい")  # {"採用", "急"}
+        automaton.payloads("急いで採用したい")  # {"hiring", "urgent"}
+    """
+
+    def __init__(self, patterns: Mapping[str, Iterable[T]]):
+        """
+        Args:
+            patterns: {キーワード: 付帯情報の列}（空文字のキーワードは無視）
+        """
+        # goto[state] = {文字: 次の状態}（構築後は失敗遷移を解決済み）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._words: List[Tuple[str, ...]] = [()]
+        payloads: Dict[str, FrozenSet[T]] = {}
+
+        for word, values in patterns.items():
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._words.append(())
+                state = nxt
+            self._words[state] = (word,)
+            payloads[word] = frozenset(values)
+
+        self._payloads = payloads
+        self._build()
+
+    def _build(self):
+        """失敗遷移を求め、遷移表と出力（接尾辞として含まれるキーワード）を解決"""
+        goto = self._goto
+        fail = [0] * len(goto)
+        # 幅優先（浅い状態の遷移表は、深い状態より先に解決済みになる）
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            # 出力は失敗先の出力を引き継ぐ（「人間関係」の中の「関係」など）
+            self._words[state] = self._words[state] + self._words[fail[state]]
+            children = list(goto[state].items())
+            # 失敗先の遷移を自分の表に取り込む（DFA 化。自分の子が優先）
+            for ch, nxt in goto[fail[state]].items():
+                goto[state].setdefault(ch, nxt)
+            for ch, child in children:
+                fail[child] = goto[fail[state]].get(ch, 0) if state else 0
+                queue.append(child)
+
+    @property
+    def keywords(self) -> FrozenSet[str]:
+        return frozenset(self._payloads)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """(終了位置, キーワード) を出現順に返す（重なり・包含も含む）"""
+        goto = self._goto
+        words = self._words
+        state = 0
+        for index, ch in enumerate(text):
+            state = goto[state].get(ch, 0)
+            if words[state]:
+                for word in words[state]:
+                    yield index + 1, word
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """テキストに含まれるキーワードの集合（1回の走査）"""
+        goto = self._goto
+        words = self._words
+        state = 0
+        found = set()
+        for ch in text:
+            state = goto[state].get(ch, 0)
+            if words[state]:
+                found.update(words[state])
+        return frozenset(found)
+
+    def payloads(self, text: str) -> FrozenSet[T]:
+        """テキストに含まれるキーワードの付帯情報の和集合"""
+        return self.payloads_of(self.find(text))
+
+    def payloads_of(self, words: Iterable[str]) -> FrozenSet[T]:
+        """キーワード（find() の結果）の付帯情報の和集合"""
+        result = set()
+        for word in words:
+            result |= self._payloads[word]
+        return frozenset(result)
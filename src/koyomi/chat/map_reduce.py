@@ -0,0 +1,156 @@
+"""
+Map-Reduce 型アドバイス生成の部品
+
+Zone: Logic
+責務: 大人数の相談を「人物ごとの要約（map）→ 最終統合（reduce）」に分割するための
+      並列実行・要約キャッシュ・usage 集計
+
+設計思想:
+- 人物要約は相談内容に依存させない → 同じ命式なら別の相談でも再利用できる
+- 要約キャッシュはサブスクユーザーごとのプロセス内LRU（get_advice_cache と同じ保存制御）
+  → 単発利用・サブスク無効では読み書きしない（DATA_POLICY: 完全非保存）
+  → キー = (モデル, 命式フィンガープリント)。命式から導出した特性の要約のみで、相談内容・氏名は含まない
+  → 保持するユーザー数にも上限を設け、最も長く使われていないユーザーの分から捨てる
+- 並列数には上限を設ける（API のレート制限を一度に使い切らない）
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from src.koyomi.chat.prompt_cache import usage_to_dict
+from src.koyomi.storage import json_store
+from src.koyomi.storage.subscription import is_subscription_valid
+
+
+DEFAULT_MAX_PARALLEL = 4
+DEFAULT_SUMMARY_CACHE_SIZE = 1024
+DEFAULT_SUMMARY_CACHE_USERS = 256
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class SummaryCache:
+    """人物要約のLRUキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries: int = DEFAULT_SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # (モデル, フィンガープリント) -> 要約
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, model: str, fingerprint: str) -> Optional[str]:
+        key = (model, fingerprint)
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return summary
+
+    def put(self, model: str, fingerprint: str, summary: str):
+        key = (model, fingerprint)
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            {"size", "hits", "misses"}
+        """
+        with self._lock:
+            return {"size": len(self._entries), **self._stats}
+
+
+_summary_caches: OrderedDict = OrderedDict()  # ユーザーID -> SummaryCache（LRU）
+_summary_caches_lock = threading.Lock()
+_max_summary_cache_users = DEFAULT_SUMMARY_CACHE_USERS
+
+
+def get_summary_cache(user_id: Optional[str]) -> Optional[SummaryCache]:
+    """ユーザー専用の人物要約キャッシュを取得
+
+    Args:
+        user_id: ユーザーID（単発利用は None）
+
+    Returns:
+        SummaryCache（有効なサブスクの場合）
+        None（単発利用、またはサブスク無効の場合 = キャッシュしない）
+
+    Raises:
+        ValueError: 不正なuser_id
+    """
+    if not user_id:
+        return None
+
+    safe_user_id = json_store.sanitize_user_id(user_id)
+
+    if not is_subscription_valid(safe_user_id):
+        # 解約・期限切れ後は保持していた要約も破棄
+        drop_summary_cache(safe_user_id)
+        return None
+
+    with _summary_caches_lock:
+        cache = _summary_caches.get(safe_user_id)
+        if cache is None:
+            cache = _summary_caches[safe_user_id] = SummaryCache()
+        _summary_caches.move_to_end(safe_user_id)
+        while len(_summary_caches) > _max_summary_cache_users:
+            _summary_caches.popitem(last=False)
+        return cache
+
+
+def drop_summary_cache(user_id: str):
+    """ユーザーの人物要約キャッシュを破棄"""
+    with _summary_caches_lock:
+        _summary_caches.pop(json_store.sanitize_user_id(user_id), None)
+
+
+def clear_summary_caches():
+    """全ユーザーの人物要約キャッシュを破棄（テスト用）"""
+    with _summary_caches_lock:
+        _summary_caches.clear()
+
+
+def set_summary_cache_users(max_users: int):
+    """人物要約キャッシュを保持するユーザー数の上限を変更（超過分は古い順に破棄）"""
+    global _max_summary_cache_users
+    with _summary_caches_lock:
+        _max_summary_cache_users = max(1, max_users)
+        while len(_summary_caches) > _max_summary_cache_users:
+            _summary_caches.popitem(last=False)
+
+
+def map_bounded(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    max_parallel: int = DEFAULT_MAX_PARALLEL
+) -> List[R]:
+    """並列数に上限を付けて fn を適用（結果は入力順）"""
+    items = list(items)
+    if len(items) <= 1 or max_parallel <= 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+def sum_usage(usages: Iterable[Dict]) -> Dict:
+    """usage 辞書（usage_to_dict の形式）の合計"""
+    total = usage_to_dict(None)
+    for usage in usages:
+        for field in total:
+            total[field] += usage.get(field, 0)
+    return total
@@ -0,0 +1,301 @@
+"""
+Claude API 呼び出しの計測（プロセス内メトリクス）
+
+Zone: Logic
+責務: アドバイス生成1回ごとのレイテンシ・トークン数・応答元・フォールバック理由を集計し、
+      テキスト形式（Prometheus exposition format）で公開
+
+設計思想:
+- 外部ライブラリなしのカウンタ / ヒストグラム（スレッドセーフ）
+- ラベルは値の種類が限られるものだけ（コンポーネント・相談タイプ・応答元・理由）
+  → ユーザーID・相談内容はラベルにしない
+- 計測はアドバイス生成の入口で1回だけ（内部のリトライ・map 呼び出しは含めない）
+- 公開は registry.render() と、任意で起動する HTTP エンドポイント（/metrics）
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# 秒（TTFT・総レイテンシ共通）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+def _label_key(label_names: Sequence[str], labels: Dict[str, str]) -> Tuple[str, ...]:
+    missing = set(label_names) - set(labels)
+    if missing:
+        raise ValueError(f"Missing labels: {sorted(missing)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def _format_labels(label_names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = []
+    for name, value in zip(label_names, values):
+        escaped = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """単調増加カウンタ"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.label_names, labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"|".join(key): value for key, value in self._values.items()}
+
+
+class Histogram:
+    """累積バケット付きヒストグラム"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # {ラベル: [バケット毎の件数..., +Inf の件数, 合計値]}
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(self.label_names, labels))
+            return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {int(cumulative)}")
+            cumulative += series[len(self.buckets)]
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {int(cumulative)}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {int(cumulative)}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "|".join(key): {"count": int(sum(series[:-1])), "sum": series[-1]}
+                for key, series in self._series.items()
+            }
+
+
+class MetricsRegistry:
+    """メトリクスの登録先"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        """テキスト形式（Prometheus exposition format）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """{メトリクス名: {"ラベル値|...": 値}}（ダッシュボード表示用）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+_registry = MetricsRegistry()
+
+LLM_REQUESTS = _registry.counter(
+    "koyomi_llm_requests_total",
+    "アドバイス生成の回数",
+    ("component", "consultation_type", "mode", "source"),
+)
+LLM_FALLBACKS = _registry.counter(
+    "koyomi_llm_fallbacks_total",
+    "フォールバックした回数（理由別）",
+    ("component", "reason"),
+)
+LLM_LATENCY = _registry.histogram(
+    "koyomi_llm_latency_seconds",
+    "アドバイス生成の所要時間",
+    ("component", "mode", "source"),
+)
+LLM_TTFT = _registry.histogram(
+    "koyomi_llm_time_to_first_token_seconds",
+    "ストリーミングで最初のテキストが届くまでの時間",
+    ("component",),
+)
+LLM_TOKENS = _registry.counter(
+    "koyomi_llm_tokens_total",
+    "API の usage（種類別）",
+    ("component", "kind"),
+)
+
+
+def get_registry() -> MetricsRegistry:
+    """プロセス共有のレジストリを取得"""
+    return _registry
+
+
+def record_advice(
+    component: str,
+    consultation_type: str,
+    mode: str,
+    result: Dict,
+    latency: float,
+    ttft: Optional[float] = None
+):
+    """アドバイス生成1回分を記録
+
+    Args:
+        component: "consultant" / "advice_generator"
+        consultation_type: 相談タイプ
+        mode: "sync" / "stream" / "background"
+        result: {"source", "usage", "fallback_reason"(任意)}
+        latency: 所要時間（秒）
+        ttft: 最初のテキストまでの時間（秒、ストリーミング時）
+    """
+    source = result.get("source", "fallback")
+    LLM_REQUESTS.inc(
+        component=component, consultation_type=consultation_type, mode=mode, source=source
+    )
+    LLM_LATENCY.observe(latency, component=component, mode=mode, source=source)
+    if ttft is not None:
+        LLM_TTFT.observe(ttft, component=component)
+    if source == "fallback":
+        LLM_FALLBACKS.inc(component=component, reason=result.get("fallback_reason", "unknown"))
+    for field, value in (result.get("usage") or {}).items():
+        if value:
+            LLM_TOKENS.inc(value, component=component, kind=field.replace("_tokens", ""))
+
+
+def instrument_stream(
+    events: Iterator[Dict],
+    component: str,
+    consultation_type: str,
+    mode: str = "stream"
+) -> Iterator[Dict]:
+    """stream_advice() のイベント列を素通ししつつ記録（TTFT は最初の delta / fallback まで）"""
+    started = time.perf_counter()
+    ttft = None
+    for event in events:
+        if ttft is None and event["type"] in ("delta", "fallback"):
+            ttft = time.perf_counter() - started
+        if event["type"] == "done":
+            record_advice(
+                component, consultation_type, mode, event,
+                time.perf_counter() - started, ttft=ttft
+            )
+        yield event
+
+
+def start_metrics_server(
+    port: int,
+    host: str = "127.0.0.1",
+    registry: Optional[MetricsRegistry] = None
+) -> ThreadingHTTPServer:
+    """GET /metrics でテキスト形式を返す HTTP サーバーを起動（デーモンスレッド）
+
+    Returns:
+        起動したサーバー（停止は shutdown()）
+    """
+    registry = registry or _registry
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
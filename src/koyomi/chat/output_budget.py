@@ -0,0 +1,141 @@
+"""
+出力トークン予算（相談タイプ別の max_tokens）
+
+Zone: Logic
+責務: 実際の出力トークン数の分布から、相談タイプごとの max_tokens を決める
+
+設計思想:
+- 観測が少ないうちは相談タイプ別の既定値（相性確認などの単純な相談は小さめ）
+- 観測が min_samples 件たまったら、直近 window 件の p95 × headroom を予算にする
+  → 長い回答が必要なタイプだけ大きな予算を持つ
+- 上限で打ち切られた回答（stop_reason == "max_tokens"）は実際の長さより短く見えるので、
+  headroom 分だけ上乗せして記録する（予算が縮み続けないように）
+- クイック回答は別系列で学習する（通常回答の分布を汚さない）
+- 出力の長さそのものはプロンプトで制御する（max_tokens は打ち切りの上限でしかない）
+"""
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+# 観測が少ないときの既定値（consultant / advice_generator の相談タイプ）
+DEFAULT_BUDGETS = {
+    "relationship": 1000,
+    "timing": 1200,
+    "hiring": 1500,
+    "team": 1500,
+    "partnership": 1500,
+    "general": 1500,
+    "採用": 1500,
+    "パートナー選定": 1500,
+    "チーム編成": 1500,
+    "タイミング判断": 1200,
+    "相性確認": 1000,
+}
+DEFAULT_BUDGET = 1500
+QUICK_BUDGET = 600
+MIN_BUDGET = 256
+
+
+def _percentile(values, p: float) -> int:
+    """p パーセンタイル（最近傍法）"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class OutputBudget:
+    """相談タイプ別の出力トークン予算（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        percentile: float = 95,
+        headroom: float = 1.2,
+        defaults: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            window: 相談タイプごとに保持する直近の観測数
+            min_samples: 学習した予算を使い始める観測数
+            percentile: 予算の基準にするパーセンタイル
+            headroom: パーセンタイルに掛ける余裕
+            defaults: 相談タイプ別の既定値（省略時は DEFAULT_BUDGETS）
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.headroom = headroom
+        self.defaults = DEFAULT_BUDGETS if defaults is None else defaults
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, bool], Deque[int]] = {}
+
+    def max_tokens(self, consultation_type: str, quick: bool = False, ceiling: int = 2000) -> int:
+        """相談タイプの max_tokens
+
+        Args:
+            consultation_type: 相談タイプ
+            quick: クイック回答か
+            ceiling: 上限（モデル呼び出し側の MAX_TOKENS）
+        """
+        with self._lock:
+            samples = list(self._samples.get((consultation_type, quick), ()))
+
+        if len(samples) < self.min_samples:
+            budget = QUICK_BUDGET if quick else self.defaults.get(consultation_type, DEFAULT_BUDGET)
+        else:
+            budget = math.ceil(_percentile(samples, self.percentile) * self.headroom)
+        return max(MIN_BUDGET, min(budget, ceiling))
+
+    def observe(
+        self,
+        consultation_type: str,
+        output_tokens: int,
+        quick: bool = False,
+        truncated: bool = False
+    ):
+        """API の回答1件の出力トークン数を記録
+
+        Args:
+            truncated: max_tokens で打ち切られたか
+        """
+        if not output_tokens:
+            return
+        if truncated:
+            output_tokens = math.ceil(output_tokens * self.headroom)
+        with self._lock:
+            key = (consultation_type, quick)
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append(output_tokens)
+
+    def stats(self) -> Dict[str, Dict]:
+        """{"相談タイプ" / "相談タイプ:quick": {"samples", "p95"}}（ダッシュボード表示用）"""
+        with self._lock:
+            items = [(key, list(samples)) for key, samples in self._samples.items()]
+        return {
+            f"{consultation_type}:quick" if quick else consultation_type: {
+                "samples": len(samples),
+                "p95": _percentile(samples, 95),
+            }
+            for (consultation_type, quick), samples in items
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+_budget = OutputBudget()
+
+
+def get_output_budget() -> OutputBudget:
+    """プロセス共有の出力トークン予算を取得"""
+    return _budget
+
+
+def is_truncated(message) -> bool:
+    """max_tokens で打ち切られた回答か"""
+    return getattr(message, "stop_reason", None) == "max_tokens"
@@ -0,0 +1,54 @@
+"""
+プロンプトキャッシュ対応ヘルパー
+
+Zone: Logic
+責務: Claude API のプロンプトキャッシュ（prefix caching）用のプロンプト部品
+
+設計思想:
+- 大きな静的部分（システムプロンプト）を先頭に置き、リクエスト間でバイト単位で同一に保つ
+- 静的部分の末尾に cache_control を付ける（そこまでがキャッシュ対象）
+- リクエスト毎に変わるデータはすべてその後ろ（ユーザーメッセージ）に置く
+
+Note:
+    キャッシュされるのは一定長以上のプレフィックスのみ（Sonnet は 1024 トークン以上）。
+    それ未満ではキャッシュされず、通常の入力トークンとして課金される。
+    キャッシュ対象はアドバイス生成の共通プロンプト（参照資料込みで約1,500〜1,800トークン）のみ。
+    人物要約・履歴要約のプロンプトは最小長に届かないため cache_control を付けない。
+"""
+from typing import Any, Dict, List, Optional
+
+
+# プロバイダがキャッシュする最小のプレフィックス長（Sonnet）
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def cached_text_block(text: str) -> Dict:
+    """キャッシュ境界付きのテキストブロック"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def text_block(text: str) -> Dict:
+    """通常のテキストブロック"""
+    return {"type": "text", "text": text}
+
+
+def system_text(blocks: List[Dict]) -> str:
+    """システムプロンプトのブロック列を1つの文字列に（応答キャッシュのキー用）"""
+    return "".join(block["text"] for block in blocks)
+
+
+def usage_to_dict(usage: Optional[Any]) -> Dict:
+    """API応答の usage を辞書化
+
+    Returns:
+        {"input_tokens", "output_tokens",
+         "cache_creation_input_tokens", "cache_read_input_tokens"}
+        （値が無いものは 0）
+    """
+    fields = [
+        "input_tokens",
+        "output_tokens",
+        "cache_creation_input_tokens",
+        "cache_read_input_tokens",
+    ]
+    return {field: getattr(usage, field, None) or 0 for field in fields}
@@ -0,0 +1,139 @@
+"""
+コンパクトなプロンプト表現（大人数チーム向け）
+
+Zone: Logic
+責務: 命式分析結果を少ない入力トークンで表現する
+
+設計思想:
+- 1人1ブロックの冗長な形式をやめ、1人1行の表形式にする
+- メタファー（本質・強み・課題）は凡例にまとめ、表からはIDで参照
+  → 同じ日干×月支の人物が何人いても本文は1回だけ
+- トークン数は文字種から概算する（トークナイザーは使わない）
+- 予算を超える場合は重要度の低い項目から削る
+  課題 → 強み → 用神 → 本質 → 人物行（末尾から）
+"""
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 重要度の低い順（予算超過時にこの順で削る）
+TRIM_ORDER = ("課題", "強み", "用神", "本質")
+
+_ASCII_RUN = re.compile(r"[\x00-\x7f]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算
+
+    - 非ASCII文字（日本語など）: 1文字 ≒ 1トークン
+    - ASCII: 4文字 ≒ 1トークン
+
+    実際のトークン数より多めに出る（予算判定が甘くならない側）。
+    """
+    ascii_chars = 0
+    tokens = 0
+    for run in _ASCII_RUN.findall(text):
+        ascii_chars += len(run)
+        tokens += math.ceil(len(run) / 4)
+    return tokens + (len(text) - ascii_chars)
+
+
+def _metaphor_key(metaphor: Dict) -> Tuple[str, str, str]:
+    return (
+        metaphor.get("本質", "不明"),
+        metaphor.get("強み", "不明"),
+        metaphor.get("課題", "不明"),
+    )
+
+
+def _render_people(
+    people_analysis: Dict,
+    dropped: Tuple[str, ...] = (),
+    max_rows: Optional[int] = None
+) -> str:
+    """表形式の命式セクションを描画
+
+    Args:
+        people_analysis: 命式分析結果（"compatibility" キーは無視）
+        dropped: 出力しない項目（TRIM_ORDER の要素）
+        max_rows: 出力する人物行の上限（超過分は人数のみ記載）
+    """
+    people = [(name, a) for name, a in people_analysis.items() if name != "compatibility"]
+    shown = people if max_rows is None else people[:max_rows]
+
+    metaphor_fields = [f for f in ("本質", "強み", "課題") if f not in dropped]
+    show_yojin = "用神" not in dropped
+
+    # 凡例（同一メタファーは1つのIDを共有）
+    legend: Dict[Tuple[str, str, str], str] = {}
+    rows = []
+    for name, analysis in shown:
+        if "same_as" in analysis:
+            rows.append(f"{name}|={analysis['same_as']}")
+            continue
+
+        cells = [name, analysis.get("day_kan", "?")]
+        if metaphor_fields:
+            key = _metaphor_key(analysis.get("metaphor", {}))
+            if key not in legend:
+                legend[key] = f"M{len(legend) + 1}"
+            cells.append(legend[key])
+        if show_yojin:
+            cells.append("→".join(analysis.get("yojin", [])) or "-")
+        rows.append("|".join(cells))
+
+    columns = ["名前", "日干"]
+    if metaphor_fields:
+        columns.append("特性")
+    if show_yojin:
+        columns.append("用神")
+
+    lines = ["【命式分析結果】"]
+    if legend:
+        lines.append(f"凡例({'/'.join(metaphor_fields)}):")
+        for key, legend_id in legend.items():
+            values = dict(zip(("本質", "強み", "課題"), key))
+            lines.append(f"{legend_id}={'/'.join(values[f] for f in metaphor_fields)}")
+    lines.append("|".join(columns) + "（=X はXと同一命式）")
+    lines.extend(rows)
+
+    omitted = len(people) - len(shown)
+    if omitted:
+        lines.append(f"…他{omitted}名（省略）")
+
+    return "\n".join(lines) + "\n"
+
+
+def compact_people_section(people_analysis: Dict, token_budget: Optional[int] = None) -> str:
+    """命式分析結果をコンパクトな表形式で描画
+
+    Args:
+        people_analysis: IntegratedAnalyzer の people_analysis
+        token_budget: このセクションのトークン上限（None で無制限）
+
+    Returns:
+        プロンプト用テキスト（予算内に収まるよう項目・行を削ったもの）
+    """
+    text = _render_people(people_analysis)
+    if token_budget is None or estimate_tokens(text) <= token_budget:
+        return text
+
+    dropped: List[str] = []
+    for field in TRIM_ORDER:
+        dropped.append(field)
+        text = _render_people(people_analysis, tuple(dropped))
+        if estimate_tokens(text) <= token_budget:
+            return text
+
+    # 項目を削っても収まらない場合は末尾の人物から省略（収まる最大行数を二分探索）
+    low, high = 0, sum(1 for name in people_analysis if name != "compatibility")
+    while low < high:
+        mid = (low + high + 1) // 2
+        text = _render_people(people_analysis, tuple(dropped), max_rows=mid)
+        if estimate_tokens(text) <= token_budget:
+            low = mid
+        else:
+            high = mid - 1
+
+    return _render_people(people_analysis, tuple(dropped), max_rows=low)
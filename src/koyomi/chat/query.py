@@ -0,0 +1,171 @@
+"""
+相談文の正規化と共有解析
+
+Zone: Logic
+責務: 相談文を一度だけ正規化・走査し、ヒアリング（ConsultationHearing / Interviewer）が
+      使う分類・暗黙情報をまとめて提供する
+
+設計思想:
+- 正規化は NFKC（全角英数→半角、半角カナ→全角）+ 英字の小文字化 + 空白の圧縮
+  → 「ﾁｰﾑ」「ＰＪ」「チーム　編成」のような表記揺れでもキーワードが一致する
+- キーワードは全エンジン分を1つの Aho–Corasick オートマトンにまとめ（import 時に1回構築）、
+  相談文の走査は1回だけ。キーワード数が増えても走査は文字数に比例する
+  → 各キーワードは (観点, 表の順位) を持ち、分類・緊急度・感情などは1回の走査で同時に決まる
+- 解析結果は不変オブジェクトとして相談文ごとにキャッシュ（プロセス内LRU）
+  → 同じリクエスト内で app / analyzer / interviewer が何度呼んでも走査は1回
+- キーワード表はここに集約（各エンジンは表を持たない）
+- ログ分析など大量の相談文は classify_queries() で流す（LRU を汚さない・逐次処理）
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Tuple
+
+from src.koyomi.chat.keyword_automaton import KeywordAutomaton
+
+
+# ConsultationHearing の相談タイプ（先に一致したものを採用）
+HEARING_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "hiring": ["採用", "雇う", "人材", "面接", "候補"],
+    "team": ["チーム", "プロジェクト", "メンバー", "編成", "配置"],
+    "timing": ["タイミング", "いつ", "時期", "決断", "判断"],
+    "partnership": ["組む", "パートナー", "協力", "共同", "提携"],
+    "relationship": ["相性", "関係", "付き合い", "距離", "人間関係"],
+}
+
+# Interviewer の相談タイプ（先に一致したものを採用）
+INTERVIEW_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "採用": ["採用", "雇う", "新メンバー", "新入社員"],
+    "パートナー選定": ["パートナー", "共同創業", "提携", "協力"],
+    "チーム編成": ["チーム", "プロジェクト", "新規事業"],
+    "タイミング判断": ["タイミング", "いつ", "時期", "決断"],
+    "相性確認": ["相性", "合う", "うまくいく"],
+}
+
+# 暗黙情報（extract_implicit_info）
+URGENCY_KEYWORDS: Dict[str, List[str]] = {
+    "high": ["すぐ", "急", "至急", "早く"],
+    "low": ["いずれ", "将来", "そのうち"],
+}
+EMOTION_KEYWORDS: Dict[str, List[str]] = {
+    "anxious": ["不安", "心配", "迷っ", "悩"],
+    "positive": ["期待", "楽しみ", "前向き"],
+}
+RISK_KEYWORDS: Dict[str, List[str]] = {
+    "low": ["慎重", "リスク", "失敗"],
+}
+
+QUERY_CACHE_SIZE = 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def normalize_query(text: str) -> str:
+    """相談文の正規化（NFKC・英字小文字化・空白の圧縮）"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# 観点ごとのキーワード表と、一致なしのときの値（表の順に先に一致したキーを採用）
+CATEGORY_TABLES: Dict[str, Tuple[Dict[str, List[str]], str]] = {
+    "hearing_type": (HEARING_TYPE_KEYWORDS, "general"),
+    "interview_type": (INTERVIEW_TYPE_KEYWORDS, "相性確認"),
+    "urgency": (URGENCY_KEYWORDS, "medium"),
+    "emotion": (EMOTION_KEYWORDS, "neutral"),
+    "risk_tolerance": (RISK_KEYWORDS, "medium"),
+}
+
+
+def _build_automaton() -> KeywordAutomaton:
+    """{正規化済みキーワード: [(観点, 表の順位), ...]} のオートマトン"""
+    patterns: Dict[str, List[Tuple[str, int]]] = {}
+    for dimension, (table, _) in CATEGORY_TABLES.items():
+        for rank, words in enumerate(table.values()):
+            for word in words:
+                patterns.setdefault(normalize_query(word), []).append((dimension, rank))
+    return KeywordAutomaton(patterns)
+
+
+KEYWORD_AUTOMATON = _build_automaton()
+VOCABULARY: Tuple[str, ...] = tuple(sorted(KEYWORD_AUTOMATON.keywords))
+
+_CATEGORY_KEYS = {dimension: tuple(table) for dimension, (table, _) in CATEGORY_TABLES.items()}
+
+
+def _categorize(matched: FrozenSet[str]) -> Dict[str, str]:
+    """一致したキーワードから観点ごとの分類を決める（一致なしの観点は既定値）"""
+    ranks: Dict[str, int] = {}
+    for dimension, rank in KEYWORD_AUTOMATON.payloads_of(matched):
+        if rank < ranks.get(dimension, len(_CATEGORY_KEYS[dimension])):
+            ranks[dimension] = rank
+    return {
+        dimension: _CATEGORY_KEYS[dimension][ranks[dimension]] if dimension in ranks else default
+        for dimension, (_, default) in CATEGORY_TABLES.items()
+    }
+
+
+class QueryAnalysis:
+    """正規化済みの相談文と、一致したキーワード・観点ごとの分類（不変）"""
+
+    __slots__ = ("text", "matched", "_categories")
+
+    def __init__(self, text: str, matched: FrozenSet[str]):
+        self.text = text
+        self.matched = matched
+        self._categories = _categorize(matched)
+
+    def has_any(self, words: List[str]) -> bool:
+        return any(normalize_query(word) in self.matched for word in words)
+
+    def first_match(self, table: Dict[str, List[str]], default: str) -> str:
+        """表の順に見て、キーワードが一致した最初のキー"""
+        for key, words in table.items():
+            if self.has_any(words):
+                return key
+        return default
+
+    @property
+    def categories(self) -> Dict[str, str]:
+        """{観点: 分類}（CATEGORY_TABLES の全観点。呼び出し毎に新しい dict）"""
+        return dict(self._categories)
+
+    @property
+    def hearing_type(self) -> str:
+        """ConsultationHearing の相談タイプ（一致なしは "general"）"""
+        return self._categories["hearing_type"]
+
+    @property
+    def interview_type(self) -> str:
+        """Interviewer の相談タイプ（一致なしは "相性確認"）"""
+        return self._categories["interview_type"]
+
+    @property
+    def implicit_info(self) -> Dict[str, str]:
+        """{"urgency", "emotion", "risk_tolerance"}（呼び出し毎に新しい dict）"""
+        return {
+            "urgency": self._categories["urgency"],
+            "emotion": self._categories["emotion"],
+            "risk_tolerance": self._categories["risk_tolerance"],
+        }
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def analyze_query(query: str) -> QueryAnalysis:
+    """相談文を正規化し、全キーワードを1回の走査で照合（相談文ごとにキャッシュ）"""
+    text = normalize_query(query)
+    return QueryAnalysis(text, KEYWORD_AUTOMATON.find(text))
+
+
+def classify_queries(queries: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """大量の相談文を逐次分類（ログ分析用）
+
+    analyze_query() と同じ分類を返すが、LRU キャッシュを使わない
+    （一度きりの相談文で対話中のキャッシュを追い出さない）。入力は1件ずつ読む。
+
+    Yields:
+        {観点: 分類}（CATEGORY_TABLES の全観点）
+    """
+    normalize = normalize_query.__wrapped__
+    for query in queries:
+        yield _categorize(KEYWORD_AUTOMATON.find(normalize(query)))
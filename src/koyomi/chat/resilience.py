@@ -0,0 +1,251 @@
+"""
+Claude API 呼び出しの耐障害性（リトライ + サーキットブレーカー）
+
+Zone: Logic
+責務: 一時的なエラーはリトライで吸収し、継続的な障害時は API を呼ばずに即座に失敗させる
+
+設計思想:
+- リトライするのは一時的なエラーのみ
+  （429 / 408 / 409 / 5xx / 529 overloaded、接続エラー、タイムアウト）
+  → 400 などの恒久的なエラーはリトライしない
+- 待ち時間は上限付きの指数バックオフ + フルジッター
+  （サーバーが retry-after を返した場合はそちらを優先）
+- リトライを使い切った失敗が続いたらブレーカーを開き、以降は CircuitOpenError を即座に送出
+  → 呼び出し側は HTTP タイムアウトを待たずにフォールバックへ進める
+- ブレーカーが開いてから reset_timeout 秒ごとに1回だけ試行（プローブ）し、成功したら閉じる
+- リトライは anthropic クライアント側では行わない（max_retries=0、二重リトライ防止）
+- 試行ごとにスケジューラの枠を取り直す（バックオフ中に同時実行枠を占有しない）
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Optional
+
+from src.koyomi.core.exceptions import CircuitOpenError
+from src.koyomi.chat.scheduler import scheduled_create, scheduled_stream
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """一時的なエラーか（anthropic の例外クラスには依存せず属性で判定）"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """サーバー指定の待ち時間（retry-after ヘッダー、秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """上限付き指数バックオフ + フルジッター"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random
+    ):
+        """
+        Args:
+            max_attempts: 最大試行回数（初回を含む）
+            base_delay: 1回目のリトライの待ち時間の上限（秒）
+            max_delay: 待ち時間の上限（秒）
+            sleep: 待機関数（テスト用）
+            rng: [0, 1) の乱数（テスト用）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """attempt 回目（0始まり）の失敗後の待ち時間"""
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self.rng() * min(self.max_delay, self.base_delay * (2 ** attempt))
+
+
+class CircuitBreaker:
+    """連続失敗で開くサーキットブレーカー（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: この回数連続で失敗したら開く
+            reset_timeout: 開いてからプローブを許可するまでの秒数
+            clock: 時計（テスト用）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """"closed" / "open" / "half_open"（プローブ待ち）"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self.clock() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """呼び出してよいか
+
+        開いている間は reset_timeout 秒ごとに1回だけ True（プローブ）を返す。
+        プローブの結果が報告されなくても、次の reset_timeout 後には再びプローブできる。
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = self.clock()
+            if now - self._opened_at >= self.reset_timeout:
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+
+_breaker = CircuitBreaker()
+_policy = RetryPolicy()
+
+
+def get_breaker() -> CircuitBreaker:
+    """プロセス共有のサーキットブレーカーを取得"""
+    return _breaker
+
+
+def get_retry_policy() -> RetryPolicy:
+    """プロセス共有のリトライ方針を取得"""
+    return _policy
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    breaker: Optional[CircuitBreaker] = None,
+    policy: Optional[RetryPolicy] = None,
+    record_success: bool = True
+) -> Any:
+    """fn() をリトライ・ブレーカー付きで実行
+
+    Args:
+        fn: 呼び出し（1回の試行）
+        breaker: サーキットブレーカー（省略時はプロセス共有）
+        policy: リトライ方針（省略時はプロセス共有）
+        record_success: 成功時にブレーカーへ成功を報告するか
+            （ストリームのように完了が後になる場合は False にして呼び出し側で報告）
+
+    Raises:
+        CircuitOpenError: ブレーカーが開いている
+        その他: fn() の例外（恒久的なエラー、またはリトライを使い切った一時的なエラー）
+    """
+    breaker = breaker or get_breaker()
+    policy = policy or get_retry_policy()
+
+    if not breaker.allow():
+        raise CircuitOpenError("Claude API is unavailable (circuit open)")
+
+    attempt = 0
+    while True:
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e):
+                # API は応答している（リクエスト側の問題）
+                breaker.record_success()
+                raise
+            attempt += 1
+            if attempt >= policy.max_attempts:
+                breaker.record_failure()
+                raise
+            policy.sleep(policy.delay(attempt - 1, e))
+            continue
+
+        if record_success:
+            breaker.record_success()
+        return result
+
+
+def resilient_create(client, user_id: Optional[str] = None, **request):
+    """リトライ・ブレーカー・スケジューラ付きの client.messages.create()"""
+    return call_with_retry(lambda: scheduled_create(client, user_id=user_id, **request))
+
+
+@contextmanager
+def resilient_stream(client, user_id: Optional[str] = None, **request):
+    """リトライ・ブレーカー・スケジューラ付きの client.messages.stream()
+
+    リトライするのはストリーム開始（接続・最初の応答）まで。
+    途中で切れた場合はリトライしない（表示済みのテキストと矛盾するため）。
+    """
+    breaker = get_breaker()
+    with ExitStack() as stack:
+        stream = call_with_retry(
+            lambda: stack.enter_context(scheduled_stream(client, user_id=user_id, **request)),
+            breaker=breaker,
+            record_success=False
+        )
+        try:
+            yield stream
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            raise
+    breaker.record_success()
+
+
+def failure_reason(error: BaseException) -> str:
+    """フォールバック理由の分類（メトリクスのラベル用）"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if status == 529:
+        return "overloaded"
+    if status is not None and status >= 500:
+        return "server_error"
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if "APITimeoutError" in names or isinstance(error, TimeoutError):
+        return "timeout"
+    if "APIConnectionError" in names or isinstance(error, ConnectionError):
+        return "connection"
+    return "api_error"
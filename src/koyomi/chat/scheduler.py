@@ -0,0 +1,282 @@
+"""
+Claude API 呼び出しのスケジューラ（プロセス共有）
+
+Zone: Logic
+責務: 全セッションからの API 呼び出しを同時実行数・レート制限内に収める
+
+設計思想:
+- 同時実行数の上限（in-flight）と、リクエスト数/分・トークン数/分のトークンバケット
+  → 429 を受けてフォールバックに落ちる前に、こちらで待たせる
+- 待ち行列はユーザー単位のFIFOを巡回（ラウンドロビン）
+  → 1人が大量に投げても他のユーザーが詰まらない
+- トークン数は呼び出し前に概算で予約し、完了後に実際の usage で精算する
+- 待ち行列の深さ・待ち時間を統計として公開（上限値のサイジング用）
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.koyomi.chat.prompt_cache import system_text, usage_to_dict
+from src.koyomi.chat.prompt_compact import estimate_tokens
+
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_TOKENS_PER_MINUTE = 40000
+
+ANONYMOUS = "anonymous"
+
+
+class TokenBucket:
+    """1分あたりの補充量で表すトークンバケット（ロックは呼び出し側で取る）"""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.clock = clock
+        self.available = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def clamp(self, amount: float) -> float:
+        """容量を超える要求は容量に丸める（永久に待たないため）"""
+        return min(float(amount), self.capacity)
+
+    def wait_time(self, amount: float) -> float:
+        """amount を取り出せるまでの秒数（0 なら即時）"""
+        self._refill()
+        shortage = self.clamp(amount) - self.available
+        return max(shortage / self.rate, 0.0) if self.rate > 0 else float("inf")
+
+    def take(self, amount: float):
+        self._refill()
+        self.available -= self.clamp(amount)
+
+    def adjust(self, delta: float):
+        """予約との差分を精算（正: 追加消費、負: 払い戻し）"""
+        self._refill()
+        self.available = min(self.capacity, self.available - delta)
+
+
+class Ticket:
+    """実行許可（1回の API 呼び出し分）"""
+
+    def __init__(self, user: str, reserved_tokens: float):
+        self.user = user
+        self.reserved_tokens = reserved_tokens
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.wait_seconds = 0.0
+        self.actual_tokens: Optional[int] = None
+
+    def record_usage(self, usage: Dict):
+        """実際の usage（usage_to_dict の形式）を記録（解放時にバケットを精算）
+
+        キャッシュ読み出し分はプロバイダの入力トークン/分の制限に数えられないため除く。
+        """
+        self.actual_tokens = (
+            usage.get("input_tokens", 0)
+            + usage.get("output_tokens", 0)
+            + usage.get("cache_creation_input_tokens", 0)
+        )
+
+
+class LLMScheduler:
+    """同時実行数 + レート制限 + ユーザー単位の公平な待ち行列（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_in_flight: 同時に実行できる呼び出し数
+            requests_per_minute: リクエスト数/分
+            tokens_per_minute: トークン数/分（入力 + 出力）
+            clock: 時計（テスト用）
+        """
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self.request_bucket = TokenBucket(requests_per_minute, clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock)
+
+        self._cond = threading.Condition()
+        self._queues: OrderedDict = OrderedDict()  # ユーザー -> deque[Ticket]
+        self._in_flight = 0
+        self._stats = {
+            "granted": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def acquire(self, user_id: Optional[str] = None, estimated_tokens: float = 0) -> Ticket:
+        """実行許可が出るまで待つ
+
+        Args:
+            user_id: 公平性の単位（None は匿名ユーザーとしてまとめる）
+            estimated_tokens: 予約するトークン数（入力の概算 + max_tokens）
+        """
+        ticket = Ticket(user_id or ANONYMOUS, estimated_tokens)
+
+        with self._cond:
+            self._queues.setdefault(ticket.user, deque()).append(ticket)
+            depth = self._queue_depth()
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+
+            while not ticket.granted:
+                delay = self._dispatch()
+                if ticket.granted:
+                    break
+                self._cond.wait(timeout=delay)
+
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """実行完了（実際の usage があればトークンバケットを精算）"""
+        with self._cond:
+            self._in_flight -= 1
+            if ticket.actual_tokens is not None:
+                self.token_bucket.adjust(ticket.actual_tokens - ticket.reserved_tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, user_id: Optional[str] = None, estimated_tokens: float = 0) -> Iterator[Ticket]:
+        """with 文で acquire / release"""
+        ticket = self.acquire(user_id, estimated_tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _dispatch(self) -> Optional[float]:
+        """待ち行列の先頭から順に許可を出す（ロック内で呼ぶ）
+
+        Returns:
+            バケットの補充待ちで止まった場合はその秒数、それ以外は None
+        """
+        granted_any = False
+        delay = None
+
+        while self._queues and self._in_flight < self.max_in_flight:
+            user, waiting = next(iter(self._queues.items()))
+            ticket = waiting[0]
+
+            delay = max(
+                self.request_bucket.wait_time(1),
+                self.token_bucket.wait_time(ticket.reserved_tokens),
+            )
+            if delay > 0:
+                break
+            delay = None
+
+            self.request_bucket.take(1)
+            self.token_bucket.take(ticket.reserved_tokens)
+            waiting.popleft()
+
+            # ラウンドロビン: 許可を出したユーザーは列の最後尾へ
+            if waiting:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+
+            self._in_flight += 1
+            ticket.granted = True
+            ticket.wait_seconds = time.monotonic() - ticket.enqueued_at
+            self._stats["granted"] += 1
+            self._stats["total_wait_seconds"] += ticket.wait_seconds
+            self._stats["max_wait_seconds"] = max(
+                self._stats["max_wait_seconds"], ticket.wait_seconds
+            )
+            granted_any = True
+
+        if granted_any:
+            self._cond.notify_all()
+        return delay
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            {"in_flight", "queue_depth", "waiting_users", "granted",
+             "max_queue_depth", "total_wait_seconds", "max_wait_seconds", "avg_wait_seconds"}
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["queue_depth"] = self._queue_depth()
+            stats["waiting_users"] = len(self._queues)
+        stats["avg_wait_seconds"] = (
+            stats["total_wait_seconds"] / stats["granted"] if stats["granted"] else 0.0
+        )
+        return stats
+
+
+def estimate_request_tokens(system: List[Dict], user_prompt: str, max_tokens: int) -> int:
+    """予約するトークン数（入力の概算 + 出力上限）"""
+    return estimate_tokens(system_text(system) + user_prompt) + max_tokens
+
+
+def _request_tokens(request: Dict) -> int:
+    user_prompt = "".join(
+        m["content"] for m in request["messages"] if isinstance(m["content"], str)
+    )
+    return estimate_request_tokens(request["system"], user_prompt, request["max_tokens"])
+
+
+def scheduled_create(client, user_id: Optional[str] = None, **request):
+    """スケジューラ経由の client.messages.create()
+
+    Args:
+        client: Anthropic クライアント
+        user_id: 公平性の単位
+        **request: messages.create() の引数（system は List[Dict]）
+    """
+    with get_scheduler().slot(user_id, _request_tokens(request)) as ticket:
+        message = client.messages.create(**request)
+        ticket.record_usage(usage_to_dict(getattr(message, "usage", None)))
+        return message
+
+
+@contextmanager
+def scheduled_stream(client, user_id: Optional[str] = None, **request):
+    """スケジューラ経由の client.messages.stream()（ストリーム終了まで枠を保持）"""
+    with get_scheduler().slot(user_id, _request_tokens(request)) as ticket:
+        with client.messages.stream(**request) as stream:
+            yield stream
+            ticket.record_usage(usage_to_dict(stream.get_final_message().usage))
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+_scheduler = LLMScheduler(
+    max_in_flight=int(_env_number("KOYOMI_LLM_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+    requests_per_minute=_env_number("KOYOMI_LLM_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE),
+    tokens_per_minute=_env_number("KOYOMI_LLM_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE),
+)
+
+
+def get_scheduler() -> LLMScheduler:
+    """プロセス共有のスケジューラを取得"""
+    return _scheduler
+
+
+def set_scheduler(scheduler: LLMScheduler):
+    """プロセス共有のスケジューラを差し替え（設定変更・テスト用）"""
+    global _scheduler
+    _scheduler = scheduler
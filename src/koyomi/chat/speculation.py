@@ -0,0 +1,166 @@
+"""
+入力中の先読み（投機的実行）
+
+Zone: Logic
+責務: 関係者フォームの入力中にローカル分析（命式・相性）を先に始め、
+      同じ入力で「分析開始」されたら途中までの結果ごと再利用する
+
+設計思想:
+- 先読みするのは API を使わない計算だけ（IntegratedAnalyzer.iter_local()）
+  → 入力の途中で捨てられても API の課金・スケジューラの枠を消費しない
+  → アドバイス（API）は「分析開始」で iter_consultation(local_events=replay()) から呼ぶ
+- 入力が同じかどうかは署名（相談内容・人物・補足・オプションのハッシュ）で判定
+- 開始前に少し待つ（入力途中の値で計算しない）。待機中に「分析開始」されたら即座に開始
+- 入力が変わったら中止する
+  - 開始前なら実行しない
+  - 実行中ならイベントの消費をやめてジェネレータを閉じる
+- イベントはすべて記録し、replay() で最初から再生する
+"""
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.koyomi.chat.hearing import PersonProfile
+
+
+# 入力が落ち着くまで待つ秒数
+DEFAULT_SPECULATION_DELAY = 1.5
+
+
+def input_signature(
+    query: str,
+    people: List[PersonProfile],
+    additional_context: Optional[Dict] = None,
+    **options
+) -> str:
+    """相談入力の署名（同じ入力なら同じ値）
+
+    Args:
+        query: 相談内容
+        people: 関係者リスト
+        additional_context: 追加コンテキスト
+        **options: 結果に影響するその他の設定（API の有無、クイック回答など）
+    """
+    payload = {
+        "query": query,
+        "people": [
+            [p.name, p.role, p.birth_date.isoformat(),
+             p.birth_time.isoformat() if p.birth_time else None]
+            for p in people
+        ],
+        "context": additional_context,
+        "options": options,
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class Speculation:
+    """1回分の先読み（バックグラウンドスレッドでイベントを記録）
+
+    使用例:
+        speculation = Speculation(signature, lambda: analyzer.iter_local(...)).start()
+        ...
+        if speculation.matches(signature):
+            events = analyzer.iter_consultation(..., local_events=speculation.replay())
+    """
+
+    def __init__(
+        self,
+        signature: str,
+        events_factory: Callable[[], Iterator[Dict]],
+        delay: float = DEFAULT_SPECULATION_DELAY
+    ):
+        """
+        Args:
+            signature: 入力の署名（input_signature()）
+            events_factory: イベント列を作る関数（待機後に呼ぶ）
+            delay: 開始前に待つ秒数
+        """
+        self.signature = signature
+        self.events_factory = events_factory
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._events: List[Dict] = []
+        self._started = False
+        self._promoted = False
+        self._cancelled = False
+        self._finished = False
+        self._error: Optional[BaseException] = None
+
+    def start(self) -> "Speculation":
+        threading.Thread(target=self._run, daemon=True, name="koyomi-speculation").start()
+        return self
+
+    @property
+    def started(self) -> bool:
+        """待機を終えて実行を始めたか"""
+        with self._cond:
+            return self._started
+
+    @property
+    def cancelled(self) -> bool:
+        with self._cond:
+            return self._cancelled
+
+    def matches(self, signature: str) -> bool:
+        """この入力の結果として再利用できるか"""
+        with self._cond:
+            return self.signature == signature and not self._cancelled and self._error is None
+
+    def cancel(self):
+        """中止（以降のイベントは記録しない）"""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def replay(self) -> Iterator[Dict]:
+        """記録済みのイベントを再生し、その後は届き次第返す（待機中なら即座に開始させる）
+
+        Raises:
+            先読み中に発生した例外
+        """
+        with self._cond:
+            self._promoted = True
+            self._cond.notify_all()
+
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self._events) or self._finished)
+                if index >= len(self._events):
+                    if self._error is not None:
+                        raise self._error
+                    return
+                event = self._events[index]
+            index += 1
+            yield event
+
+    def _run(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._promoted or self._cancelled, timeout=self.delay)
+            proceed = not self._cancelled
+            self._started = proceed
+
+        try:
+            if proceed:
+                events = self.events_factory()
+                try:
+                    for event in events:
+                        with self._cond:
+                            if self._cancelled:
+                                break
+                            self._events.append(event)
+                            self._cond.notify_all()
+                finally:
+                    close = getattr(events, "close", None)
+                    if close is not None:
+                        close()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
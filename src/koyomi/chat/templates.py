@@ -0,0 +1,51 @@
+"""
+事前コンパイル済みテンプレート
+
+Zone: Logic
+責務: str.format 形式のテンプレートを一度だけ解析し、固定部分と差し込み部分の列として保持する
+
+設計思想:
+- 解析（string.Formatter().parse）は import 時の1回だけ。描画は固定文字列と値の連結のみ
+- 差し込みは {name} だけを許可（書式指定・変換・属性参照はコンパイル時に ValueError）
+  → ルールベースのアドバイスはすべて文字列で渡すため不要。誤記をすぐに検出できる
+- 値が足りなければ KeyError（str.format と同じ）
+"""
+from string import Formatter
+from typing import Dict, FrozenSet, Tuple
+
+
+class CompiledTemplate:
+    """固定部分と差し込み部分に分解したテンプレート"""
+
+    def __init__(self, source: str):
+        """
+        Raises:
+            ValueError: {name} 以外の差し込み（書式指定・位置引数など）を含む
+        """
+        segments = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is not None:
+                if not field.isidentifier() or spec or conversion:
+                    raise ValueError(f"Unsupported template field: {{{field}}}")
+            segments.append((literal, field))
+
+        self.source = source
+        self.segments: Tuple[Tuple[str, str], ...] = tuple(segments)
+        self.fields: FrozenSet[str] = frozenset(f for _, f in segments if f is not None)
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Raises:
+            KeyError: 差し込む値が足りない
+        """
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(values[field])
+        return "".join(parts)
+
+
+def compile_templates(templates: Dict[str, str]) -> Dict[str, CompiledTemplate]:
+    """{名前: テンプレート} をまとめてコンパイル"""
+    return {name: CompiledTemplate(source) for name, source in templates.items()}
@@ -26,3 +26,8 @@ class LayerNotAvailableError(KoyomiError):
 class DataNotFoundError(KoyomiError):
     """必要なデータが見つからない"""
     pass
+
+
+class CircuitOpenError(KoyomiError):
+    """外部API（Claude API）が不調のため呼び出しを見送った"""
+    pass
@@ -0,0 +1,234 @@
+"""
+アドバイスキャッシュ（サブスクユーザーのみ）
+
+Zone: Logic（Plan必須）
+責務: 同一プロンプトに対する Claude API 応答の再利用
+
+設計思想:
+- キー = hash(モデル, システムプロンプト, 正規化したユーザープロンプト)
+- 単発利用: キャッシュしない（DATA_POLICY: 完全非保存）
+- サブスク: data/users/{user_id}/advice_cache/{key}.json
+  → 解約時は delete_user_data() でユーザーディレクトリごと削除される
+- 容量・件数の上限を超えたら最終アクセスが古い順に削除（LRU）
+- TTL を過ぎたエントリは読み出し時・削除時に破棄
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.koyomi.storage import json_store
+from src.koyomi.storage.subscription import is_subscription_valid
+
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024  # 5MB / ユーザー
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30日
+
+# プロセス全体のヒット率（全ユーザー合算）
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def get_cache_stats() -> Dict:
+    """キャッシュ統計（プロセス全体）
+
+    Returns:
+        {"hits", "misses", "writes", "evictions", "expired", "hit_rate"}
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    """キャッシュ統計をリセット（テスト用）"""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def canonicalize_prompt(text: str) -> str:
+    """プロンプトの正規化（表記揺れでキャッシュを外さないため）
+
+    - NFKC正規化（全角英数・半角カナの統一）
+    - 行末空白の除去、連続する空行を1行に
+    - 前後の空白除去
+    """
+    text = unicodedata.normalize("NFKC", text)
+    lines = [line.rstrip() for line in text.splitlines()]
+    text = "\n".join(lines)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+class AdviceCache:
+    """ディスク上のLRUキャッシュ（1エントリ1ファイル）"""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS
+    ):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            max_bytes: 合計サイズ上限
+            max_entries: エントリ数上限
+            ttl_seconds: 有効期間（作成からの秒数）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str) -> str:
+        """キャッシュキー生成
+
+        Returns:
+            SHA-256 の16進文字列
+        """
+        payload = json.dumps(
+            [model, canonicalize_prompt(system_prompt), canonicalize_prompt(user_prompt)],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        if not re.fullmatch(r"[0-9a-f]{64}", key):
+            raise ValueError(f"Invalid cache key: {key}")
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """キャッシュ読み出し
+
+        Returns:
+            キャッシュされた応答テキスト（ミス・期限切れ時は None）
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _count("misses")
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            _count("expired")
+            _count("misses")
+            return None
+
+        # 最終アクセス時刻 = mtime（LRU判定用）
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        _count("hits")
+        return entry["text"]
+
+    def put(self, key: str, text: str):
+        """キャッシュ書き込み（アトミック）、書き込み後に上限を超えた分を削除"""
+        path = self._path(key)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        _count("writes")
+        self.evict()
+
+    def evict(self) -> int:
+        """期限切れと上限超過分を削除
+
+        Returns:
+            削除したエントリ数
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        live = []
+        for mtime, size, path in entries:
+            # mtime は作成時刻以降なので、最終アクセスから TTL を超えていれば確実に期限切れ
+            if now - mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                _count("expired")
+                removed += 1
+            else:
+                live.append((mtime, size, path))
+
+        live.sort()
+        total_bytes = sum(size for _, size, _ in live)
+        while live and (len(live) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = live.pop(0)
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            _count("evictions")
+            removed += 1
+
+        return removed
+
+    def usage(self) -> Dict:
+        """ディスク使用量
+
+        Returns:
+            {"entries": int, "bytes": int}
+        """
+        if not self.cache_dir.exists():
+            return {"entries": 0, "bytes": 0}
+        sizes = [p.stat().st_size for p in self.cache_dir.glob("*.json")]
+        return {"entries": len(sizes), "bytes": sum(sizes)}
+
+
+def get_advice_cache(user_id: Optional[str]) -> Optional[AdviceCache]:
+    """ユーザー専用のキャッシュを取得
+
+    Args:
+        user_id: ユーザーID（単発利用は None）
+
+    Returns:
+        AdviceCache（有効なサブスクの場合）
+        None（単発利用、またはサブスク無効の場合 = キャッシュしない）
+
+    Raises:
+        ValueError: 不正なuser_id
+    """
+    if not user_id:
+        return None
+
+    safe_user_id = json_store.sanitize_user_id(user_id)
+
+    # 🔥 重要: サブスク状態をサーバー側で検証
+    if not is_subscription_valid(safe_user_id):
+        return None
+
+    return AdviceCache(json_store.BASE_DIR / safe_user_id / "advice_cache")
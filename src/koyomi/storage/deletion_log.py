@@ -8,40 +8,62 @@ Zone: Logic
 - 削除は確実に記録
 - 既存ログと競合しない
 - 監査証跡として使用可能
+- 出力先は KOYOMI_LOG_DIR（既定 logs/）。テストでは set_log_dir() で一時ディレクトリに向ける
 """
 import logging
+import os
 from pathlib import Path
 from datetime import datetime, timezone
 
 
 # ログディレクトリ
-LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
+LOG_DIR = Path(os.environ.get("KOYOMI_LOG_DIR") or "logs")
 
 # 専用ロガー作成（既存loggerと競合しない）
 deletion_logger = logging.getLogger("koyomi.deletion")
 deletion_logger.setLevel(logging.INFO)
 
-# ファイルハンドラ
-log_file = LOG_DIR / "deletions.log"
-file_handler = logging.FileHandler(log_file, encoding='utf-8')
-file_handler.setLevel(logging.INFO)
-
 # フォーマット
 formatter = logging.Formatter(
     '%(asctime)s,%(levelname)s,%(message)s',
     datefmt='%Y-%m-%dT%H:%M:%S%z'
 )
-file_handler.setFormatter(formatter)
-
-# ハンドラ追加（重複防止）
-if not deletion_logger.handlers:
-    deletion_logger.addHandler(file_handler)
 
 # 親ロガーに伝播しない（既存logと競合防止）
 deletion_logger.propagate = False
 
 
+def set_log_dir(log_dir: Path) -> Path:
+    """ログの出力先ディレクトリを切り替える（ファイルハンドラを差し替え）
+
+    Args:
+        log_dir: 出力先ディレクトリ（なければ作成）
+
+    Returns:
+        ログファイルパス
+    """
+    global LOG_DIR, log_file, file_handler
+    LOG_DIR = Path(log_dir)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_file = LOG_DIR / "deletions.log"
+
+    handler = logging.FileHandler(log_file, encoding='utf-8')
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(formatter)
+
+    # ハンドラは常に1つ（重複防止）
+    for old in list(deletion_logger.handlers):
+        deletion_logger.removeHandler(old)
+        old.close()
+    deletion_logger.addHandler(handler)
+    file_handler = handler
+    return log_file
+
+
+# ファイルハンドラ
+set_log_dir(LOG_DIR)
+
+
 def log_deletion_start(user_id: str, reason: str = "manual"):
     """削除開始をログ記録
     
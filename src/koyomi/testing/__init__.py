@@ -0,0 +1,6 @@
+"""
+テスト・負荷試験用ツール
+
+Zone: Logic
+責務: 外部API（Claude API）なしで API 経路を再現する
+"""
@@ -0,0 +1,455 @@
+"""
+ローカルの疑似 Anthropic Messages API サーバー
+
+Zone: Logic
+責務: API クレジットを使わずに、API 経路の動作確認・負荷試験・レイテンシ試験を行う
+
+設計思想:
+- POST /v1/messages（JSON 応答と SSE ストリーミングの両方）と
+  Message Batches（作成・取得・結果 JSONL）を実装
+- anthropic クライアントは base_url をこのサーバーに向けるだけで動く
+- レイテンシ（最初のバイトまで・チャンク間）は分布関数で指定し、乱数シードで再現可能
+- エラー注入: 確率指定（error_rate）と、次のN回を失敗させる fail_next()
+- 応答は固定文字列、またはリクエストを受け取って文字列を返す関数
+- プロンプトキャッシュも模擬する（cache_control 付きプレフィックスの2回目以降は cache_read）
+
+使用方法:
+    python -m src.koyomi.testing.fake_anthropic --port 8765 --latency 0.5
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=test streamlit run app.py
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Union
+
+from src.koyomi.chat.prompt_compact import estimate_tokens
+
+
+DEFAULT_RESPONSE = """## 総合判断
+条件付きで推奨します。
+
+## 理由
+お互いの強みが補完関係にあります。
+
+## 具体的なアドバイス
+1. 役割分担を最初に明確にする
+2. 週1回の振り返りを設ける
+3. 意思決定のルールを文書化する
+
+## タイミング
+来月上旬の着手が適しています。
+
+## リスクと対策
+方針の違いが表面化しやすいため、早めに合意形成の場を設けてください。
+"""
+
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+
+# --- レイテンシ分布 ---
+
+def fixed(seconds: float) -> Callable[[random.Random], float]:
+    """固定レイテンシ"""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Callable[[random.Random], float]:
+    """一様分布"""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Callable[[random.Random], float]:
+    """対数正規分布（裾の重いレイテンシ。median は中央値、秒）"""
+    mu = math.log(median) if median > 0 else 0.0
+    return lambda rng: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+
+
+class FakeAnthropicServer:
+    """疑似 Messages API サーバー（バックグラウンドスレッドで動作）
+
+    使用例:
+        with FakeAnthropicServer(latency=lognormal(0.3)) as server:
+            consultant = KoyomiConsultant(api_key="test", base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        response: Union[str, Callable[[Dict], str]] = DEFAULT_RESPONSE,
+        latency: Callable[[random.Random], float] = fixed(0.0),
+        chunk_delay: Callable[[random.Random], float] = fixed(0.0),
+        chunk_size: int = 20,
+        error_rate: float = 0.0,
+        error_status: int = 529,
+        seed: Optional[int] = None,
+        batch_latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            response: 応答テキスト、または request(dict) -> テキスト の関数
+            latency: 最初のバイトまでの待ち時間の分布
+            chunk_delay: ストリーミング時のチャンク間の待ち時間の分布
+            chunk_size: ストリーミング時の1チャンクの文字数
+            error_rate: エラーを返す確率
+            error_status: 注入するエラーのHTTPステータス
+            seed: 乱数シード（レイテンシ・エラー注入の再現用）
+            batch_latency: バッチ作成から処理完了（ended）までの秒数
+            host: 待ち受けアドレス
+            port: 待ち受けポート（0 で空きポート）
+        """
+        self.response = response
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.batch_latency = batch_latency
+
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+        self._forced_errors: List[int] = []
+        self._cached_prefixes = set()
+        self._batches: Dict[str, Dict] = {}
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 529):
+        """次の count 回のリクエストを status で失敗させる"""
+        with self._lock:
+            self._forced_errors.extend([status] * count)
+
+    # --- リクエスト処理 ---
+
+    def _draw(self, dist: Callable[[random.Random], float]) -> float:
+        with self._lock:
+            return max(dist(self.rng), 0.0)
+
+    def _next_error(self) -> Optional[int]:
+        with self._lock:
+            if self._forced_errors:
+                return self._forced_errors.pop(0)
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return self.error_status
+        return None
+
+    def _usage(self, request: Dict, text: str) -> Dict:
+        """usage の模擬（cache_control 付きブロックまでをキャッシュ対象とする）"""
+        system = request.get("system") or []
+        if isinstance(system, str):
+            system = [{"type": "text", "text": system}]
+
+        prefix = ""
+        cached_len = 0
+        for block in system:
+            prefix += block.get("text", "")
+            if "cache_control" in block:
+                cached_len = len(prefix)
+        cached_prefix = prefix[:cached_len]
+
+        user = "".join(
+            m["content"] for m in request.get("messages", []) if isinstance(m.get("content"), str)
+        )
+        total = estimate_tokens(prefix + user)
+        cached_tokens = estimate_tokens(cached_prefix)
+
+        with self._lock:
+            hit = cached_prefix and cached_prefix in self._cached_prefixes
+            if cached_prefix:
+                self._cached_prefixes.add(cached_prefix)
+
+        return {
+            "input_tokens": total - cached_tokens,
+            "output_tokens": estimate_tokens(text),
+            "cache_creation_input_tokens": 0 if hit or not cached_prefix else cached_tokens,
+            "cache_read_input_tokens": cached_tokens if hit else 0,
+        }
+
+    def _message(self, request: Dict) -> Dict:
+        """応答メッセージ（JSON 応答・バッチ結果共通）"""
+        text = self.response(request) if callable(self.response) else self.response
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": self._usage(request, text),
+        }
+
+    # --- Message Batches ---
+
+    def _create_batch(self, requests: List[Dict]) -> Dict:
+        """バッチを作成（結果は作成時に確定し、batch_latency 秒後に ended になる）"""
+        results = []
+        for item in requests:
+            with self._lock:
+                self.requests.append(item["params"])
+            status = self._next_error()
+            if status is None:
+                result = {"type": "succeeded", "message": self._message(item["params"])}
+            else:
+                result = {
+                    "type": "errored",
+                    "error": {"type": "error", "error": {
+                        "type": ERROR_TYPES.get(status, "api_error"), "message": "Injected error"
+                    }},
+                }
+            results.append({"custom_id": item["custom_id"], "result": result})
+
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self._batches[batch_id] = {
+                "created": datetime.now(timezone.utc),
+                "ends_at": time.monotonic() + self.batch_latency,
+                "results": results,
+            }
+        return self._batch_object(batch_id)
+
+    def _batch_object(self, batch_id: str) -> Optional[Dict]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+
+        ended = time.monotonic() >= batch["ends_at"]
+        succeeded = sum(1 for r in batch["results"] if r["result"]["type"] == "succeeded")
+        created = batch["created"]
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(batch["results"]),
+                "succeeded": succeeded if ended else 0,
+                "errored": len(batch["results"]) - succeeded if ended else 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": created.isoformat(),
+            "expires_at": (created + timedelta(days=1)).isoformat(),
+            "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": (
+                f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+            ),
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5):
+                    self._send_error(404, "not_found_error", f"Unknown path: {self.path}")
+                    return
+
+                batch = server._batch_object(parts[3])
+                if batch is None or (len(parts) == 5 and parts[4] != "results"):
+                    self._send_error(404, "not_found_error", f"Unknown path: {self.path}")
+                    return
+
+                if len(parts) == 4:
+                    self._send_json(200, batch)
+                    return
+                if batch["processing_status"] != "ended":
+                    self._send_error(400, "invalid_request_error", "Batch is still processing")
+                    return
+
+                with server._lock:
+                    results = server._batches[parts[3]]["results"]
+                payload = "".join(
+                    json.dumps(result, ensure_ascii=False) + "\n" for result in results
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/binary")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                if path not in ("/v1/messages", "/v1/messages/batches"):
+                    self._send_error(404, "not_found_error", f"Unknown path: {self.path}")
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_error(400, "invalid_request_error", "Invalid JSON body")
+                    return
+
+                if path == "/v1/messages/batches":
+                    self._send_json(200, server._create_batch(request.get("requests", [])))
+                    return
+
+                with server._lock:
+                    server.requests.append(request)
+
+                time.sleep(server._draw(server.latency))
+
+                status = server._next_error()
+                if status is not None:
+                    self._send_error(status, ERROR_TYPES.get(status, "api_error"), "Injected error")
+                    return
+
+                message = server._message(request)
+
+                if request.get("stream"):
+                    self._send_stream(
+                        request, message["id"], message["content"][0]["text"], message["usage"]
+                    )
+                else:
+                    self._send_json(200, message)
+
+            def _send_json(self, status: int, body: Dict):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("request-id", f"req_{uuid.uuid4().hex[:24]}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_error(self, status: int, error_type: str, message: str):
+                self._send_json(status, {
+                    "type": "error",
+                    "error": {"type": error_type, "message": message},
+                })
+
+            def _send_event(self, event: str, data: Dict):
+                payload = json.dumps(data, ensure_ascii=False)
+                self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_stream(self, request: Dict, message_id: str, text: str, usage: Dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                try:
+                    self._send_event("message_start", {
+                        "type": "message_start",
+                        "message": {
+                            "id": message_id,
+                            "type": "message",
+                            "role": "assistant",
+                            "model": request.get("model", "fake"),
+                            "content": [],
+                            "stop_reason": None,
+                            "stop_sequence": None,
+                            "usage": dict(usage, output_tokens=1),
+                        },
+                    })
+                    self._send_event("content_block_start", {
+                        "type": "content_block_start",
+                        "index": 0,
+                        "content_block": {"type": "text", "text": ""},
+                    })
+                    for i in range(0, len(text), server.chunk_size):
+                        if i:
+                            time.sleep(server._draw(server.chunk_delay))
+                        self._send_event("content_block_delta", {
+                            "type": "content_block_delta",
+                            "index": 0,
+                            "delta": {"type": "text_delta", "text": text[i:i + server.chunk_size]},
+                        })
+                    self._send_event(
+                        "content_block_stop", {"type": "content_block_stop", "index": 0}
+                    )
+                    self._send_event("message_delta", {
+                        "type": "message_delta",
+                        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                        "usage": {"output_tokens": usage["output_tokens"]},
+                    })
+                    self._send_event("message_stop", {"type": "message_stop"})
+                except (BrokenPipeError, ConnectionResetError):
+                    # クライアントが途中で切断（デッドライン超過など）
+                    pass
+
+        return Handler
+
+
+def main():
+    """コマンドラインから起動"""
+    parser = argparse.ArgumentParser(description="疑似 Anthropic Messages API サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="最初のバイトまでの中央値（秒）")
+    parser.add_argument("--sigma", type=float, default=0.5, help="レイテンシの対数正規分布の sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="チャンク間の待ち時間（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(
+        latency=lognormal(args.latency, args.sigma),
+        chunk_delay=fixed(args.chunk_delay),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Fake Anthropic API: {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
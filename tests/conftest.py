@@ -1,9 +1,13 @@
 """
 pytest共通設定とフィクスチャ
 """
+import os
 import sys
+import tempfile
 from pathlib import Path
 
+import pytest
+
 # プロジェクトルートをPythonパスに追加
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -11,6 +15,8 @@ sys.path.insert(0, str(project_root))
 
 def pytest_configure(config):
     """pytestの設定"""
+    # 削除ログをリポジトリの logs/ に書かない（import 時の出力先。テスト毎には deletion_log_dir）
+    os.environ.setdefault("KOYOMI_LOG_DIR", tempfile.mkdtemp(prefix="koyomi-logs-"))
     config.addinivalue_line(
         "markers", "unit: 単体テスト"
     )
@@ -26,3 +32,35 @@ def pytest_configure(config):
     config.addinivalue_line(
         "markers", "layer2: Layer2（西洋占星術）のテスト"
     )
+
+
+@pytest.fixture(autouse=True)
+def deletion_log_dir(tmp_path):
+    """削除ログの出力先をテスト毎の一時ディレクトリにする"""
+    from src.koyomi.storage.deletion_log import set_log_dir
+    set_log_dir(tmp_path / "logs")
+    yield tmp_path / "logs"
+
+
+@pytest.fixture(autouse=True)
+def reset_api_circuit():
+    """Claude API のサーキットブレーカーをテスト毎に閉じる（失敗系テストの影響を残さない）"""
+    from src.koyomi.chat.resilience import get_breaker
+    get_breaker().record_success()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_api_scheduler():
+    """API スケジューラをテスト毎に作り直す（前のテストの呼び出しでレート制限を消費しない）"""
+    from src.koyomi.chat.scheduler import LLMScheduler, set_scheduler
+    set_scheduler(LLMScheduler())
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_output_budget():
+    """学習した出力トークン予算をテスト毎に捨てる（既定値から始める）"""
+    from src.koyomi.chat.output_budget import get_output_budget
+    get_output_budget().reset()
+    yield
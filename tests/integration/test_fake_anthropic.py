@@ -0,0 +1,130 @@
+"""
+疑似 Anthropic サーバーを使った API 経路の統合テスト
+
+実際の anthropic クライアントで HTTP（JSON / SSE）を通す。
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from src.koyomi.chat.analyzer import IntegratedAnalyzer
+from src.koyomi.chat.batch import BatchRunner, MessageBatchBackend
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.resilience import get_breaker, get_retry_policy
+from src.koyomi.testing.fake_anthropic import FakeAnthropicServer
+
+
+PEOPLE_ANALYSIS = {
+    "私": {
+        "day_kan": "丁",
+        "metaphor": {"本質": "初夏の灯火", "強み": "情熱", "課題": "燃え尽き"},
+    },
+}
+
+
+@pytest.fixture
+def server():
+    with FakeAnthropicServer(response="## 総合判断\n疑似サーバーの回答", chunk_size=4, seed=0) as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(get_retry_policy(), "base_delay", 0.01)
+
+
+def _consultant(server):
+    return KoyomiConsultant(api_key="test-key", base_url=server.base_url)
+
+
+@pytest.mark.integration
+def test_generate_advice_over_http(server):
+    consultant = _consultant(server)
+
+    first = consultant.generate_advice_with_metadata("相性は？", "team", PEOPLE_ANALYSIS, {})
+    second = consultant.generate_advice_with_metadata("相性は？", "team", PEOPLE_ANALYSIS, {})
+
+    assert first["text"] == "## 総合判断\n疑似サーバーの回答"
+    assert first["source"] == "api"
+    assert first["usage"]["cache_creation_input_tokens"] > 0
+    created = first["usage"]["cache_creation_input_tokens"]
+    assert second["usage"]["cache_read_input_tokens"] == created
+    assert server.requests[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+
+@pytest.mark.integration
+def test_stream_advice_over_sse(server):
+    events = list(_consultant(server).stream_advice("相性は？", "team", PEOPLE_ANALYSIS, {}))
+
+    deltas = [e["text"] for e in events if e["type"] == "delta"]
+    assert len(deltas) > 1
+    assert "".join(deltas) == "## 総合判断\n疑似サーバーの回答"
+    assert events[-1]["source"] == "api"
+    assert events[-1]["usage"]["output_tokens"] > 0
+
+
+@pytest.mark.integration
+def test_transient_errors_are_retried(server):
+    server.fail_next(2, status=529)
+
+    result = _consultant(server).generate_advice_with_metadata("相性は？", "team", PEOPLE_ANALYSIS, {})
+
+    assert result["source"] == "api"
+    assert len(server.requests) == 3
+
+
+@pytest.mark.integration
+def test_outage_opens_circuit_and_skips_api(server, monkeypatch):
+    monkeypatch.setattr(get_breaker(), "failure_threshold", 2)
+    server.error_rate = 1.0
+    consultant = _consultant(server)
+
+    for _ in range(2):
+        result = consultant.generate_advice_with_metadata("相性は？", "team", PEOPLE_ANALYSIS, {})
+        assert result["source"] == "fallback"
+    calls_before_open = len(server.requests)
+
+    result = consultant.generate_advice_with_metadata("相性は？", "team", PEOPLE_ANALYSIS, {})
+
+    assert result["source"] == "fallback"
+    assert len(server.requests) == calls_before_open
+    assert get_breaker().state == "open"
+
+
+@pytest.mark.integration
+def test_analyze_consultation_end_to_end(server):
+    analyzer = IntegratedAnalyzer(api_key="test-key", base_url=server.base_url)
+    people = [
+        PersonProfile("A", "経営者", datetime(1990, 6, 15, 10, 30)),
+        PersonProfile("B", "候補者", datetime(1985, 12, 25, 12, 0)),
+    ]
+
+    result = analyzer.analyze_consultation("Bさんを採用すべき？", people)
+
+    assert result["advice"] == "## 総合判断\n疑似サーバーの回答"
+    assert "■ A" in server.requests[0]["messages"][0]["content"]
+
+
+@pytest.mark.integration
+def test_message_batches_over_http(tmp_path):
+    consultations = [
+        {"id": f"c{i}", "query": "相性は？", "consultation_type": "team",
+         "people_analysis": PEOPLE_ANALYSIS, "context": {}}
+        for i in range(3)
+    ]
+    output = tmp_path / "advice.jsonl"
+
+    with FakeAnthropicServer(response="一括の回答", batch_latency=0.2) as server:
+        server.fail_next(1)
+        consultant = _consultant(server)
+        stats = BatchRunner(
+            consultant, MessageBatchBackend(consultant.client), output, poll_interval=0.05
+        ).run(consultations)
+
+    records = {r["id"]: r for r in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert stats["written"] == 3
+    assert records["c0"]["fallback_reason"] == "batch_errored"
+    assert records["c1"]["advice"] == "一括の回答"
+    assert records["c2"]["usage"]["output_tokens"] > 0
@@ -0,0 +1,157 @@
+"""
+アドバイスキャッシュテスト
+
+Zone: Tests
+責務: キャッシュの保存制御・LRU・TTLの検証
+
+設計思想の検証:
+- 単発はキャッシュしない（DATA_POLICY）
+- サブスク有効ならユーザーディレクトリ配下にキャッシュ
+- 解約時の削除でキャッシュも消える
+"""
+import os
+import time
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from src.koyomi.storage.advice_cache import (
+    AdviceCache,
+    canonicalize_prompt,
+    get_advice_cache,
+    get_cache_stats,
+    reset_cache_stats,
+)
+from src.koyomi.storage.json_store import BASE_DIR, delete_user_data
+from src.koyomi.storage.subscription import register_subscription, cancel_subscription
+from src.koyomi.chat.consultant import KoyomiConsultant
+
+
+class FakeMessages:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return type("Message", (), {
+            "content": [type("Block", (), {"text": f"回答{self.calls}"})()],
+            "usage": None,
+        })()
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+
+@pytest.fixture
+def subscriber():
+    user_id = "test_cache_user"
+    register_subscription(user_id, datetime.now(timezone.utc) + timedelta(days=30))
+    yield user_id
+    cancel_subscription(user_id)
+    if (BASE_DIR / user_id).exists():
+        delete_user_data(user_id, reason="test")
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    reset_cache_stats()
+
+
+def _consultant():
+    consultant = KoyomiConsultant(api_key=None)
+    consultant.use_api = True
+    consultant.client = FakeClient()
+    return consultant
+
+
+def _key(n: int) -> str:
+    return AdviceCache.make_key("model", "system", f"user {n}")
+
+
+def test_key_ignores_whitespace_and_width():
+    """全角英数・行末空白の違いは同じキーになること"""
+    assert canonicalize_prompt("ＡＢＣ１  \n\n\n次の行 ") == "ABC1\n\n次の行"
+    assert AdviceCache.make_key("m", "s", "ＡＢＣ \n") == AdviceCache.make_key("m", "s", "ABC")
+    assert AdviceCache.make_key("m1", "s", "u") != AdviceCache.make_key("m2", "s", "u")
+
+
+def test_single_session_is_not_cached():
+    """【重要】単発利用（user_idなし）はキャッシュしないこと"""
+    assert get_advice_cache(None) is None
+    assert get_advice_cache("test_not_subscribed") is None
+
+
+def test_subscriber_response_is_cached(subscriber):
+    """サブスクユーザーの2回目は API を呼ばないこと"""
+    consultant = _consultant()
+    args = ("採用すべき？", "hiring", {}, {})
+
+    first = consultant.generate_advice(*args, user_id=subscriber)
+    second = consultant.generate_advice(*args, user_id=subscriber)
+
+    assert first == second == "回答1"
+    assert consultant.client.messages.calls == 1
+    assert get_cache_stats()["hit_rate"] == 0.5
+    assert list((BASE_DIR / subscriber / "advice_cache").glob("*.json"))
+
+
+def test_non_subscriber_always_calls_api():
+    consultant = _consultant()
+    args = ("採用すべき？", "hiring", {}, {})
+
+    consultant.generate_advice(*args)
+    consultant.generate_advice(*args)
+
+    assert consultant.client.messages.calls == 2
+
+
+def test_cache_removed_on_user_deletion(subscriber):
+    """【重要】解約時の削除でキャッシュも消えること"""
+    _consultant().generate_advice("相性は？", "relationship", {}, {}, user_id=subscriber)
+
+    delete_user_data(subscriber, reason="cancellation")
+
+    assert not (BASE_DIR / subscriber / "advice_cache").exists()
+
+
+def test_lru_eviction_by_entries(tmp_path):
+    cache = AdviceCache(tmp_path, max_entries=2)
+    cache.put(_key(1), "一")
+    cache.put(_key(2), "二")
+    past = time.time() - 10
+    os.utime(tmp_path / f"{_key(1)}.json", (past, past))
+    os.utime(tmp_path / f"{_key(2)}.json", (past - 5, past - 5))
+
+    cache.get(_key(2))  # 2 を最近使ったことにする
+    cache.put(_key(3), "三")
+
+    assert cache.get(_key(1)) is None
+    assert cache.get(_key(2)) == "二"
+    assert cache.get(_key(3)) == "三"
+    assert get_cache_stats()["evictions"] == 1
+
+
+def test_size_bound(tmp_path):
+    cache = AdviceCache(tmp_path, max_bytes=300)
+    for n in range(10):
+        cache.put(_key(n), "あ" * 20)
+
+    assert cache.usage()["bytes"] <= 300
+
+
+def test_ttl_expiry(tmp_path):
+    cache = AdviceCache(tmp_path, ttl_seconds=0.05)
+    cache.put(_key(1), "一")
+
+    time.sleep(0.1)
+
+    assert cache.get(_key(1)) is None
+    assert get_cache_stats()["expired"] == 1
+
+
+def test_invalid_key_is_rejected(tmp_path):
+    """パストラバーサル防止"""
+    with pytest.raises(ValueError):
+        AdviceCache(tmp_path).get("../../etc/passwd")
@@ -0,0 +1,226 @@
+"""
+統合分析エンジン（IntegratedAnalyzer）の単体テスト
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from src.koyomi.chat.analyzer import IntegratedAnalyzer, advice_inputs
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.layer1.engine import MeishikiEngine
+
+
+class SlowConsultant:
+    """API呼び出しの遅延を模したスタブ"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.finished = threading.Event()
+        self.calls = []
+
+    def generate_advice_with_metadata(
+        self, query, consultation_type, people_analysis, context, user_id=None, deadline=None
+    ):
+        self.calls.append(consultation_type)
+        time.sleep(self.delay)
+        self.finished.set()
+        return {"text": "スタブのアドバイス", "source": "api", "usage": {}}
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = IntegratedAnalyzer(api_key=None)
+    analyzer.consultant = SlowConsultant()
+    return analyzer
+
+
+@pytest.fixture
+def people():
+    return [
+        PersonProfile("私", "経営者", datetime(1990, 6, 15, 10, 30)),
+        PersonProfile("候補者", "候補者", datetime(1985, 12, 25, 12, 0)),
+    ]
+
+
+class TestAnalyzeConsultationAsync:
+
+    @pytest.mark.unit
+    def test_same_result_as_sync(self, analyzer, people):
+        query = "この人を採用すべきか迷っています"
+
+        expected = analyzer.analyze_consultation(query, people)
+        actual = asyncio.run(analyzer.analyze_consultation_async(query, people))
+
+        assert actual == expected
+
+    @pytest.mark.unit
+    def test_local_result_delivered_before_advice(self, analyzer, people):
+        received = []
+
+        def on_local_result(partial):
+            received.append((partial, analyzer.consultant.finished.is_set()))
+
+        result = asyncio.run(analyzer.analyze_consultation_async(
+            "この人を採用すべきか迷っています",
+            people,
+            on_local_result=on_local_result,
+        ))
+
+        partial, advice_done = received[0]
+        assert advice_done is False
+        assert partial["advice"] is None
+        assert partial["consultation_type"] == "hiring"
+        assert "compatibility" in partial["people_analysis"]
+        assert partial["follow_up_questions"] == result["follow_up_questions"]
+        assert result["advice"] == "スタブのアドバイス"
+
+    @pytest.mark.unit
+    def test_async_callback_is_awaited(self, analyzer, people):
+        received = []
+
+        async def on_local_result(partial):
+            await asyncio.sleep(0)
+            received.append(partial["consultation_type"])
+
+        asyncio.run(analyzer.analyze_consultation_async(
+            "チーム編成について", people, on_local_result=on_local_result
+        ))
+
+        assert received == ["team"]
+
+    @pytest.mark.unit
+    def test_runs_alongside_other_tasks(self, analyzer, people):
+        async def main():
+            start = time.perf_counter()
+            await asyncio.gather(
+                analyzer.analyze_consultation_async("相性を知りたい", people),
+                asyncio.sleep(0.2),
+            )
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(main())
+
+        # API待ちの間もイベントループはブロックされない
+        assert elapsed < 0.35
+
+
+class TestIterConsultation:
+
+    @pytest.mark.unit
+    def test_event_order(self, analyzer, people):
+        stages = [
+            event["stage"]
+            for event in analyzer.iter_consultation("相性を知りたい", people)
+        ]
+
+        assert stages == ["person", "person", "compatibility", "advice", "complete"]
+
+    @pytest.mark.unit
+    def test_person_yielded_before_advice(self, analyzer, people):
+        events = analyzer.iter_consultation("相性を知りたい", people)
+
+        first = next(events)
+
+        assert first["stage"] == "person"
+        assert first["name"] == "私"
+        assert "day_kan" in first["analysis"]
+        assert analyzer.consultant.calls == []
+
+    @pytest.mark.unit
+    def test_complete_matches_analyze_consultation(self, analyzer, people):
+        events = list(analyzer.iter_consultation("相性を知りたい", people))
+
+        assert events[-1]["result"] == analyzer.analyze_consultation("相性を知りたい", people)
+        assert events[-2]["advice"] == events[-1]["result"]["advice"]
+
+
+class TestChartDeduplication:
+
+    @pytest.mark.unit
+    def test_same_name_gets_unique_keys(self, analyzer):
+        people = [
+            PersonProfile("田中", "A", datetime(1990, 6, 15, 10, 30)),
+            PersonProfile("田中", "B", datetime(1985, 12, 25, 12, 0)),
+            PersonProfile("田中 (2)", "C", datetime(2000, 1, 15, 8, 0)),
+            PersonProfile("compatibility", "D", datetime(2000, 1, 15, 8, 0)),
+        ]
+
+        analysis = analyzer.analyze_consultation("相性を知りたい", people)["people_analysis"]
+
+        assert list(analysis) == [
+            "田中", "田中 (2)", "田中 (2) (2)", "compatibility (2)", "compatibility",
+        ]
+        assert analysis["田中 (2)"]["day_kan"] != analysis["田中"]["day_kan"]
+
+    @pytest.mark.unit
+    def test_identical_charts_computed_once(self, analyzer, monkeypatch):
+        calls = []
+        original = analyzer.meishiki_engine.judge_yojin
+
+        def counting_judge_yojin(birth_dt):
+            calls.append(birth_dt)
+            return original(birth_dt)
+
+        monkeypatch.setattr(analyzer.meishiki_engine, "judge_yojin", counting_judge_yojin)
+        people = [
+            PersonProfile("A", "A", datetime(1990, 6, 15, 10, 30)),
+            PersonProfile("B", "B", datetime(1990, 6, 15, 10, 30)),
+            PersonProfile("C", "C", datetime(1985, 12, 25, 12, 0)),
+        ]
+
+        analysis = analyzer.analyze_consultation("相性を知りたい", people)["people_analysis"]
+
+        assert len(calls) == 2
+        assert analysis["B"]["same_as"] == "A"
+        assert analysis["B"]["pillars"] == analysis["A"]["pillars"]
+        assert "same_as" not in analysis["A"]
+        assert analysis["compatibility"]["score"] == 60
+
+    @pytest.mark.unit
+    def test_duplicate_chart_is_referenced_in_prompt(self, analyzer):
+        people = [
+            PersonProfile("A", "A", datetime(1990, 6, 15, 10, 30)),
+            PersonProfile("B", "B", datetime(1990, 6, 15, 10, 30)),
+        ]
+        local = analyzer._analyze_local("相性を知りたい", people)
+
+        prompt = KoyomiConsultant(api_key=None)._build_user_prompt(
+            "相性を知りたい", local["people_analysis"], local["context"]
+        )
+
+        assert prompt.count("- 日干:") == 1
+        assert "- 命式: Aと同一" in prompt
+        assert "■ compatibility" not in prompt
+
+
+class TestAdviceInputs:
+
+    @pytest.mark.unit
+    def test_inputs_come_from_real_charts(self):
+        time_known = datetime(1990, 6, 15, 10, 30)
+        people = [
+            PersonProfile("山田", "候補者", time_known, birth_time=time_known),
+            PersonProfile("山田", "メンバー", datetime(1985, 12, 25, 12)),
+        ]
+
+        meishiki_data, compatibility_data = advice_inputs(MeishikiEngine(), people)
+
+        assert list(meishiki_data) == ["山田", "山田 (2)"]
+        assert meishiki_data["山田"]["日干"] == "丁"
+        assert sum(meishiki_data["山田"]["五行"].values()) == 8  # 時柱あり
+        assert sum(meishiki_data["山田 (2)"]["五行"].values()) == 6  # 時柱なし
+        assert compatibility_data["roles"] == {"山田": "候補者", "山田 (2)": "メンバー"}
+        assert compatibility_data["score"] == 75
+
+    @pytest.mark.unit
+    def test_single_person_has_no_compatibility(self):
+        meishiki_data, compatibility_data = advice_inputs(
+            MeishikiEngine(), [PersonProfile("A", "本人", datetime(1990, 6, 15, 12))]
+        )
+
+        assert list(meishiki_data) == ["A"]
+        assert compatibility_data == {}
@@ -0,0 +1,135 @@
+"""
+バッチ生成（BatchRunner）の単体テスト
+"""
+import json
+
+import pytest
+
+from src.koyomi.chat.batch import BatchRunner
+from src.koyomi.chat.consultant import KoyomiConsultant
+
+
+def _consultations(count):
+    return [
+        {
+            "id": f"c{i}",
+            "query": "採用すべき？",
+            "consultation_type": "hiring",
+            "people_analysis": {"候補者": {"day_kan": "甲", "metaphor": {"本質": "大樹"}}},
+            "context": {},
+        }
+        for i in range(count)
+    ]
+
+
+class FakeBackend:
+    """投入内容を記録し、is_done が呼ばれた回数で完了させる"""
+
+    def __init__(self, polls_until_done=0, errored=()):
+        self.polls_until_done = polls_until_done
+        self.errored = set(errored)
+        self.submitted = {}
+        self.polls = {}
+
+    def submit(self, requests):
+        batch_id = f"batch-{len(self.submitted)}"
+        self.submitted[batch_id] = requests
+        self.polls[batch_id] = 0
+        return batch_id
+
+    def knows(self, batch_id):
+        return batch_id in self.submitted
+
+    def is_done(self, batch_id):
+        self.polls[batch_id] += 1
+        return self.polls[batch_id] > self.polls_until_done
+
+    def results(self, batch_id):
+        for request in self.submitted[batch_id]:
+            if request["custom_id"] in self.errored:
+                yield request["custom_id"], {
+                    "source": "fallback", "fallback_reason": "batch_errored"
+                }
+            else:
+                yield request["custom_id"], {
+                    "text": "回答", "source": "api",
+                    "usage": {"input_tokens": 10, "output_tokens": 5,
+                              "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0},
+                }
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture
+def consultant():
+    consultant = KoyomiConsultant(api_key=None)
+    consultant.use_api = False
+    return consultant
+
+
+@pytest.mark.unit
+def test_results_are_written_per_consultation(tmp_path, consultant):
+    backend = FakeBackend(polls_until_done=2)
+    sleeps = []
+    output = tmp_path / "advice.jsonl"
+
+    runner = BatchRunner(consultant, backend, output, batch_size=2, sleep=sleeps.append)
+    stats = runner.run(_consultations(5))
+
+    assert stats == {"submitted": 5, "written": 5, "skipped": 0}
+    assert [len(requests) for requests in backend.submitted.values()] == [2, 2, 1]
+    assert sleeps
+    records = _read(output)
+    assert sorted(r["id"] for r in records) == ["c0", "c1", "c2", "c3", "c4"]
+    assert all(r["source"] == "api" and r["advice"] == "回答" for r in records)
+    request = backend.submitted["batch-0"][0]["params"]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "採用すべき？" in request["messages"][0]["content"]
+
+
+@pytest.mark.unit
+def test_failed_items_are_filled_with_fallback(tmp_path, consultant):
+    output = tmp_path / "advice.jsonl"
+
+    BatchRunner(consultant, FakeBackend(errored={"req-1"}), output).run(_consultations(2))
+
+    records = {r["id"]: r for r in _read(output)}
+    assert records["c0"]["source"] == "api"
+    assert records["c1"]["source"] == "fallback"
+    assert records["c1"]["fallback_reason"] == "batch_errored"
+    assert "具体的なアドバイス" in records["c1"]["advice"]
+
+
+@pytest.mark.unit
+def test_resume_skips_written_and_waits_for_submitted(tmp_path, consultant):
+    output = tmp_path / "advice.jsonl"
+    checkpoint = tmp_path / "advice.jsonl.checkpoint.json"
+    backend = FakeBackend()
+    # 前回: c0 は書き出し済み（最終行は途中で切れている）、c1-c2 は投入済み
+    backend.submit([{"custom_id": "req-0", "params": {}}, {"custom_id": "req-1", "params": {}}])
+    checkpoint.write_text(json.dumps({"batches": {"batch-0": {"req-0": "c1", "req-1": "c2"}}}))
+    output.write_text('{"id": "c0", "advice": "前回"}\n{"id": "c3", "adv', encoding="utf-8")
+
+    stats = BatchRunner(consultant, backend, output).run(_consultations(4))
+
+    assert stats == {"submitted": 1, "written": 3, "skipped": 3}
+    assert [r["custom_id"] for r in backend.submitted["batch-1"]] == ["req-0"]
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[1] == '{"id": "c3", "adv'
+    assert sorted(json.loads(line)["id"] for line in lines[2:]) == ["c1", "c2", "c3"]
+    assert json.loads(checkpoint.read_text()) == {"batches": {}}
+
+
+@pytest.mark.unit
+def test_unknown_batches_are_resubmitted(tmp_path, consultant):
+    output = tmp_path / "advice.jsonl"
+    checkpoint = tmp_path / "advice.jsonl.checkpoint.json"
+    checkpoint.write_text(json.dumps({"batches": {"local_lost": {"req-0": "c0"}}}))
+    backend = FakeBackend()
+
+    stats = BatchRunner(consultant, backend, output).run(_consultations(1))
+
+    assert stats["submitted"] == 1
+    assert [r["id"] for r in _read(output)] == ["c0"]
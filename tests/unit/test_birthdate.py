@@ -0,0 +1,143 @@
+"""
+生年月日抽出の単体テスト
+"""
+from datetime import date, datetime
+
+import pytest
+
+from src.koyomi.chat.birthdate import extract_birthdates
+from src.koyomi.chat.interviewer import Interviewer
+
+
+class TestExtractBirthdates:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("text, expected", [
+        ("1990年6月15日です", datetime(1990, 6, 15, 12)),
+        ("1990/6/15", datetime(1990, 6, 15, 12)),
+        ("1990-06-15", datetime(1990, 6, 15, 12)),
+        ("西暦1990.6.15", datetime(1990, 6, 15, 12)),
+        ("１９９０年６月１５日", datetime(1990, 6, 15, 12)),
+        ("平成2年6月15日", datetime(1990, 6, 15, 12)),
+        ("平成元年1月8日", datetime(1989, 1, 8, 12)),
+        ("令和元年5月1日", datetime(2019, 5, 1, 12)),
+        ("㍼60年12月25日", datetime(1985, 12, 25, 12)),
+        ("H2.6.15", datetime(1990, 6, 15, 12)),
+        ("s60/3/3", datetime(1985, 3, 3, 12)),
+    ])
+    def test_date_formats(self, text, expected):
+        [mention] = extract_birthdates(text)
+
+        assert mention.birth_date == expected
+        assert mention.birth_time is None
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("text, expected", [
+        ("1990/6/15 10:30", datetime(1990, 6, 15, 10, 30)),
+        ("1990年6月15日生まれ、午後3時半", datetime(1990, 6, 15, 15, 30)),
+        ("1990年6月15日 午前12時5分", datetime(1990, 6, 15, 0, 5)),
+        ("１９９０／６／１５ １０：３０", datetime(1990, 6, 15, 10, 30)),
+    ])
+    def test_birth_time(self, text, expected):
+        [mention] = extract_birthdates(text)
+
+        assert mention.birth_date == expected
+        assert mention.birth_time == expected
+
+    @pytest.mark.unit
+    def test_multiple_people_with_names(self):
+        mentions = extract_birthdates("候補者の山田さんは平成2年6月15日、既存は佐藤 1985/12/25 8時、私はS60.3.3です")
+
+        assert [m.name for m in mentions] == ["山田", "佐藤", None]
+        assert [m.birth_date for m in mentions] == [
+            datetime(1990, 6, 15, 12), datetime(1985, 12, 25, 8), datetime(1985, 3, 3, 12)
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("text", [
+        "2月30日", "1990年2月30日", "平成40年1月1日", "電話は03-1234-5678", "1980年生まれ", "12345/6/7",
+    ])
+    def test_invalid_or_partial_dates_are_ignored(self, text):
+        assert extract_birthdates(text) == []
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("text, valid", [
+        ("昭和64年1月7日", True),
+        ("昭和64年3月1日", False),
+        ("S64/1/8", False),
+        ("平成元年1月7日", False),
+        ("平成31年4月30日", True),
+        ("平成31年5月1日", False),
+        ("令和元年4月30日", False),
+        ("大正15年12月25日", False),
+        ("昭和元年12月25日", True),
+        ("昭和0年1月1日", False),
+    ])
+    def test_era_boundaries(self, text, valid):
+        assert bool(extract_birthdates(text)) is valid
+
+    @pytest.mark.unit
+    def test_future_dates_are_ignored(self):
+        today = date(2026, 10, 19)
+
+        assert extract_birthdates("2026年12月31日までに決めたい", today=today) == []
+        assert extract_birthdates("令和9年1月1日", today=today) == []
+        [mention] = extract_birthdates("2026/10/19", today=today)
+        assert mention.birth_date == datetime(2026, 10, 19, 12)
+
+    @pytest.mark.unit
+    def test_invalid_time_keeps_date(self):
+        [mention] = extract_birthdates("1990年6月15日の25時")
+
+        assert mention.birth_date == datetime(1990, 6, 15, 12)
+        assert mention.birth_time is None
+
+
+class TestInterviewerPeople:
+
+    @pytest.mark.unit
+    def test_answers_fill_people_with_question_roles(self):
+        interviewer = Interviewer()
+        interviewer.process_answer("この人を採用すべき？")
+        reply = interviewer.process_answer("山田太郎さんは平成2年6月15日生まれです")
+        interviewer.process_answer("佐藤 1985/12/25、鈴木 1988/3/3")
+        interviewer.process_answer("佐藤 1985/12/25")  # 重複は追加しない
+
+        assert "山田太郎（候補者）" in reply
+        assert [(p.name, p.role) for p in interviewer.state.people] == [
+            ("山田太郎", "候補者"), ("佐藤", "メンバー"), ("鈴木", "メンバー")
+        ]
+
+    @pytest.mark.unit
+    def test_interview_waits_for_a_birthdate(self):
+        interviewer = Interviewer()
+        for answer in ["4", "まだ内緒です", "独立", "来月"]:
+            reply = interviewer.process_answer(answer)
+
+        assert "生年月日が必要です" in reply
+        assert not interviewer.state.is_complete()
+
+        interviewer.process_answer("1990年6月15日です")
+        assert interviewer.state.is_complete()
+        assert interviewer.state.people[0].role == "関係者"
+
+    @pytest.mark.unit
+    def test_dates_in_other_answers_are_not_people(self):
+        interviewer = Interviewer()
+        interviewer.process_answer("1990年6月15日生まれの山田さんと組むタイミングを相談したい")
+        assert interviewer.state.consultation_type == "タイミング判断"
+        interviewer.process_answer("私は1985/12/25です")
+        interviewer.process_answer("2025年4月1日に始めた事業の拡大")
+        interviewer.process_answer("2026年12月31日までに決めたい")
+
+        assert [(p.name, p.role) for p in interviewer.state.people] == [("本人", "本人")]
+
+    @pytest.mark.unit
+    def test_project_start_date_is_not_a_person(self):
+        interviewer = Interviewer()
+        interviewer.process_answer("チーム編成の相談です")
+        interviewer.process_answer("田中 1980/1/1、伊藤 1990/2/2")
+        reply = interviewer.process_answer("プロジェクトは2025年4月1日開始です")
+
+        assert "プロジェクト" not in reply
+        assert [p.name for p in interviewer.state.people] == ["田中", "伊藤"]
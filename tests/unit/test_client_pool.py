@@ -0,0 +1,72 @@
+"""
+Anthropic クライアント共有レジストリの単体テスト
+"""
+import time
+
+import pytest
+
+from src.koyomi.chat.client_pool import ClientRegistry, get_client
+
+
+class FakeClient:
+    def __init__(self, api_key, base_url=None):
+        self.api_key = api_key
+        self.base_url = base_url
+
+
+class TestClientRegistry:
+
+    @pytest.mark.unit
+    def test_same_key_reuses_client(self):
+        registry = ClientRegistry(factory=FakeClient)
+
+        first = registry.get("sk-test-1")
+        second = registry.get("sk-test-1")
+
+        assert first is second
+        assert registry.stats() == {"size": 1, "created": 1, "reused": 1, "evicted": 0}
+
+    @pytest.mark.unit
+    def test_different_key_or_base_url_gets_new_client(self):
+        registry = ClientRegistry(factory=FakeClient)
+
+        a = registry.get("sk-test-1")
+        b = registry.get("sk-test-2")
+        c = registry.get("sk-test-1", base_url="http://127.0.0.1:8080")
+
+        assert len({id(a), id(b), id(c)}) == 3
+        assert c.base_url == "http://127.0.0.1:8080"
+
+    @pytest.mark.unit
+    def test_lru_bound(self):
+        registry = ClientRegistry(factory=FakeClient, max_clients=2)
+        a = registry.get("a")
+        registry.get("b")
+        registry.get("a")  # a を最近使ったことにする
+        registry.get("c")
+
+        assert registry.get("a") is a
+        assert registry.stats()["size"] == 2
+        assert registry.stats()["evicted"] == 1
+
+    @pytest.mark.unit
+    def test_idle_clients_are_evicted(self):
+        registry = ClientRegistry(factory=FakeClient, idle_seconds=0.05)
+        a = registry.get("a")
+
+        time.sleep(0.1)
+
+        assert registry.get("a") is not a
+        assert registry.stats()["evicted"] == 1
+
+    @pytest.mark.unit
+    def test_api_key_is_not_stored_as_key(self):
+        registry = ClientRegistry(factory=FakeClient)
+        registry.get("sk-secret")
+
+        assert all("sk-secret" not in key for key in registry._clients)
+
+    @pytest.mark.unit
+    def test_empty_key_is_rejected(self):
+        with pytest.raises(ValueError):
+            get_client("")
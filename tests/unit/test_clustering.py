@@ -0,0 +1,142 @@
+"""
+相性グラフクラスタリングの単体テスト
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import combinations
+
+import pytest
+
+from src.koyomi.layer1.engine import JIKKAN, MeishikiEngine
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.analytics.clustering import (
+    CompatibilityGraph,
+    UnionFind,
+    cluster_by_compatibility,
+    cluster_people,
+    pair_score,
+)
+
+
+def _brute_force_components(keys, threshold):
+    """N² の素朴な実装（検証用）"""
+    uf = UnionFind(len(keys))
+    for i in range(len(keys)):
+        for j in range(i + 1, len(keys)):
+            if pair_score(keys[i], keys[j]) >= threshold:
+                uf.union(i, j)
+    return sorted(sorted(g) for g in uf.groups())
+
+
+class TestClustering:
+
+    @pytest.mark.unit
+    def test_pair_score_is_symmetric(self):
+        for a in JIKKAN:
+            for b in JIKKAN:
+                assert pair_score(a, b) == pair_score(b, a)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("threshold", [40, 55, 60, 77.5, 80])
+    def test_matches_brute_force(self, threshold):
+        rng = random.Random(threshold)
+        keys = [rng.choice(JIKKAN) for _ in range(60)]
+
+        graph = CompatibilityGraph(keys, threshold=threshold)
+        actual = sorted(sorted(g) for g in graph.connected_components())
+
+        assert actual == _brute_force_components(keys, threshold)
+
+    @pytest.mark.unit
+    def test_edge_count_without_materialising(self):
+        keys = ["甲", "甲", "乙", "丙", "庚"]
+        graph = CompatibilityGraph(keys, threshold=60)
+
+        expected = sum(
+            1
+            for i in range(len(keys))
+            for j in range(i + 1, len(keys))
+            if pair_score(keys[i], keys[j]) >= 60
+        )
+        assert graph.edge_count() == expected
+
+    @pytest.mark.unit
+    def test_cluster_output(self):
+        # 木（甲乙）は同じ五行、木と火（丙）は相生、金（庚）は木・火と相克
+        result = cluster_by_compatibility(
+            ["甲", "乙", "丙", "庚"],
+            threshold=60,
+            names=["A", "B", "C", "D"],
+        )
+
+        assert result["assignments"] == [0, 0, 0, 1]
+        assert result["clusters"][0]["names"] == ["A", "B", "C"]
+        assert result["clusters"][0]["dominant_gogyo"] == "木"
+        assert result["clusters"][1]["mean_pair_score"] is None
+        assert result["summary"]["clusters"] == 2
+        assert result["summary"]["singletons"] == 1
+        assert result["summary"]["largest"] == 3
+
+    @pytest.mark.unit
+    def test_cluster_people(self):
+        people = [
+            PersonProfile("A", "A", datetime(1990, 6, 15, 12, 0)),
+            PersonProfile("B", "B", datetime(1990, 6, 15, 12, 0)),
+        ]
+
+        result = cluster_people(people, threshold=60)
+
+        assert result["assignments"] == [0, 0]
+        assert result["clusters"][0]["mean_pair_score"] == 60
+
+
+@pytest.fixture(scope="module")
+def roster():
+    """ランダムな生年月日の名簿（日干は命式エンジンで計算）"""
+    rng = random.Random(7)
+    engine = MeishikiEngine()
+    people = [
+        PersonProfile(
+            f"社員{i}", "メンバー",
+            datetime(1960, 1, 1, 12) + timedelta(days=rng.randrange(15000))
+        )
+        for i in range(400)
+    ]
+    kans = [engine.calc_pillars(p.birth_date, has_time=False)["day"]["kan"] for p in people]
+    return people, kans
+
+
+class TestCliquePartition:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("threshold", [40, 55, 60, 70, 77.5, 80])
+    def test_every_pair_in_a_cluster_meets_threshold(self, roster, threshold):
+        people, kans = roster
+
+        result = cluster_people(people, threshold=threshold)
+
+        members = sorted(i for cluster in result["clusters"] for i in cluster["members"])
+        assert members == list(range(len(people)))
+        for cluster in result["clusters"]:
+            for i, j in combinations(cluster["members"], 2):
+                assert pair_score(kans[i], kans[j]) >= threshold
+            assert cluster["density"] in (None, 1.0)
+
+    @pytest.mark.unit
+    def test_generating_cycle_does_not_collapse_into_one_cluster(self, roster):
+        people, kans = roster
+
+        result = cluster_people(people, threshold=60)
+
+        # 連結成分なら全員が1つになる（相生の5サイクル）
+        assert len(CompatibilityGraph(kans, threshold=60).connected_components()) == 1
+        assert result["summary"]["largest"] < len(people)
+        for cluster in result["clusters"]:
+            assert len({kans[i] for i in cluster["members"]}) <= 4  # 隣り合う2つの五行まで
+
+    @pytest.mark.unit
+    def test_strict_threshold_pairs_generating_elements(self):
+        result = cluster_by_compatibility(["甲", "丙", "戊", "庚"], threshold=70)
+
+        # 木→火→土→金 の相生のうち、重ならない2組
+        assert sorted(sorted(c["members"]) for c in result["clusters"]) == [[0, 1], [2, 3]]
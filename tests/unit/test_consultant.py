@@ -0,0 +1,277 @@
+"""
+AIコンサルタント（KoyomiConsultant / AdviceGenerator）の単体テスト
+
+Claude API はフェイククライアントで置き換える。
+"""
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.advice import AdviceGenerator
+from src.koyomi.chat.prompt_cache import MIN_CACHEABLE_TOKENS
+from src.koyomi.chat.prompt_compact import estimate_tokens
+
+
+class FakeUsage:
+    input_tokens = 120
+    output_tokens = 30
+    cache_creation_input_tokens = 0
+    cache_read_input_tokens = 100
+
+
+class FakeStream:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def get_final_message(self):
+        return type("Message", (), {"usage": FakeUsage()})()
+
+    @property
+    def text_stream(self):
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and i == self.fail_after:
+                raise ConnectionError("stream interrupted")
+            yield chunk
+
+
+class FakeMessages:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        block = type("Block", (), {"text": "".join(self.chunks)})()
+        return type("Message", (), {"content": [block], "usage": FakeUsage()})()
+
+    @contextmanager
+    def stream(self, **kwargs):
+        self.requests.append(kwargs)
+        yield FakeStream(self.chunks, self.fail_after)
+
+
+class FakeClient:
+    def __init__(self, chunks, fail_after=None):
+        self.messages = FakeMessages(chunks, fail_after)
+
+
+PEOPLE_ANALYSIS = {
+    "私": {
+        "day_kan": "丁",
+        "metaphor": {"本質": "初夏の灯火", "強み": "情熱、芸術性", "課題": "燃え尽き"},
+        "yojin": ["甲", "庚"],
+    },
+    "compatibility": {"score": 75, "relation": "相生"},
+}
+
+
+def _consultant(client):
+    consultant = KoyomiConsultant(api_key=None)
+    consultant.use_api = True
+    consultant.client = client
+    return consultant
+
+
+def _collect(events):
+    text = ""
+    for event in events:
+        if event["type"] == "fallback":
+            text = event["text"]
+        elif event["type"] == "delta":
+            text += event["text"]
+    return text
+
+
+class TestStreamAdvice:
+
+    @pytest.mark.unit
+    def test_yields_deltas_in_order(self):
+        consultant = _consultant(FakeClient(["## 総合", "判断\n", "推奨"]))
+
+        events = list(consultant.stream_advice("相性は？", "relationship", PEOPLE_ANALYSIS, {}))
+
+        assert [e["type"] for e in events] == ["delta", "delta", "delta", "done"]
+        assert _collect(events) == "## 総合判断\n推奨"
+        assert events[-1]["source"] == "api"
+        assert events[-1]["usage"]["cache_read_input_tokens"] == 100
+
+    @pytest.mark.unit
+    def test_falls_back_when_stream_breaks(self):
+        consultant = _consultant(FakeClient(["途中まで", "生成"], fail_after=1))
+
+        events = list(consultant.stream_advice("相性は？", "relationship", PEOPLE_ANALYSIS, {}))
+
+        assert events[0] == {"type": "delta", "text": "途中まで"}
+        assert events[-2]["type"] == "fallback"
+        assert events[-1]["source"] == "fallback"
+        assert _collect(events) == consultant._generate_fallback(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}
+        )
+
+    @pytest.mark.unit
+    def test_without_api_yields_fallback_only(self):
+        consultant = KoyomiConsultant(api_key=None)
+        consultant.use_api = False
+
+        events = list(consultant.stream_advice("相性は？", "relationship", PEOPLE_ANALYSIS, {}))
+
+        assert [e["type"] for e in events] == ["fallback", "done"]
+
+    @pytest.mark.unit
+    def test_advice_generator_stream(self):
+        generator = AdviceGenerator(use_claude_api=False)
+        generator.use_claude_api = True
+        generator.client = FakeClient(["結論: ", "推奨"])
+
+        events = list(generator.stream_advice("採用", {}, {"score": 75}, "採用すべき？"))
+
+        assert _collect(events) == "結論: 推奨"
+        assert generator.client.messages.requests[0]["messages"][0]["content"].endswith(
+            "【相談内容】\n採用すべき？"
+        )
+
+
+class TestPromptCachingLayout:
+
+    @pytest.mark.unit
+    def test_static_prefix_is_identical_and_cached(self):
+        consultant = KoyomiConsultant(api_key=None)
+
+        hiring = consultant._build_system_prompt("hiring")
+        team = consultant._build_system_prompt("team")
+
+        assert hiring[0] == team[0]
+        assert hiring[0]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in hiring[1]
+        assert "【採用判断のポイント】" in hiring[1]["text"]
+
+    @pytest.mark.unit
+    def test_cached_prefix_reaches_minimum_length(self):
+        consultant = KoyomiConsultant(api_key=None)
+        generator = AdviceGenerator(use_claude_api=False)
+
+        for blocks in (consultant._build_system_prompt("hiring"), generator._build_system_prompt()):
+            assert estimate_tokens(blocks[0]["text"]) >= MIN_CACHEABLE_TOKENS
+
+    @pytest.mark.unit
+    def test_advice_generator_keeps_request_data_out_of_system(self):
+        generator = AdviceGenerator(use_claude_api=False)
+        generator.use_claude_api = True
+        generator.client = FakeClient(["回答"])
+
+        generator.generate_advice("採用", {"person1": {"日干": "丙"}}, {"score": 75}, "Q1")
+        generator.generate_advice("チーム編成", {"person1": {"日干": "癸"}}, {"score": 40}, "Q2")
+
+        first, second = generator.client.messages.requests
+        assert first["system"] == second["system"]
+        assert "person1" not in str(first["system"])
+        assert "Q1" not in str(first["system"])
+        assert "person1" in first["messages"][0]["content"]
+
+    @pytest.mark.unit
+    def test_metadata_reports_cache_read_tokens(self):
+        consultant = _consultant(FakeClient(["回答"]))
+
+        result = consultant.generate_advice_with_metadata(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}
+        )
+
+        assert result["text"] == "回答"
+        assert result["source"] == "api"
+        assert result["usage"] == {
+            "input_tokens": 120,
+            "output_tokens": 30,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 100,
+        }
+
+
+class SlowMessages(FakeMessages):
+    """最初のトークンまでに delay 秒かかるフェイク"""
+
+    def __init__(self, chunks, delay):
+        super().__init__(chunks)
+        self.delay = delay
+
+    @contextmanager
+    def stream(self, **kwargs):
+        self.requests.append(kwargs)
+        time.sleep(self.delay)
+        yield FakeStream(self.chunks)
+
+
+class TestAdviceDeadline:
+
+    @pytest.mark.unit
+    def test_returns_fallback_when_first_token_is_late(self):
+        client = FakeClient([])
+        client.messages = SlowMessages(["AIの", "回答"], delay=0.3)
+        consultant = _consultant(client)
+
+        started = time.perf_counter()
+        result = consultant.generate_advice_with_metadata(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=0.05
+        )
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.25
+        assert result["source"] == "fallback"
+        assert result["text"] == consultant._generate_fallback(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}
+        )
+
+        upgraded = result["pending"].result(timeout=2)
+        assert upgraded["text"] == "AIの回答"
+        assert upgraded["source"] == "api"
+
+    @pytest.mark.unit
+    def test_fast_api_is_returned_directly(self):
+        consultant = _consultant(FakeClient(["AIの", "回答"]))
+
+        result = consultant.generate_advice_with_metadata(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=1.0
+        )
+
+        assert result["text"] == "AIの回答"
+        assert result["source"] == "api"
+        assert "pending" not in result
+
+    @pytest.mark.unit
+    def test_abandoned_streams_do_not_starve_new_requests(self):
+        # 期限切れで打ち切った遅いストリームがワーカー（8）を使い切っている状態
+        slow_client = FakeClient([])
+        slow_client.messages = SlowMessages(["遅い回答"], delay=1.0)
+        slow = _consultant(slow_client)
+        pending = []
+        for _ in range(10):
+            result = slow.generate_advice_with_metadata(
+                "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=0.05
+            )
+            assert result["source"] == "fallback"
+            pending.append(result["pending"])
+
+        fast = _consultant(FakeClient(["AIの", "回答"]))
+        result = fast.generate_advice_with_metadata(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=0.5
+        )
+
+        assert result["source"] == "api"
+        assert result["text"] == "AIの回答"
+        assert all(future.result(timeout=5)["source"] == "api" for future in pending)
+
+    @pytest.mark.unit
+    def test_stream_switches_to_fallback_at_deadline(self):
+        client = FakeClient([])
+        client.messages = SlowMessages(["回答"], delay=0.3)
+        consultant = _consultant(client)
+
+        events = list(consultant.stream_advice(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=0.05
+        ))
+
+        assert [e["type"] for e in events] == ["fallback", "done"]
+        assert events[-1]["pending"].result(timeout=2)["text"] == "回答"
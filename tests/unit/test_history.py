@@ -0,0 +1,216 @@
+"""
+チャット履歴の圧縮（ChatHistory）の単体テスト
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.koyomi.chat.history import (
+    OMITTED_MARK,
+    ChatHistory,
+    LLMSummarizer,
+    rule_summary,
+    trim_summary,
+)
+
+
+class StubMessages:
+
+    def __init__(self, text=None, error=None):
+        self.text = text
+        self.error = error
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.text)], usage=None, stop_reason="end_turn"
+        )
+
+
+class BlockingRefiner:
+    """release() されるまで返らない refiner（要約 = 発言の本文を並べたもの）"""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.calls = []
+
+    def release(self):
+        self.released.set()
+
+    def __call__(self, summary, messages):
+        self.calls.append([m["content"] for m in messages])
+        assert self.released.wait(timeout=5)
+        return "・要約: " + " / ".join(m["content"] for m in messages)
+
+
+def _chat(history: ChatHistory, turns: int, answer: str = "回答"):
+    for i in range(turns):
+        history.append("user", f"質問{i}")
+        history.append("assistant", f"{answer}{i}")
+
+
+class TestChatHistory:
+
+    @pytest.mark.unit
+    def test_old_turns_are_folded_into_summary(self):
+        history = ChatHistory(keep_turns=3, visible_turns=2)
+        history.append("assistant", "こんにちは")
+        _chat(history, 4)
+
+        assert [m["content"] for m in history.messages] == [
+            "質問1", "回答1", "質問2", "回答2", "質問3", "回答3"
+        ]
+        assert history.summary == "・こんにちは\n・質問0 → 回答0"
+        assert history.folded_messages == 3
+        assert [m["content"] for m in history.visible()] == ["質問2", "回答2", "質問3", "回答3"]
+        assert history.hidden_count() == 5
+
+    @pytest.mark.unit
+    def test_byte_budget_is_enforced(self):
+        history = ChatHistory(keep_turns=100, max_bytes=2000)
+        _chat(history, 20, answer="長い回答" * 50)
+
+        assert history.size_bytes() <= 2000
+        assert history.messages[-1]["content"].endswith("19")
+        assert history.folded_messages + len(history.messages) == 40
+        assert history.summary.startswith(OMITTED_MARK)
+
+    @pytest.mark.unit
+    def test_latest_turn_is_kept_even_if_over_budget(self):
+        history = ChatHistory(max_bytes=100)
+        history.append("user", "質問")
+        history.append("assistant", "あ" * 1000)
+
+        assert len(history.messages) == 2
+
+    @pytest.mark.unit
+    def test_edited_message_is_compacted_on_request(self):
+        history = ChatHistory(keep_turns=10, max_bytes=3000)
+        _chat(history, 3, answer="長い回答" * 50)
+        history.append("user", "質問")
+        message = history.append("assistant", "仮の回答")
+        message["content"] = "差し替え後の回答" * 60
+        assert history.size_bytes() > 3000
+        history.compact()
+
+        assert history.size_bytes() <= 3000
+        assert history.messages[-1] is message
+
+    @pytest.mark.unit
+    def test_replace_by_id(self):
+        history = ChatHistory()
+        history.append("user", "採用すべき？")
+        message = history.append("assistant", "## 分析結果\n\n基本の回答\n\n---")
+
+        assert history.replace(message["id"], "基本の回答", "詳細な回答")
+        assert history.messages[-1]["content"] == "## 分析結果\n\n詳細な回答\n\n---"
+
+    @pytest.mark.unit
+    def test_replace_after_folding_updates_summary(self):
+        history = ChatHistory(keep_turns=2)
+        history.append("user", "採用すべき？")
+        message = history.append("assistant", "基本の回答")
+        _chat(history, 2)
+        assert "基本の回答" in history.summary
+
+        assert history.replace(message["id"], "基本の回答", "詳細な回答")
+        assert history.summary.endswith("・詳細な回答")
+        assert all(m["id"] != message["id"] for m in history.messages)
+
+    @pytest.mark.unit
+    def test_replace_ignores_ids_from_before_clear(self):
+        history = ChatHistory()
+        message = history.append("assistant", "基本の回答")
+        history.clear()
+        history.append("assistant", "基本の回答")
+
+        assert not history.replace(message["id"], "基本の回答", "詳細な回答")
+        assert history.messages[0]["content"] == "基本の回答"
+        assert history.summary == ""
+
+    @pytest.mark.unit
+    def test_clear(self):
+        history = ChatHistory(keep_turns=1)
+        _chat(history, 3)
+        history.clear()
+
+        assert history.messages == [] and history.summary == "" and history.hidden_count() == 0
+
+    @pytest.mark.unit
+    def test_refiner_runs_in_background(self):
+        refiner = BlockingRefiner()
+        history = ChatHistory(keep_turns=1, refiner=refiner)
+
+        _chat(history, 2)
+        assert history.summary == "・質問0 → 回答0"  # append() は refiner を待たない
+
+        refiner.release()
+        history.wait_for_summary(timeout=5)
+        assert history.summary == "・要約: 質問0 / 回答0"
+
+        _chat(history, 1, answer="追加")
+        history.wait_for_summary(timeout=5)
+        assert history.summary == "・要約: 質問1 / 回答1"
+        assert refiner.calls[-1] == ["質問1", "回答1"]
+
+    @pytest.mark.unit
+    def test_replace_before_refining_rebuilds_summary(self):
+        refiner = BlockingRefiner()
+        history = ChatHistory(keep_turns=1, refiner=refiner)
+        history.append("user", "採用すべき？")
+        message = history.append("assistant", "基本の回答")
+        history.append("user", "次の相談")
+
+        assert history.replace(message["id"], "基本の回答", "詳細な回答")
+        assert history.summary == "・採用すべき？ → 詳細な回答"
+
+        refiner.release()
+        history.wait_for_summary(timeout=5)
+        assert history.summary == "・要約: 採用すべき？ / 詳細な回答"
+
+
+class TestSummaries:
+
+    @pytest.mark.unit
+    def test_rule_summary_uses_first_body_line(self):
+        summary = rule_summary("", [
+            {"role": "user", "content": "この人を採用すべき？"},
+            {"role": "assistant", "content": "## 🎯 分析結果\n\n---\n**結論**: 採用を推奨します"},
+        ])
+
+        assert summary == "・この人を採用すべき？ → 結論: 採用を推奨します"
+
+    @pytest.mark.unit
+    def test_trim_summary_drops_oldest_lines(self):
+        summary = "\n".join(f"・行{i}" for i in range(100))
+        trimmed = trim_summary(summary, 60)
+
+        assert len(trimmed.encode("utf-8")) <= 60
+        assert trimmed.startswith(OMITTED_MARK)
+        assert trimmed.endswith("・行99")
+
+    @pytest.mark.unit
+    def test_llm_summarizer(self):
+        messages = StubMessages(text="・採用の相談。結論は推奨")
+        summarizer = LLMSummarizer(SimpleNamespace(messages=messages))
+        history = ChatHistory(keep_turns=1, summarizer=summarizer)
+
+        history.append("user", "採用すべき？")
+        history.append("assistant", "推奨します")
+        history.append("user", "次の相談")
+
+        assert history.summary == "・採用の相談。結論は推奨"
+        assert "採用すべき？" in messages.requests[0]["messages"][0]["content"]
+
+    @pytest.mark.unit
+    def test_llm_summarizer_falls_back_to_rules(self):
+        messages = StubMessages(error=ValueError("bad request"))
+        summarizer = LLMSummarizer(SimpleNamespace(messages=messages))
+
+        summary = summarizer("・前回", [{"role": "user", "content": "採用すべき？"}])
+
+        assert summary == "・前回\n・採用すべき？"
@@ -0,0 +1,77 @@
+"""
+ヒアリング状態（InterviewState）の直列化の単体テスト
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from src.koyomi.chat.interviewer import STATE_FORMAT_VERSION, Interviewer, InterviewState
+
+
+def _answer(interviewer: Interviewer, answers):
+    for answer in answers:
+        interviewer.process_answer(answer)
+    return interviewer
+
+
+class TestInterviewStateSerialization:
+
+    @pytest.mark.unit
+    def test_round_trip(self):
+        state = _answer(Interviewer(), [
+            "この人を採用すべき？", "山田太郎さんは平成2年6月15日 10:30", "佐藤 1985/12/25",
+        ]).state
+        state.concerns = ["定着するか"]
+
+        restored = InterviewState.from_bytes(state.to_bytes())
+
+        assert restored.to_bytes() == state.to_bytes()
+        assert restored.consultation_type == "採用"
+        assert restored.current_step == 3
+        assert restored.concerns == ["定着するか"]
+        assert [(p.name, p.role, p.birth_date, p.birth_time) for p in restored.people] == [
+            ("山田太郎", "候補者", datetime(1990, 6, 15, 10, 30), datetime(1990, 6, 15, 10, 30)),
+            ("佐藤", "メンバー", datetime(1985, 12, 25, 12), None),
+        ]
+
+    @pytest.mark.unit
+    def test_resumed_interview_continues_where_it_left_off(self):
+        answers = ["相性を知りたい", "相手は1990/6/15", "私は1985/12/25", "仕事", "特になし"]
+        uninterrupted = _answer(Interviewer(), answers)
+
+        interviewer = Interviewer()
+        for answer in answers:
+            interviewer = Interviewer(InterviewState.from_bytes(interviewer.state.to_bytes()))
+            interviewer.process_answer(answer)
+
+        assert interviewer.state.to_bytes() == uninterrupted.state.to_bytes()
+        assert interviewer.state.is_complete()
+
+    @pytest.mark.unit
+    def test_state_is_compact_and_slotted(self):
+        state = InterviewState()
+
+        assert len(state.to_bytes()) < 32
+        assert not hasattr(state, "__dict__")
+        assert not hasattr(Interviewer(), "__dict__")
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("data", [
+        b"not json",
+        b"\xff\xfe",
+        json.dumps([STATE_FORMAT_VERSION, "採用"]).encode(),
+        json.dumps([
+            STATE_FORMAT_VERSION, "採用", 1, None, None, [], [["A", "B", "bad-date", 0]]
+        ]).encode(),
+    ])
+    def test_invalid_data_raises_value_error(self, data):
+        with pytest.raises(ValueError, match="Invalid interview state"):
+            InterviewState.from_bytes(data)
+
+    @pytest.mark.unit
+    def test_other_version_is_rejected(self):
+        data = json.dumps([STATE_FORMAT_VERSION + 1, None, 0, None, None, [], []]).encode()
+
+        with pytest.raises(ValueError, match="Unsupported interview state version"):
+            InterviewState.from_bytes(data)
@@ -0,0 +1,42 @@
+"""
+Aho–Corasick キーワードオートマトンの単体テスト
+"""
+import random
+
+import pytest
+
+from src.koyomi.chat.keyword_automaton import KeywordAutomaton
+
+
+class TestKeywordAutomaton:
+
+    @pytest.mark.unit
+    def test_overlapping_and_nested_keywords(self):
+        automaton = KeywordAutomaton({"he": [1], "she": [2], "his": [3], "hers": [4]})
+
+        assert list(automaton.iter_matches("ushers")) == [(4, "she"), (4, "he"), (6, "hers")]
+        assert automaton.find("ushers") == {"she", "he", "hers"}
+        assert automaton.payloads("ushers") == {1, 2, 4}
+
+    @pytest.mark.unit
+    def test_keyword_inside_longer_keyword(self):
+        automaton = KeywordAutomaton({
+            "人間関係": ["relationship"],
+            "関係": ["relationship"],
+            "新メンバー": ["hiring"],
+            "メンバー": ["team"],
+        })
+
+        assert automaton.find("職場の人間関係と新メンバー") == {"人間関係", "関係", "新メンバー", "メンバー"}
+        assert automaton.payloads("新メンバー") == {"hiring", "team"}
+        assert automaton.find("") == frozenset()
+
+    @pytest.mark.unit
+    def test_matches_naive_substring_scan(self):
+        vocabulary = ["ab", "abc", "bca", "c", "caa", "aaaa"]
+        automaton = KeywordAutomaton({word: [] for word in vocabulary})
+        rng = random.Random(0)
+
+        for _ in range(2000):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 20)))
+            assert automaton.find(text) == {word for word in vocabulary if word in text}
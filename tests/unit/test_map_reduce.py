@@ -0,0 +1,250 @@
+"""
+Map-Reduce 型アドバイス生成の単体テスト
+
+Claude API はフェイククライアントで置き換える。
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.map_reduce import (
+    DEFAULT_SUMMARY_CACHE_USERS,
+    SummaryCache,
+    clear_summary_caches,
+    get_summary_cache,
+    map_bounded,
+    set_summary_cache_users,
+    sum_usage,
+)
+from src.koyomi.storage.json_store import BASE_DIR, delete_user_data
+from src.koyomi.storage.subscription import cancel_subscription, register_subscription
+
+
+class FakeUsage:
+    input_tokens = 100
+    output_tokens = 20
+    cache_creation_input_tokens = 0
+    cache_read_input_tokens = 0
+
+
+class FakeMessages:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.requests.append(kwargs)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+
+        if kwargs["max_tokens"] == KoyomiConsultant.SUMMARY_MAX_TOKENS:
+            text = f"要約:{kwargs['messages'][0]['content'].splitlines()[0]}"
+        else:
+            text = "## 総合判断\n統合結果"
+        block = type("Block", (), {"text": text})()
+        return type("Message", (), {"content": [block], "usage": FakeUsage()})()
+
+
+class FakeClient:
+    def __init__(self, delay=0.0):
+        self.messages = FakeMessages(delay)
+
+
+def _team(size):
+    analysis = {
+        f"メンバー{i}": {
+            "fingerprint": f"1990-01-{i + 1:02d}T12:00:00",
+            "day_kan": "甲乙丙丁戊己庚辛壬癸"[i % 10],
+            "metaphor": {"本質": f"本質{i}", "強み": "強み", "課題": "課題"},
+            "yojin": ["甲"],
+        }
+        for i in range(size)
+    }
+    analysis["compatibility"] = {"score": 75, "relation": "相生"}
+    return analysis
+
+
+def _consultant(client, **kwargs):
+    consultant = KoyomiConsultant(api_key=None, **kwargs)
+    consultant.use_api = True
+    consultant.client = client
+    return consultant
+
+
+def _summary_calls(client):
+    return [
+        r for r in client.messages.requests
+        if r["max_tokens"] == KoyomiConsultant.SUMMARY_MAX_TOKENS
+    ]
+
+
+@pytest.fixture(autouse=True)
+def clear_summary_cache():
+    clear_summary_caches()
+    yield
+    clear_summary_caches()
+    set_summary_cache_users(DEFAULT_SUMMARY_CACHE_USERS)
+
+
+def _subscribe(user_id):
+    register_subscription(user_id, datetime.now(timezone.utc) + timedelta(days=30))
+    return user_id
+
+
+def _unsubscribe(user_id):
+    cancel_subscription(user_id)
+    if (BASE_DIR / user_id).exists():
+        delete_user_data(user_id, reason="test")
+
+
+@pytest.fixture
+def subscriber():
+    user_id = _subscribe("test_summary_user")
+    yield user_id
+    _unsubscribe(user_id)
+
+
+@pytest.fixture
+def subscribers():
+    user_ids = [_subscribe(f"test_summary_user{i}") for i in range(3)]
+    yield user_ids
+    for user_id in user_ids:
+        _unsubscribe(user_id)
+
+
+class TestMapReduceAdvice:
+
+    @pytest.mark.unit
+    def test_summarizes_each_person_then_synthesizes(self):
+        client = FakeClient()
+        consultant = _consultant(client)
+
+        result = consultant.generate_advice_map_reduce("編成は？", "team", _team(3), {})
+
+        assert result["text"] == "## 総合判断\n統合結果"
+        assert result["source"] == "api"
+        assert len(_summary_calls(client)) == 3
+        assert result["usage"]["input_tokens"] == 400
+
+        reduce_prompt = client.messages.requests[-1]["messages"][0]["content"]
+        assert "要約:- 日干: 甲" in reduce_prompt
+        assert "【相性分析】" in reduce_prompt
+        assert "本質0" not in reduce_prompt
+
+    @pytest.mark.unit
+    def test_summaries_are_reused_by_fingerprint(self, subscriber):
+        client = FakeClient()
+        consultant = _consultant(client)
+
+        consultant.generate_advice_map_reduce("編成は？", "team", _team(3), {}, user_id=subscriber)
+        consultant.generate_advice_map_reduce("別の相談", "hiring", _team(4), {}, user_id=subscriber)
+
+        assert len(_summary_calls(client)) == 4
+        assert get_summary_cache(subscriber).stats()["hits"] == 3
+
+    @pytest.mark.unit
+    def test_summaries_are_not_kept_without_subscription(self):
+        client = FakeClient()
+        consultant = _consultant(client)
+
+        consultant.generate_advice_map_reduce("編成は？", "team", _team(3), {})
+        consultant.generate_advice_map_reduce("編成は？", "team", _team(3), {}, user_id="guest")
+
+        assert len(_summary_calls(client)) == 6
+        assert get_summary_cache(None) is None
+        assert get_summary_cache("guest") is None
+
+    @pytest.mark.unit
+    def test_cancelled_subscription_drops_summaries(self, subscriber):
+        client = FakeClient()
+        consultant = _consultant(client)
+        consultant.generate_advice_map_reduce("編成は？", "team", _team(3), {}, user_id=subscriber)
+        assert get_summary_cache(subscriber).stats()["size"] == 3
+
+        cancel_subscription(subscriber)
+        assert get_summary_cache(subscriber) is None
+
+        register_subscription(subscriber, datetime.now(timezone.utc) + timedelta(days=30))
+        assert get_summary_cache(subscriber).stats()["size"] == 0
+
+    @pytest.mark.unit
+    def test_duplicate_charts_are_not_summarized(self):
+        client = FakeClient()
+        team = _team(2)
+        team["コピー"] = dict(team["メンバー0"], same_as="メンバー0")
+
+        _consultant(client).generate_advice_map_reduce("編成は？", "team", team, {})
+
+        assert len(_summary_calls(client)) == 2
+        assert "メンバー0と同一命式" in client.messages.requests[-1]["messages"][0]["content"]
+
+    @pytest.mark.unit
+    def test_parallelism_is_bounded_and_faster_than_serial(self):
+        client = FakeClient(delay=0.05)
+        consultant = _consultant(client, max_parallel=4)
+
+        started = time.perf_counter()
+        consultant.generate_advice_map_reduce("編成は？", "team", _team(8), {})
+        elapsed = time.perf_counter() - started
+
+        assert client.messages.max_active == 4
+        assert elapsed < 9 * 0.05
+
+    @pytest.mark.unit
+    def test_routes_by_team_size(self):
+        client = FakeClient()
+        consultant = _consultant(client, map_reduce_min_people=3)
+
+        consultant.generate_advice_with_metadata("相性は？", "team", _team(2), {})
+        assert _summary_calls(client) == []
+
+        consultant.generate_advice_with_metadata("編成は？", "team", _team(3), {})
+        assert len(_summary_calls(client)) == 3
+
+
+class TestMapReduceHelpers:
+
+    @pytest.mark.unit
+    def test_map_bounded_keeps_order(self):
+        assert map_bounded(lambda x: x * 2, [3, 1, 2], max_parallel=3) == [6, 2, 4]
+
+    @pytest.mark.unit
+    def test_summary_cache_evicts_least_recently_used(self):
+        cache = SummaryCache(max_entries=2)
+        cache.put("m", "a", "A")
+        cache.put("m", "b", "B")
+        cache.get("m", "a")
+        cache.put("m", "c", "C")
+
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") == "A"
+
+    @pytest.mark.unit
+    def test_summary_caches_keep_recent_users_only(self, subscribers):
+        first, second, third = subscribers
+        set_summary_cache_users(2)
+        get_summary_cache(first).put("m", "a", "A")
+        get_summary_cache(second).put("m", "b", "B")
+        get_summary_cache(first)
+        get_summary_cache(third)
+
+        assert get_summary_cache(first).get("m", "a") == "A"
+        assert get_summary_cache(second).get("m", "b") is None
+
+    @pytest.mark.unit
+    def test_sum_usage(self):
+        total = sum_usage([{"input_tokens": 3, "output_tokens": 1}, {"input_tokens": 2}])
+
+        assert total["input_tokens"] == 5
+        assert total["output_tokens"] == 1
+        assert total["cache_read_input_tokens"] == 0
@@ -0,0 +1,208 @@
+"""
+Claude API 計測（メトリクス）の単体テスト
+"""
+import time
+import urllib.request
+from contextlib import contextmanager
+
+import pytest
+
+from src.koyomi.chat.advice import AdviceGenerator
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.metrics import (
+    LLM_FALLBACKS,
+    LLM_LATENCY,
+    LLM_REQUESTS,
+    LLM_TOKENS,
+    LLM_TTFT,
+    MetricsRegistry,
+    start_metrics_server,
+)
+
+
+PEOPLE_ANALYSIS = {"私": {"day_kan": "丁", "metaphor": {"本質": "初夏の灯火"}}}
+
+
+class FakeUsage:
+    input_tokens = 120
+    output_tokens = 30
+    cache_creation_input_tokens = 0
+    cache_read_input_tokens = 0
+
+
+class FakeStream:
+    text_stream = ["回", "答"]
+
+    def get_final_message(self):
+        return type("Message", (), {"usage": FakeUsage()})()
+
+
+class FakeMessages:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def create(self, **kwargs):
+        block = type("Block", (), {"text": "回答"})()
+        return type("Message", (), {"content": [block], "usage": FakeUsage()})()
+
+    @contextmanager
+    def stream(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        yield FakeStream()
+
+
+def _requests(**labels) -> float:
+    """consultant の relationship 相談の記録回数（mode・source の全組み合わせ）"""
+    return sum(
+        LLM_REQUESTS.value(
+            component="consultant", consultation_type="relationship", mode=mode, source=source
+        )
+        for mode in ("sync", "stream", "background")
+        for source in ("api", "cache", "fallback")
+        if all({"mode": mode, "source": source}.get(k) == v for k, v in labels.items())
+    )
+
+
+def _wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met"
+        time.sleep(0.01)
+
+
+class TestRegistry:
+
+    @pytest.mark.unit
+    def test_counter_exposition(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "呼び出し回数", ("source",))
+        counter.inc(source="api")
+        counter.inc(2, source="api")
+
+        text = registry.render()
+
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{source="api"} 3' in text
+
+    @pytest.mark.unit
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "所要時間", buckets=(0.5, 1.0))
+        for value in (0.2, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{le="0.5"} 2' in text
+        assert 'latency_seconds_bucket{le="1.0"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_count 4" in text
+        assert "latency_seconds_sum 4.4" in text
+
+    @pytest.mark.unit
+    def test_missing_label_is_rejected(self):
+        counter = MetricsRegistry().counter("x_total", "x", ("source",))
+
+        with pytest.raises(ValueError):
+            counter.inc()
+
+    @pytest.mark.unit
+    def test_http_endpoint(self):
+        registry = MetricsRegistry()
+        registry.counter("up_total", "稼働").inc()
+        server = start_metrics_server(0, registry=registry)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert "up_total 1" in body
+
+
+class TestAdviceInstrumentation:
+
+    @pytest.mark.unit
+    def test_api_call_records_latency_and_tokens(self):
+        consultant = KoyomiConsultant(api_key=None)
+        consultant.use_api = True
+        consultant.client = type("Client", (), {"messages": FakeMessages()})()
+        before_calls = LLM_REQUESTS.value(
+            component="consultant", consultation_type="hiring", mode="sync", source="api"
+        )
+        before_latency = LLM_LATENCY.count(component="consultant", mode="sync", source="api")
+        before_tokens = LLM_TOKENS.value(component="consultant", kind="input")
+
+        consultant.generate_advice_with_metadata("採用？", "hiring", PEOPLE_ANALYSIS, {})
+
+        assert LLM_REQUESTS.value(
+            component="consultant", consultation_type="hiring", mode="sync", source="api"
+        ) == before_calls + 1
+        latency = LLM_LATENCY.count(component="consultant", mode="sync", source="api")
+        assert latency == before_latency + 1
+        assert LLM_TOKENS.value(component="consultant", kind="input") == before_tokens + 120
+
+    @pytest.mark.unit
+    def test_fallback_reason_is_recorded(self, monkeypatch):
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        before = LLM_FALLBACKS.value(component="consultant", reason="no_api")
+
+        result = KoyomiConsultant(api_key=None).generate_advice_with_metadata(
+            "採用？", "hiring", PEOPLE_ANALYSIS, {}
+        )
+
+        assert result["fallback_reason"] == "no_api"
+        assert LLM_FALLBACKS.value(component="consultant", reason="no_api") == before + 1
+
+    @pytest.mark.unit
+    def test_stream_records_time_to_first_token(self):
+        before = LLM_TTFT.count(component="advice_generator")
+
+        generator = AdviceGenerator(use_claude_api=False)
+        events = list(generator.stream_advice("採用", {}, {"score": 80}, "Q"))
+
+        assert events[-1]["fallback_reason"] == "no_api"
+        assert LLM_TTFT.count(component="advice_generator") == before + 1
+
+    @pytest.mark.unit
+    def test_deadline_stream_is_recorded_once(self):
+        consultant = KoyomiConsultant(api_key=None)
+        consultant.use_api = True
+        consultant.client = type("Client", (), {"messages": FakeMessages()})()
+        before_calls = _requests()
+        before_stream = _requests(mode="stream", source="api")
+        before_tokens = LLM_TOKENS.value(component="consultant", kind="output")
+
+        events = list(consultant.stream_advice(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=5.0
+        ))
+
+        assert events[-1]["source"] == "api"
+        assert consultant.client.messages.calls == 1
+        assert _requests() == before_calls + 1
+        assert _requests(mode="stream", source="api") == before_stream + 1
+        assert LLM_TOKENS.value(component="consultant", kind="output") == before_tokens + 30
+
+    @pytest.mark.unit
+    def test_missed_deadline_records_fallback_and_background_call(self):
+        consultant = KoyomiConsultant(api_key=None)
+        consultant.use_api = True
+        consultant.client = type("Client", (), {"messages": FakeMessages(delay=0.2)})()
+        before_background = _requests(mode="background", source="api")
+        before_fallback = _requests(mode="stream", source="fallback")
+        before_tokens = LLM_TOKENS.value(component="consultant", kind="output")
+
+        events = list(consultant.stream_advice(
+            "相性は？", "relationship", PEOPLE_ANALYSIS, {}, deadline=0.05
+        ))
+        events[-1]["pending"].result(timeout=2)
+        _wait_for(lambda: _requests(mode="background", source="api") > before_background)
+
+        assert consultant.client.messages.calls == 1
+        assert _requests(mode="background", source="api") == before_background + 1
+        assert _requests(mode="stream", source="fallback") == before_fallback + 1
+        assert LLM_TOKENS.value(component="consultant", kind="output") == before_tokens + 30
@@ -0,0 +1,117 @@
+"""
+出力トークン予算（OutputBudget）の単体テスト
+"""
+import pytest
+
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.output_budget import (
+    DEFAULT_BUDGETS,
+    MIN_BUDGET,
+    QUICK_BUDGET,
+    OutputBudget,
+    get_output_budget,
+)
+
+
+class TestOutputBudget:
+
+    @pytest.mark.unit
+    def test_defaults_until_enough_samples(self):
+        budget = OutputBudget(min_samples=3)
+        budget.observe("relationship", 100)
+        budget.observe("relationship", 100)
+
+        assert budget.max_tokens("relationship") == DEFAULT_BUDGETS["relationship"]
+        assert budget.max_tokens("relationship", quick=True) == QUICK_BUDGET
+
+    @pytest.mark.unit
+    def test_learns_p95_with_headroom(self):
+        budget = OutputBudget(min_samples=20, headroom=1.2)
+        for tokens in range(500, 1500, 50):
+            budget.observe("timing", tokens)
+
+        # 20件の p95（最近傍法）= 19番目 = 1400
+        assert budget.max_tokens("timing") == 1680
+        assert budget.max_tokens("hiring") == DEFAULT_BUDGETS["hiring"]
+
+    @pytest.mark.unit
+    def test_budget_is_clamped(self):
+        budget = OutputBudget(min_samples=1)
+        budget.observe("team", 10)
+        budget.observe("hiring", 5000)
+
+        assert budget.max_tokens("team") == MIN_BUDGET
+        assert budget.max_tokens("hiring", ceiling=2000) == 2000
+
+    @pytest.mark.unit
+    def test_truncated_answers_grow_the_budget(self):
+        budget = OutputBudget(min_samples=1, headroom=1.5)
+        budget.observe("team", 600, truncated=True)
+
+        assert budget.max_tokens("team") == 1350
+
+    @pytest.mark.unit
+    def test_quick_answers_are_learned_separately(self):
+        budget = OutputBudget(min_samples=1)
+        budget.observe("team", 300, quick=True)
+
+        assert budget.max_tokens("team", quick=True) == 360
+        assert budget.max_tokens("team") == DEFAULT_BUDGETS["team"]
+        assert budget.stats() == {"team:quick": {"samples": 1, "p95": 300}}
+
+
+class RecordingMessages:
+    """リクエストを記録し、固定の出力トークン数で応答"""
+
+    def __init__(self, output_tokens):
+        self.output_tokens = output_tokens
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        usage = type("Usage", (), {
+            "input_tokens": 100, "output_tokens": self.output_tokens,
+            "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+        })()
+        block = type("Block", (), {"text": "回答"})()
+        return type("Message", (), {
+            "content": [block], "usage": usage, "stop_reason": "end_turn"
+        })()
+
+
+def _consultant(messages, quick=False):
+    consultant = KoyomiConsultant(api_key=None, quick=quick)
+    consultant.use_api = True
+    consultant.client = type("Client", (), {"messages": messages})()
+    return consultant
+
+
+PEOPLE_ANALYSIS = {"私": {"day_kan": "丁", "metaphor": {"本質": "初夏の灯火"}}}
+
+
+class TestConsultantOutputBudget:
+
+    @pytest.mark.unit
+    def test_max_tokens_follows_observed_lengths(self, monkeypatch):
+        monkeypatch.setattr(get_output_budget(), "min_samples", 2)
+        messages = RecordingMessages(output_tokens=400)
+        consultant = _consultant(messages)
+
+        for _ in range(3):
+            consultant.generate_advice_with_metadata("相性は？", "relationship", PEOPLE_ANALYSIS, {})
+
+        assert [r["max_tokens"] for r in messages.requests] == [1000, 1000, 480]
+
+    @pytest.mark.unit
+    def test_quick_mode_adds_instruction_after_cached_prefix(self):
+        messages = RecordingMessages(output_tokens=200)
+
+        _consultant(messages, quick=True).generate_advice_with_metadata(
+            "採用すべき？", "hiring", PEOPLE_ANALYSIS, {}
+        )
+
+        request = messages.requests[0]
+        assert request["max_tokens"] == QUICK_BUDGET
+        assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert request["system"][0]["text"] == KoyomiConsultant.SYSTEM_PROMPT
+        assert request["system"][-1]["text"] == KoyomiConsultant.QUICK_ANSWER_PROMPT
@@ -0,0 +1,100 @@
+"""
+コンパクトなプロンプト表現の単体テスト
+"""
+import pytest
+
+from src.koyomi.chat.consultant import KoyomiConsultant
+from src.koyomi.chat.prompt_compact import compact_people_section, estimate_tokens
+
+
+FIRE = {"本質": "初夏の灯火", "強み": "情熱、芸術性", "課題": "燃え尽き"}
+WATER = {"本質": "冬の大河", "強み": "包容力、知性", "課題": "流されやすさ"}
+
+
+def _team(size):
+    analysis = {}
+    for i in range(size):
+        analysis[f"メンバー{i}"] = {
+            "day_kan": "丁" if i % 2 else "壬",
+            "metaphor": FIRE if i % 2 else WATER,
+            "yojin": ["甲", "庚"],
+        }
+    analysis["compatibility"] = {"score": 75, "relation": "相生"}
+    return analysis
+
+
+class TestEstimateTokens:
+
+    @pytest.mark.unit
+    def test_counts_japanese_per_char_and_ascii_per_four(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("命式") == 2
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens("A|丁") == 2
+
+
+class TestCompactPeopleSection:
+
+    @pytest.mark.unit
+    def test_repeated_metaphors_share_one_legend_entry(self):
+        text = compact_people_section(_team(10))
+
+        assert text.count("初夏の灯火") == 1
+        assert text.count("冬の大河") == 1
+        assert "メンバー1|丁|M2|甲→庚" in text
+        assert "compatibility" not in text
+
+    @pytest.mark.unit
+    def test_duplicate_chart_is_a_reference(self):
+        analysis = {"A": _team(1)["メンバー0"], "B": {"same_as": "A"}}
+
+        text = compact_people_section(analysis)
+
+        assert "B|=A" in text
+
+    @pytest.mark.unit
+    def test_budget_trims_least_important_fields_first(self):
+        full = compact_people_section(_team(4))
+        budget = estimate_tokens(full) - 1
+
+        trimmed = compact_people_section(_team(4), token_budget=budget)
+
+        assert estimate_tokens(trimmed) <= budget
+        assert "燃え尽き" not in trimmed
+        assert "初夏の灯火" in trimmed
+        assert "甲→庚" in trimmed
+
+    @pytest.mark.unit
+    def test_tiny_budget_drops_rows_last(self):
+        trimmed = compact_people_section(_team(10), token_budget=60)
+
+        assert estimate_tokens(trimmed) <= 60
+        assert "初夏の灯火" not in trimmed
+        assert "…他" in trimmed
+        assert "メンバー0" in trimmed
+
+
+class TestCompactConsultantPrompt:
+
+    @pytest.mark.unit
+    def test_compact_prompt_is_smaller_for_large_team(self):
+        team = _team(10)
+        context = {"urgency": "high"}
+
+        verbose = KoyomiConsultant(api_key=None)._build_user_prompt("編成は？", team, context)
+        compact = KoyomiConsultant(api_key=None, compact=True)._build_user_prompt(
+            "編成は？", team, context
+        )
+
+        assert estimate_tokens(compact) < estimate_tokens(verbose) / 2
+        assert "【相性分析】75点/相生" in compact
+        assert "緊急度=緊急" in compact
+
+    @pytest.mark.unit
+    def test_budget_covers_whole_user_prompt(self):
+        consultant = KoyomiConsultant(api_key=None, compact=True, prompt_token_budget=120)
+
+        prompt = consultant._build_user_prompt("編成は？", _team(10), {})
+
+        assert estimate_tokens(prompt) <= 120
+        assert prompt.startswith("【相談内容】\n編成は？")
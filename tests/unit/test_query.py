@@ -0,0 +1,69 @@
+"""
+相談文の正規化と共有解析の単体テスト
+"""
+import pytest
+
+from src.koyomi.chat.hearing import ConsultationHearing
+from src.koyomi.chat.interviewer import Interviewer
+from src.koyomi.chat.query import analyze_query, classify_queries, normalize_query
+
+
+class TestNormalizeQuery:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("raw, expected", [
+        ("ﾁｰﾑ編成", "チーム編成"),
+        ("ＰＪの　メンバー", "pjの メンバー"),
+        ("  採用\n\tすべき？ ", "採用 すべき?"),
+        ("ＡＩ導入のタイミング", "ai導入のタイミング"),
+    ])
+    def test_width_and_whitespace_are_folded(self, raw, expected):
+        assert normalize_query(raw) == expected
+
+
+class TestQueryAnalysis:
+
+    @pytest.mark.unit
+    def test_analysis_is_cached_per_query(self):
+        assert analyze_query("この人を採用すべき？") is analyze_query("この人を採用すべき？")
+
+    @pytest.mark.unit
+    def test_hearing_and_interviewer_share_one_analysis(self):
+        query = "ﾊﾟｰﾄﾅｰと組むか迷っています。すぐ決めたい"
+
+        assert ConsultationHearing().classify_consultation(query) == "partnership"
+        assert Interviewer().classify_consultation(query) == "パートナー選定"
+        assert ConsultationHearing().extract_implicit_info(query) == {
+            "urgency": "high", "emotion": "anxious", "risk_tolerance": "medium"
+        }
+        assert {"パートナー", "組む", "すぐ", "迷っ"} <= analyze_query(query).matched
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("query, hearing_type, interview_type", [
+        ("この人を採用すべき？", "hiring", "採用"),
+        ("新規事業のチーム編成", "team", "チーム編成"),
+        ("独立する時期はいつ？", "timing", "タイミング判断"),
+        ("上司との相性が知りたい", "relationship", "相性確認"),
+        ("こんにちは", "general", "相性確認"),
+    ])
+    def test_classification(self, query, hearing_type, interview_type):
+        assert ConsultationHearing().classify_consultation(query) == hearing_type
+        assert Interviewer().classify_consultation(query) == interview_type
+
+    @pytest.mark.unit
+    def test_implicit_info_is_a_fresh_dict(self):
+        first = ConsultationHearing().extract_implicit_info("将来の不安")
+        first["urgency"] = "changed"
+
+        assert ConsultationHearing().extract_implicit_info("将来の不安")["urgency"] == "low"
+
+    @pytest.mark.unit
+    def test_batch_classification_matches_interactive_analysis(self):
+        queries = ["この人を採用すべき？", "ﾁｰﾑ編成が心配", "いずれ独立したいが慎重に", "こんにちは"]
+
+        expected = [analyze_query(q).categories for q in queries]
+        assert list(classify_queries(iter(queries))) == expected
+        assert list(classify_queries(queries))[1] == {
+            "hearing_type": "team", "interview_type": "チーム編成",
+            "urgency": "medium", "emotion": "anxious", "risk_tolerance": "medium",
+        }
@@ -0,0 +1,164 @@
+"""
+Claude API の耐障害性（リトライ・サーキットブレーカー）の単体テスト
+"""
+import pytest
+
+from src.koyomi.chat.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    call_with_retry,
+    is_retryable,
+)
+from src.koyomi.core.exceptions import CircuitOpenError
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _policy(sleeps, max_attempts=3):
+    return RetryPolicy(max_attempts=max_attempts, base_delay=1.0, max_delay=4.0,
+                       sleep=sleeps.append, rng=lambda: 0.5)
+
+
+def _failing(errors, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fn, calls
+
+
+class TestIsRetryable:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("status", [429, 500, 503, 529])
+    def test_transient_status_codes(self, status):
+        assert is_retryable(APIStatusError(status))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("status", [400, 401, 404])
+    def test_permanent_status_codes(self, status):
+        assert not is_retryable(APIStatusError(status))
+
+    @pytest.mark.unit
+    def test_connection_errors(self):
+        assert is_retryable(APIConnectionError())
+        assert is_retryable(TimeoutError())
+        assert not is_retryable(ValueError())
+
+
+class TestRetryPolicy:
+
+    @pytest.mark.unit
+    def test_full_jitter_is_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0, rng=lambda: 0.999)
+
+        assert policy.delay(0) == pytest.approx(0.999)
+        assert policy.delay(1) == pytest.approx(1.998)
+        assert policy.delay(5) == pytest.approx(3.996)
+
+    @pytest.mark.unit
+    def test_retry_after_header_wins(self):
+        policy = RetryPolicy(max_delay=4.0)
+
+        assert policy.delay(0, APIStatusError(429, {"retry-after": "2"})) == 2.0
+        assert policy.delay(0, APIStatusError(429, {"retry-after": "60"})) == 4.0
+
+
+class TestCallWithRetry:
+
+    @pytest.mark.unit
+    def test_retries_transient_errors_then_succeeds(self):
+        sleeps = []
+        fn, calls = _failing([APIStatusError(529), APIConnectionError()])
+
+        result = call_with_retry(fn, breaker=CircuitBreaker(), policy=_policy(sleeps))
+
+        assert result == "ok"
+        assert len(calls) == 3
+        assert sleeps == [0.5, 1.0]
+
+    @pytest.mark.unit
+    def test_permanent_error_is_not_retried(self):
+        fn, calls = _failing([APIStatusError(400)])
+
+        with pytest.raises(APIStatusError):
+            call_with_retry(fn, breaker=CircuitBreaker(), policy=_policy([]))
+
+        assert len(calls) == 1
+
+    @pytest.mark.unit
+    def test_gives_up_after_max_attempts(self):
+        fn, calls = _failing([APIStatusError(503)] * 5)
+
+        with pytest.raises(APIStatusError):
+            call_with_retry(fn, breaker=CircuitBreaker(), policy=_policy([], max_attempts=2))
+
+        assert len(calls) == 2
+
+
+class TestCircuitBreaker:
+
+    @pytest.mark.unit
+    def test_opens_after_threshold_and_fails_fast(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+        policy = _policy([], max_attempts=1)
+
+        for _ in range(2):
+            fn, _ = _failing([APIStatusError(529)])
+            with pytest.raises(APIStatusError):
+                call_with_retry(fn, breaker=breaker, policy=policy)
+
+        fn, calls = _failing([])
+        with pytest.raises(CircuitOpenError):
+            call_with_retry(fn, breaker=breaker, policy=policy)
+        assert calls == []
+        assert breaker.state == "open"
+
+    @pytest.mark.unit
+    def test_probe_after_reset_timeout_closes_on_success(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 31
+        assert breaker.state == "half_open"
+        assert breaker.allow() is True
+        assert breaker.allow() is False  # プローブは1回だけ
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    @pytest.mark.unit
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 31
+        assert breaker.allow()
+        breaker.record_failure()
+
+        clock.now = 40
+        assert breaker.state == "open"
+        assert not breaker.allow()
@@ -0,0 +1,150 @@
+"""
+Claude API スケジューラの単体テスト
+"""
+import threading
+import time
+
+import pytest
+
+from src.koyomi.chat.scheduler import LLMScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_for_depth(scheduler, depth, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while scheduler.stats()["queue_depth"] < depth:
+        assert time.monotonic() < deadline, "queue did not fill"
+        time.sleep(0.001)
+
+
+class TestTokenBucket:
+
+    @pytest.mark.unit
+    def test_refills_at_per_minute_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock)
+
+        bucket.take(60)
+        assert bucket.wait_time(1) == pytest.approx(1.0)
+
+        clock.now = 0.5
+        assert bucket.wait_time(1) == pytest.approx(0.5)
+
+        clock.now = 1.0
+        assert bucket.wait_time(1) == 0.0
+
+    @pytest.mark.unit
+    def test_oversized_request_is_clamped_to_capacity(self):
+        bucket = TokenBucket(100, FakeClock())
+
+        assert bucket.wait_time(1000) == 0.0
+
+    @pytest.mark.unit
+    def test_adjust_refunds_unused_reservation(self):
+        bucket = TokenBucket(100, FakeClock())
+        bucket.take(80)
+
+        bucket.adjust(-50)
+
+        assert bucket.available == pytest.approx(70)
+
+
+class TestLLMScheduler:
+
+    @pytest.mark.unit
+    def test_in_flight_is_bounded(self):
+        scheduler = LLMScheduler(max_in_flight=2, requests_per_minute=6000)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def call():
+            nonlocal active, peak
+            with scheduler.slot("u"):
+                with lock:
+                    active += 1
+                    peak = max(peak, active)
+                time.sleep(0.02)
+                with lock:
+                    active -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert peak == 2
+        stats = scheduler.stats()
+        assert stats["granted"] == 8
+        assert stats["in_flight"] == 0
+        assert stats["max_queue_depth"] >= 6
+        assert stats["max_wait_seconds"] > 0
+
+    @pytest.mark.unit
+    def test_users_are_served_round_robin(self):
+        scheduler = LLMScheduler(max_in_flight=1, requests_per_minute=6000)
+        order = []
+        blocker = scheduler.acquire("blocker")
+
+        def call(user):
+            with scheduler.slot(user):
+                order.append(user)
+
+        threads = []
+        for i, user in enumerate(["heavy", "heavy", "heavy", "light"]):
+            t = threading.Thread(target=call, args=(user,))
+            t.start()
+            threads.append(t)
+            _wait_for_depth(scheduler, i + 1)
+
+        scheduler.release(blocker)
+        for t in threads:
+            t.join()
+
+        assert order == ["heavy", "light", "heavy", "heavy"]
+
+    @pytest.mark.unit
+    def test_request_rate_limit_delays_calls(self):
+        scheduler = LLMScheduler(max_in_flight=10, requests_per_minute=600)
+        scheduler.request_bucket.available = 1
+
+        started = time.perf_counter()
+        with scheduler.slot():
+            pass
+        with scheduler.slot():
+            pass
+        elapsed = time.perf_counter() - started
+
+        assert elapsed >= 0.09
+
+    @pytest.mark.unit
+    def test_actual_usage_settles_token_bucket(self):
+        clock = FakeClock()
+        scheduler = LLMScheduler(tokens_per_minute=1000, clock=clock)
+
+        with scheduler.slot("u", estimated_tokens=500) as ticket:
+            ticket.record_usage({"input_tokens": 100, "output_tokens": 50})
+
+        assert scheduler.token_bucket.available == pytest.approx(850)
+
+    @pytest.mark.unit
+    def test_cache_reads_are_not_charged(self):
+        clock = FakeClock()
+        scheduler = LLMScheduler(tokens_per_minute=4000, clock=clock)
+
+        with scheduler.slot("u", estimated_tokens=2000) as ticket:
+            ticket.record_usage({
+                "input_tokens": 100,
+                "output_tokens": 50,
+                "cache_read_input_tokens": 1500,
+            })
+
+        assert scheduler.token_bucket.available == pytest.approx(3850)
@@ -0,0 +1,125 @@
+"""
+命式類似度インデックスの単体テスト
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.koyomi.layer1.engine import MeishikiEngine
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.analytics.roster import load_roster
+from src.koyomi.analytics.similarity import (
+    FEATURE_DIM,
+    SimilarityIndex,
+    chart_features,
+)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return MeishikiEngine()
+
+
+@pytest.fixture
+def roster_csv(tmp_path):
+    path = tmp_path / "roster.csv"
+    path.write_text(
+        "name,role,birth_date,birth_time\n"
+        "太郎,エンジニア,1990-06-15,10:30\n"
+        "花子,営業,1985/12/25,\n"
+        "次郎,,2000-01-15,08:00\n"
+        "三郎,企画,1990-06-15,10:30\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+class TestRoster:
+
+    @pytest.mark.unit
+    def test_load_roster(self, roster_csv):
+        people = load_roster(roster_csv)
+
+        assert [p.name for p in people] == ["太郎", "花子", "次郎", "三郎"]
+        assert people[0].birth_date == datetime(1990, 6, 15, 10, 30)
+        assert people[1].birth_time is None
+        assert people[1].birth_date == datetime(1985, 12, 25, 12, 0)
+        assert people[2].role == "次郎"
+
+    @pytest.mark.unit
+    def test_load_roster_rejects_bad_date(self, tmp_path):
+        path = tmp_path / "bad.csv"
+        path.write_text("name,birth_date\nA,1990年6月15日\n", encoding="utf-8")
+
+        with pytest.raises(ValueError, match="bad.csv:2"):
+            load_roster(path)
+
+
+class TestSimilarityIndex:
+
+    @pytest.mark.unit
+    def test_chart_features_shape(self, engine):
+        chart = engine.judge_yojin(datetime(1990, 6, 15, 10, 30))
+        vec = chart_features(chart)
+
+        assert vec.shape == (FEATURE_DIM,)
+        assert vec.dtype == np.float32
+        assert vec.sum() > 0
+
+    @pytest.mark.unit
+    def test_identical_chart_is_nearest(self, roster_csv, engine):
+        index = SimilarityIndex.from_roster(roster_csv, engine=engine)
+
+        result = index.most_similar_to(0, k=3)
+
+        assert result[0]["name"] == "三郎"
+        assert result[0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert all(r["index"] != 0 for r in result)
+        assert [r["score"] for r in result] == sorted(
+            (r["score"] for r in result), reverse=True
+        )
+
+    @pytest.mark.unit
+    def test_query_person(self, roster_csv, engine):
+        index = SimilarityIndex.from_roster(roster_csv, engine=engine)
+        person = PersonProfile("候補者", "候補者", datetime(1985, 12, 25, 12, 0))
+
+        assert index.query_person(person, k=1)[0]["name"] == "花子"
+
+    @pytest.mark.unit
+    def test_save_and_load_roundtrip(self, roster_csv, engine, tmp_path):
+        index = SimilarityIndex.from_roster(roster_csv, engine=engine)
+        path = tmp_path / "index" / "roster.npz"
+        index.save(path)
+
+        loaded = SimilarityIndex.load(path, engine=engine)
+
+        assert loaded.names == index.names
+        assert loaded.roles == index.roles
+        np.testing.assert_allclose(loaded.matrix, index.matrix)
+
+    @pytest.mark.unit
+    def test_load_or_build_reuses_saved_index(self, roster_csv, engine, tmp_path):
+        path = tmp_path / "roster.npz"
+        SimilarityIndex.load_or_build(roster_csv, path, engine=engine)
+        mtime = path.stat().st_mtime_ns
+
+        index = SimilarityIndex.load_or_build(roster_csv, path, engine=engine)
+
+        assert path.stat().st_mtime_ns == mtime
+        assert len(index) == 4
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_query_over_5000_people(self):
+        # 速度は scripts/benchmark_similarity.py で計測する（CI の実行時間に依存させない）
+        rng = np.random.default_rng(0)
+        vectors = rng.random((5000, FEATURE_DIM), dtype=np.float32)
+        index = SimilarityIndex([f"p{i}" for i in range(5000)], vectors)
+
+        result = index.query(vectors[42], k=10)
+
+        assert result[0]["name"] == "p42"
+        assert len(result) == 10
+        assert [r["score"] for r in result] == sorted((r["score"] for r in result), reverse=True)
@@ -0,0 +1,134 @@
+"""
+入力中の先読み（Speculation）の単体テスト
+"""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from src.koyomi.chat.analyzer import IntegratedAnalyzer
+from src.koyomi.chat.hearing import PersonProfile
+from src.koyomi.chat.speculation import Speculation, input_signature
+
+
+def _people(day=1):
+    return [
+        PersonProfile("私", "経営者", datetime(1980, 5, day, 12, 0)),
+        PersonProfile("候補者", "候補者", datetime(1992, 8, 20, 12, 0)),
+    ]
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.mark.unit
+def test_signature_changes_with_inputs():
+    base = input_signature("採用？", _people(), None, api=False)
+
+    assert input_signature("採用？", _people(), None, api=False) == base
+    assert input_signature("採用？", _people(day=2), None, api=False) != base
+    assert input_signature("採用？", _people(), {"additional_info": "IT"}, api=False) != base
+    assert input_signature("採用？", _people(), None, api=True) != base
+
+
+@pytest.mark.unit
+def test_replay_matches_direct_run():
+    analyzer = IntegratedAnalyzer(api_key=None)
+    analyzer.consultant.use_api = False
+    speculation = Speculation(
+        "sig", lambda: analyzer.iter_local("採用すべき？", _people()), delay=0
+    ).start()
+
+    replayed = list(analyzer.iter_consultation(
+        "採用すべき？", _people(), local_events=speculation.replay()
+    ))
+    direct = list(analyzer.iter_consultation("採用すべき？", _people()))
+
+    assert [e["stage"] for e in replayed] == [e["stage"] for e in direct]
+    assert replayed[-1]["result"]["advice"] == direct[-1]["result"]["advice"]
+    # 再生は何度でもできる
+    stages = [e["stage"] for e in speculation.replay()]
+    assert stages == ["person", "person", "compatibility", "local"]
+
+
+@pytest.mark.unit
+def test_speculation_does_not_call_the_api(monkeypatch):
+    analyzer = IntegratedAnalyzer(api_key=None)
+    calls = []
+    monkeypatch.setattr(analyzer.consultant, "stream_advice", lambda **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(
+        analyzer.consultant, "generate_advice_with_metadata", lambda **kwargs: calls.append(kwargs)
+    )
+    speculation = Speculation(
+        "sig", lambda: analyzer.iter_local("採用すべき？", _people()), delay=0
+    ).start()
+
+    events = list(speculation.replay())
+
+    assert events[-1]["stage"] == "local"
+    assert calls == []
+
+
+@pytest.mark.unit
+def test_local_events_are_not_recomputed(monkeypatch):
+    analyzer = IntegratedAnalyzer(api_key=None)
+    analyzer.consultant.use_api = False
+    local_events = list(analyzer.iter_local("採用すべき？", _people()))
+    monkeypatch.setattr(analyzer, "_analyze_person", lambda person: pytest.fail("再計算された"))
+
+    result = list(analyzer.iter_consultation("採用すべき？", _people(), local_events=local_events))
+
+    assert result[-1]["result"]["people_analysis"] == local_events[-1]["local"]["people_analysis"]
+
+
+@pytest.mark.unit
+def test_cancel_before_delay_skips_work():
+    calls = []
+    speculation = Speculation("sig", lambda: calls.append(1) or iter(()), delay=0.2).start()
+
+    speculation.cancel()
+    time.sleep(0.3)
+
+    assert calls == []
+    assert not speculation.started
+    assert not speculation.matches("sig")
+
+
+@pytest.mark.unit
+def test_replay_skips_the_delay():
+    speculation = Speculation("sig", lambda: iter([{"stage": "complete"}]), delay=30).start()
+
+    started = time.monotonic()
+    events = list(speculation.replay())
+
+    assert events == [{"stage": "complete"}]
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.unit
+def test_cancel_while_running_closes_the_source():
+    release = threading.Event()
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield {"stage": "person"}
+            release.wait(2)
+            yield {"stage": "advice_delta"}
+            yield {"stage": "complete"}
+        finally:
+            closed.set()
+
+    speculation = Speculation("sig", source, delay=0).start()
+    _wait_until(lambda: speculation.started)
+
+    speculation.cancel()
+    release.set()
+
+    assert closed.wait(2)
+    assert not speculation.matches("sig")
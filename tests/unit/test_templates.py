@@ -0,0 +1,84 @@
+"""
+事前コンパイル済みテンプレートとルールベースのアドバイスの単体テスト
+"""
+import pytest
+
+from src.koyomi.chat.advice import AdviceGenerator
+from src.koyomi.chat.templates import CompiledTemplate
+
+
+MEISHIKI_DATA = {
+    "山田": {"日干": "丙", "五行": {"火": 3, "土": 2, "木": 1, "金": 1, "水": 1}},
+    "佐藤": {"日干": "甲", "五行": {"木": 3, "水": 2, "火": 1, "金": 1, "土": 1}},
+}
+COMPATIBILITY_DATA = {"score": 80, "relation": "相生関係"}
+
+
+class TestCompiledTemplate:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("consultation_type", sorted(AdviceGenerator.ADVICE_TEMPLATES))
+    def test_render_matches_str_format(self, consultation_type):
+        source = AdviceGenerator.ADVICE_TEMPLATES[consultation_type]
+        template = AdviceGenerator.COMPILED_TEMPLATES[consultation_type]
+        values = {field: f"<{field}>" for field in template.fields}
+
+        assert template.render(values) == source.format(**values)
+
+    @pytest.mark.unit
+    def test_escaped_braces_are_literal(self):
+        assert CompiledTemplate("{{固定}} {name}").render({"name": "値"}) == "{固定} 値"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("source", ["{0}", "{}", "{score:>3}", "{name!r}", "{person.name}"])
+    def test_unsupported_fields_are_rejected(self, source):
+        with pytest.raises(ValueError):
+            CompiledTemplate(source)
+
+    @pytest.mark.unit
+    def test_missing_value_raises_key_error(self):
+        with pytest.raises(KeyError):
+            CompiledTemplate("{decision}").render({})
+
+
+class TestRuleBasedAdvice:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("consultation_type", sorted(AdviceGenerator.RULE_FIELDS))
+    def test_every_type_is_filled_from_data(self, consultation_type):
+        generator = AdviceGenerator(use_claude_api=False)
+        template = generator.COMPILED_TEMPLATES[consultation_type]
+
+        fields = getattr(generator, generator.RULE_FIELDS[consultation_type])(
+            generator._people_profiles(MEISHIKI_DATA), COMPATIBILITY_DATA
+        )
+        text = generator.generate_advice(consultation_type, MEISHIKI_DATA, COMPATIBILITY_DATA, "Q")
+
+        assert set(fields) == template.fields
+        assert all(value.strip() for value in fields.values())
+        assert text.startswith("\n【")
+        assert "山田" in text
+
+    @pytest.mark.unit
+    def test_hiring_picks_supporting_member_as_buddy(self):
+        # 候補者（丙・火）を生む木の佐藤さんがバディ
+        text = AdviceGenerator().generate_advice("採用", MEISHIKI_DATA, COMPATIBILITY_DATA, "Q")
+
+        assert "佐藤さんをバディに指名" in text
+        assert "春（3〜5月）が吉" in text
+
+    @pytest.mark.unit
+    def test_team_reports_missing_elements(self):
+        team = {"A": {"日干": "丙", "五行": {"火": 4}}, "B": {"日干": "丁", "五行": {"火": 3, "土": 1}}}
+
+        text = AdviceGenerator().generate_advice("チーム編成", team, {"score": 60}, "Q")
+
+        assert "金（決断力と品質へのこだわり）を持つメンバーがいない" in text
+        assert "全員が火で、考え方が偏りやすい" in text
+
+    @pytest.mark.unit
+    def test_unknown_type_uses_relationship_template(self):
+        text = AdviceGenerator().generate_advice("その他", MEISHIKI_DATA, {"score": 40}, "Q")
+
+        assert "【うまくいくポイント】" in text
+        assert "❌" in text